@@ -0,0 +1,516 @@
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from .data_stats import DataStatsService
+from .models import COUNT_FIELDS, HOURLY_PEAK_FIELDS, ArchivedMonth, DirectionCount, TotalCount, TrafficRecord
+
+logger = logging.getLogger(__name__)
+
+
+# Closed months kept in the database, counted back from the latest month
+ARCHIVE_KEEP_MONTHS = 3
+
+# Archived months kept decompressed in memory per process
+ARCHIVE_CACHE_MONTHS = 12
+
+# Rows fetched from the database per round trip while archiving
+ARCHIVE_CHUNK_SIZE = 5000
+
+# Per-row arrays of a month file besides the raw count columns
+ROW_COLUMNS = ['timestamp', 'id', 'sensor']
+
+
+class ArchiveError(Exception):
+    """Raised when a month cannot be archived safely"""
+
+
+def month_start(timestamp):
+    """Truncate a datetime to the first instant of its month"""
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    """Shift a month start by `count` calendar months"""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def month_datetime(month):
+    """Aware UTC start of the month stored in an ArchivedMonth row"""
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def to_datetime64(timestamp):
+    """Datetime to naive UTC datetime64[us], the archive's time format"""
+    if timezone.is_aware(timestamp):
+        timestamp = timestamp.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return np.datetime64(timestamp, 'us')
+
+
+def to_datetimes(values):
+    """datetime64 array to a list of aware UTC datetimes"""
+    return [
+        value.replace(tzinfo=dt_timezone.utc)
+        for value in values.astype('datetime64[us]').tolist()
+    ]
+
+
+def archive_path(file_name):
+    return Path(settings.TRAFFIC_ARCHIVE_DIR) / file_name
+
+
+@lru_cache(maxsize=ARCHIVE_CACHE_MONTHS)
+def _read_file(path, mtime_ns):
+    # Keyed on the modification time so a rewritten file is read again
+    with np.load(path, allow_pickle=False) as data:
+        columns = {name: data[name] for name in data.files}
+    for name in columns:
+        if name in COUNT_FIELDS or (name.startswith('direction_') and name != 'direction_row'):
+            columns[name] = columns[name].astype(np.int64)
+        columns[name].setflags(write=False)
+    if 'id' not in columns:
+        # Files written before record ids were kept: the row order breaks timestamp ties
+        columns['id'] = np.arange(len(columns['timestamp']), dtype=np.int64)
+        columns['id'].setflags(write=False)
+    return columns
+
+
+def read_month(file_name):
+    """
+    Load one month file (cached per process).
+
+    Returns:
+        dict: Column name to read-only array. Rows are sorted by timestamp,
+        then record 'id', and 'sensor' indexes into 'sensors'. Direction
+        counts are stored as direction_row (row index), direction (index
+        into 'directions') and one direction_<field> array per count field.
+    """
+    path = archive_path(file_name)
+    return _read_file(str(path), path.stat().st_mtime_ns)
+
+
+def _slice_rows(columns, start_time, end_time):
+    """Per-row arrays of a month file limited to [start_time, end_time) (None: unbounded)"""
+    timestamps = columns['timestamp']
+    low = np.searchsorted(timestamps, to_datetime64(start_time)) if start_time else 0
+    high = np.searchsorted(timestamps, to_datetime64(end_time)) if end_time else len(timestamps)
+    return {name: columns[name][low:high] for name in ROW_COLUMNS + COUNT_FIELDS}
+
+
+def rows_past(rows, timestamp, record_id, descending=False):
+    """
+    Per-row arrays limited to the rows past a (timestamp, id) keyset cursor.
+
+    Rows are past the cursor when they come after it in (timestamp, id)
+    order, or before it when descending. A record_id of None skips every
+    row at the cursor's timestamp.
+    """
+    timestamps = rows['timestamp']
+    cursor = to_datetime64(timestamp)
+    low = np.searchsorted(timestamps, cursor)
+    high = np.searchsorted(timestamps, cursor, side='right')
+    if record_id is not None:
+        side = 'left' if descending else 'right'
+        low = high = low + np.searchsorted(rows['id'][low:high], record_id, side=side)
+    if descending:
+        return {name: column[:low] for name, column in rows.items()}
+    return {name: column[high:] for name, column in rows.items()}
+
+
+class ArchiveService:
+    """
+    Service for the cold tier of minute-level traffic history.
+
+    Closed months are moved out of traffic_record, total_count and
+    direction_count into one compressed NumPy file per month under
+    TRAFFIC_ARCHIVE_DIR. The hourly and daily rollups stay in the database,
+    so most dashboard reads never open a file; the few readers of minute rows
+    (partial-hour edges, peaks, record listings) merge both tiers. Archived
+    months are always the oldest part of the history: everything before
+    boundary() is cold and everything from it on is hot.
+    """
+
+    @staticmethod
+    def boundary():
+        """
+        First instant that is still stored in the database.
+
+        Returns:
+            datetime or None: End of the last archived month, None without an archive
+        """
+        last = ArchivedMonth.objects.aggregate(last=Max('month'))['last']
+        if last is None:
+            return None
+        return add_months(month_datetime(last), 1)
+
+    @staticmethod
+    def time_bounds():
+        """
+        Earliest and latest archived timestamps.
+
+        Returns:
+            tuple: (earliest, latest), both None without an archive
+        """
+        bounds = ArchivedMonth.objects.aggregate(
+            earliest=Min('earliest_timestamp'), latest=Max('latest_timestamp')
+        )
+        return bounds['earliest'], bounds['latest']
+
+    @staticmethod
+    def _month_files(start_time, end_time, descending=False):
+        """File names of the non-empty months overlapping [start_time, end_time)"""
+        months = ArchivedMonth.objects.all()
+        if start_time and end_time and end_time <= start_time:
+            return []
+        if start_time:
+            months = months.filter(month__gte=month_start(start_time).date())
+        if end_time:
+            months = months.filter(
+                month__lt=end_time.date() if end_time == month_start(end_time)
+                else add_months(month_start(end_time), 1).date()
+            )
+        return months.filter(record_count__gt=0).order_by(
+            '-month' if descending else 'month'
+        ).values_list('file_name', flat=True)
+
+    @staticmethod
+    def iter_months(start_time, end_time, descending=False):
+        """
+        Iterate over the archived rows in [start_time, end_time), a month at a time.
+
+        Either bound may be None for an open range.
+
+        Yields:
+            dict: Per-row arrays ('timestamp', 'id', 'sensor' and the count fields),
+            skipping months with no rows in the range
+        """
+        for file_name in ArchiveService._month_files(start_time, end_time, descending):
+            rows = _slice_rows(read_month(file_name), start_time, end_time)
+            if len(rows['timestamp']):
+                yield rows
+
+    @staticmethod
+    def columns(start_time, end_time):
+        """
+        All archived rows in [start_time, end_time) as one set of arrays.
+
+        Returns:
+            dict or None: Per-row arrays ordered by timestamp, None when empty
+        """
+        months = list(ArchiveService.iter_months(start_time, end_time))
+        if not months:
+            return None
+        return {
+            name: np.concatenate([rows[name] for rows in months])
+            for name in months[0]
+        }
+
+    @staticmethod
+    def sum_range(start_time, end_time):
+        """
+        Sum raw category counts of the archived rows in [start_time, end_time).
+
+        Returns:
+            dict: Field name to total
+        """
+        totals = {field: 0 for field in COUNT_FIELDS}
+        for rows in ArchiveService.iter_months(start_time, end_time):
+            for field in COUNT_FIELDS:
+                totals[field] += int(rows[field].sum())
+        return totals
+
+    @staticmethod
+    def hourly_rows(start_time, end_time):
+        """
+        Hourly sums of the archived rows in [start_time, end_time).
+
+        Returns:
+            list: Dicts with 'bucket', 'record_count', one sum per raw field
+            and the HOURLY_PEAK_FIELDS maxima, like RollupService.load_hourly
+            expects
+        """
+        result = []
+        for rows in ArchiveService.iter_months(start_time, end_time):
+            hours = rows['timestamp'].astype('datetime64[h]')
+            starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+            record_counts = np.diff(np.r_[starts, len(hours)])
+            sums = {field: np.add.reduceat(rows[field], starts) for field in COUNT_FIELDS}
+            maxima = {
+                name: np.maximum.reduceat(sum(rows[field] for field in fields), starts)
+                for name, fields in HOURLY_PEAK_FIELDS.items()
+            }
+            for index, bucket in enumerate(to_datetimes(hours[starts])):
+                result.append(dict(
+                    bucket=bucket,
+                    record_count=int(record_counts[index]),
+                    **{field: int(sums[field][index]) for field in COUNT_FIELDS},
+                    **{name: int(maxima[name][index]) for name in HOURLY_PEAK_FIELDS}
+                ))
+        return result
+
+    @staticmethod
+    def direction_columns(start_time, end_time):
+        """
+        All archived direction counts in [start_time, end_time) as one set of arrays.
+
+        Returns:
+            dict or None: 'timestamp', 'direction' (movement codes) and one
+            array per count field, in no particular order; None when empty
+        """
+        months = []
+        for file_name in ArchiveService._month_files(start_time, end_time):
+            columns = read_month(file_name)
+            timestamps = columns['timestamp'][columns['direction_row']]
+            inside = (
+                (timestamps >= to_datetime64(start_time)) & (timestamps < to_datetime64(end_time))
+            )
+            if inside.any():
+                months.append({
+                    'timestamp': timestamps[inside],
+                    'direction': columns['directions'][columns['direction'][inside]],
+                    **{field: columns[f'direction_{field}'][inside] for field in COUNT_FIELDS}
+                })
+        if not months:
+            return None
+        return {
+            name: np.concatenate([rows[name] for rows in months])
+            for name in months[0]
+        }
+
+    @staticmethod
+    def hourly_direction_rows(start_time, end_time):
+        """
+        Hourly per-direction sums of the archived direction counts in [start_time, end_time).
+
+        Returns:
+            list: Dicts with 'bucket', 'direction', 'record_count', one sum per
+            raw field and the HOURLY_PEAK_FIELDS maxima, ready for
+            HourlyDirectionCount
+        """
+        columns = ArchiveService.direction_columns(start_time, end_time)
+        if columns is None:
+            return []
+        names, codes = np.unique(columns['direction'], return_inverse=True)
+        hours = columns['timestamp'].astype('datetime64[h]').astype(np.int64)
+        keys, groups = np.unique(hours * len(names) + codes, return_inverse=True)
+        record_counts = np.bincount(groups)
+        sums = {}
+        for field in COUNT_FIELDS:
+            sums[field] = np.zeros(len(keys), dtype=np.int64)
+            np.add.at(sums[field], groups, columns[field])
+        maxima = {}
+        for name, fields in HOURLY_PEAK_FIELDS.items():
+            maxima[name] = np.zeros(len(keys), dtype=np.int64)
+            np.maximum.at(maxima[name], groups, sum(columns[field] for field in fields))
+
+        buckets = to_datetimes((keys // len(names)).astype('datetime64[h]'))
+        return [
+            dict(
+                bucket=bucket,
+                direction=str(names[key % len(names)]),
+                record_count=int(record_counts[index]),
+                **{field: int(sums[field][index]) for field in COUNT_FIELDS},
+                **{name: int(maxima[name][index]) for name in HOURLY_PEAK_FIELDS}
+            )
+            for index, (bucket, key) in enumerate(zip(buckets, keys.tolist()))
+        ]
+
+    @staticmethod
+    def _read_database(start_time, end_time):
+        """Arrays for a month file from the rows stored in [start_time, end_time)"""
+        rows = TotalCount.objects.filter(
+            timestamp__gte=start_time, timestamp__lt=end_time
+        ).order_by('timestamp', 'id').values_list(
+            'id', 'traffic_record_id', 'traffic_record__sensor', 'timestamp', *COUNT_FIELDS
+        )
+        ids, record_ids, sensors, timestamps, *counts = list(zip(
+            *rows.iterator(chunk_size=ARCHIVE_CHUNK_SIZE)
+        )) or [()] * (4 + len(COUNT_FIELDS))
+
+        sensor_names, sensor_codes = np.unique(np.array(sensors, dtype=str), return_inverse=True)
+        columns = {
+            'timestamp': np.array(
+                [timestamp.replace(tzinfo=None) for timestamp in timestamps], dtype='datetime64[us]'
+            ),
+            'id': np.array(ids, dtype=np.int64),
+            'sensor': sensor_codes.astype(np.int32),
+            'sensors': sensor_names,
+            **{field: np.array(values, dtype=np.int32) for field, values in zip(COUNT_FIELDS, counts)}
+        }
+
+        row_of = {record_id: index for index, record_id in enumerate(record_ids)}
+        directions = [
+            (row_of[record_id], direction, *values)
+            for record_id, direction, *values in DirectionCount.objects.filter(
+                timestamp__gte=start_time, timestamp__lt=end_time
+            ).values_list('traffic_record_id', 'direction', *COUNT_FIELDS).iterator(
+                chunk_size=ARCHIVE_CHUNK_SIZE
+            )
+            if record_id in row_of
+        ]
+        direction_rows, direction_names, *direction_counts = (
+            list(zip(*directions)) or [()] * (2 + len(COUNT_FIELDS))
+        )
+        names, codes = np.unique(np.array(direction_names, dtype=str), return_inverse=True)
+        columns.update({
+            'direction_row': np.array(direction_rows, dtype=np.int32),
+            'direction': codes.astype(np.int16),
+            'directions': names,
+            **{
+                f'direction_{field}': np.array(values, dtype=np.int32)
+                for field, values in zip(COUNT_FIELDS, direction_counts)
+            }
+        })
+        return columns
+
+    @staticmethod
+    def _write_file(file_name, columns):
+        """Write a month file atomically and check it reads back unchanged"""
+        path = archive_path(file_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f'.{path.name}.tmp')
+        with open(temporary, 'wb') as f:
+            np.savez_compressed(f, **columns)
+            f.flush()
+            os.fsync(f.fileno())
+
+        with np.load(temporary, allow_pickle=False) as written:
+            if set(written.files) != set(columns) or not all(
+                np.array_equal(written[name], array) for name, array in columns.items()
+            ):
+                temporary.unlink()
+                raise ArchiveError(f'{file_name} did not read back correctly')
+        os.replace(temporary, path)
+
+    @staticmethod
+    def archive_month(month):
+        """
+        Move one month of minute rows from the database into its archive file.
+
+        The file is written and verified first; the rows are then deleted in
+        one transaction that fails if the month changed in the meantime.
+        Rollups and data stats are left alone, since the history they describe
+        is unchanged.
+
+        Args:
+            month (datetime): Aware first instant of the month
+
+        Returns:
+            int: Records archived
+
+        Raises:
+            ArchiveError: If the file cannot be verified or rows were added meanwhile
+        """
+        start_time = month_start(month)
+        end_time = add_months(start_time, 1)
+        file_name = f'{start_time:%Y-%m}.npz'
+
+        columns = ArchiveService._read_database(start_time, end_time)
+        count = len(columns['timestamp'])
+        if count:
+            ArchiveService._write_file(file_name, columns)
+        else:
+            # Gaps in the history are recorded without a file
+            file_name = ''
+        timestamps = to_datetimes(columns['timestamp'][[0, -1]]) if count else [None, None]
+
+        with transaction.atomic():
+            DirectionCount.objects.filter(
+                timestamp__gte=start_time, timestamp__lt=end_time
+            ).delete()
+            deleted, _ = TotalCount.objects.filter(
+                timestamp__gte=start_time, timestamp__lt=end_time
+            ).delete()
+            if deleted != count:
+                raise ArchiveError(f'{file_name}: rows changed while archiving, try again')
+            TrafficRecord.objects.filter(
+                timestamp__gte=start_time, timestamp__lt=end_time
+            ).delete()
+            ArchivedMonth.objects.update_or_create(month=start_time.date(), defaults={
+                'file_name': file_name,
+                'record_count': count,
+                'earliest_timestamp': timestamps[0],
+                'latest_timestamp': timestamps[-1]
+            })
+        logger.info('Archived %s records of %s', count, f'{start_time:%Y-%m}')
+        return count
+
+    @staticmethod
+    def closed_months(keep_months=ARCHIVE_KEEP_MONTHS):
+        """
+        Months that are due for archiving, oldest first.
+
+        A month is due once it lies more than `keep_months` whole months
+        before the month of the latest record. Months continue from the
+        current boundary without gaps, so the archive stays contiguous.
+
+        Returns:
+            list: Aware month starts
+        """
+        latest = DataStatsService.get().latest_timestamp
+        if latest is None:
+            return []
+        cutoff = add_months(month_start(latest), -keep_months)
+
+        first = ArchiveService.boundary()
+        if first is None:
+            earliest = TotalCount.objects.order_by('timestamp').values_list(
+                'timestamp', flat=True
+            ).first()
+            if earliest is None:
+                return []
+            first = month_start(earliest)
+
+        months = []
+        while first < cutoff:
+            months.append(first)
+            first = add_months(first, 1)
+        return months
+
+    @staticmethod
+    def archive_closed_months(keep_months=ARCHIVE_KEEP_MONTHS, log=None):
+        """
+        Archive every month that is due, oldest first.
+
+        Returns:
+            list: (month, records) pairs that were archived
+        """
+        archived = []
+        for month in ArchiveService.closed_months(keep_months):
+            count = ArchiveService.archive_month(month)
+            archived.append((month, count))
+            if log:
+                log(f'Archived {month:%Y-%m}: {count} records')
+        return archived
+
+    @staticmethod
+    def clear():
+        """
+        Forget the whole archive, along with the rest of the history.
+
+        Call inside the transaction that deletes the database rows; the files
+        are removed once it commits.
+        """
+        file_names = list(ArchivedMonth.objects.exclude(file_name='').values_list(
+            'file_name', flat=True
+        ))
+        ArchivedMonth.objects.all().delete()
+
+        def remove_files():
+            for file_name in file_names:
+                archive_path(file_name).unlink(missing_ok=True)
+            _read_file.cache_clear()
+        transaction.on_commit(remove_files)
+
+    @staticmethod
+    def vacuum():
+        """Return the space freed by archiving to the filesystem (SQLite VACUUM)"""
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
@@ -0,0 +1,296 @@
+import contextlib
+import io
+import json
+import math
+import platform
+import statistics
+import time
+from datetime import timedelta
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .data_stats import DataStatsService
+from .db_router import READ_ALIAS, read_only_name
+from .generate_mock_data import generate_mock_data
+from .response_cache import get_cache
+from .utils import TimeRangeService, DataAggregationService
+
+
+# Dataset sizes in minute rows
+DATASET_SIZES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+# Relative ranges the dashboard offers, plus a custom range (see custom_range)
+PERIODS = [2, 7, 15, 30]
+
+# Days covered by the custom range, ending CUSTOM_RANGE_OFFSET_DAYS before the latest day
+CUSTOM_RANGE_DAYS = 10
+CUSTOM_RANGE_OFFSET_DAYS = 2
+
+# Endpoints timed for every range; extra query parameters per endpoint
+ENDPOINTS = {
+    'card-data': {},
+    'traffic-volume-data': {},
+    'peak-time-data': {},
+    'dashboard': {},
+    'heatmap': {},
+    'data': {'limit': '1000'},
+}
+
+# Endpoints that do not depend on the range
+RANGELESS_ENDPOINTS = ['latest-data-info']
+
+# Regressions smaller than this are treated as timing noise
+REGRESSION_FLOOR_MS = 5.0
+
+# Seed for the synthetic data, so runs are comparable
+DATASET_SEED = 0
+
+# Private response cache, so clearing it between calls leaves the real one alone
+BENCHMARK_CACHES = {
+    **settings.CACHES,
+    'dashboard': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+}
+
+
+def scratch_database(directory, label):
+    return directory / f'benchmark_{label}.sqlite3'
+
+
+@contextlib.contextmanager
+def use_database(path):
+    """
+    Point the database connections at another SQLite file for the duration.
+
+    Works like the test runner's test database switch, so every service and
+    view runs unchanged against the scratch data. The read-only alias of the
+    production profile follows the default one.
+    """
+    names = {DEFAULT_DB_ALIAS: str(path)}
+    if READ_ALIAS in settings.DATABASES:
+        names[READ_ALIAS] = read_only_name(path)
+    originals = {alias: connections[alias].settings_dict['NAME'] for alias in names}
+    for alias, name in names.items():
+        connections[alias].close()
+        connections[alias].settings_dict['NAME'] = name
+    try:
+        yield
+    finally:
+        for alias, original in originals.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = original
+
+
+def seed_dataset(rows, quiet=True):
+    """
+    Fill the current (scratch) database with at least `rows` minute rows.
+
+    Existing data is reused when it is already large enough, so repeated runs
+    only pay for seeding once.
+
+    Returns:
+        int: Records in the database
+    """
+    call_command('migrate', verbosity=0)
+    stats = DataStatsService.get()
+    if stats.record_count >= rows:
+        return stats.record_count
+
+    output = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        generate_mock_data(days=math.ceil(rows / 1440), seed=DATASET_SEED, seasonal=True)
+    return DataStatsService.get().record_count
+
+
+def custom_range():
+    latest = DataStatsService.get().latest_timestamp
+    end = (latest - timedelta(days=CUSTOM_RANGE_OFFSET_DAYS)).date()
+    start = end - timedelta(days=CUSTOM_RANGE_DAYS - 1)
+    return {'start_date': start.isoformat(), 'end_date': end.isoformat()}
+
+
+def benchmark_ranges():
+    """Query parameters of every benchmarked range, keyed by a short label"""
+    ranges = {f'{period}d': {'period': str(period)} for period in PERIODS}
+    ranges['custom'] = custom_range()
+    return ranges
+
+
+def measure(fn, repeat):
+    """
+    Time `fn` `repeat` times, counting the queries of the first call.
+
+    The dashboard response cache is cleared before every call so each one
+    does the full work.
+
+    Returns:
+        dict: median_ms, min_ms and queries
+    """
+    timings = []
+    queries = None
+    for _ in range(repeat):
+        get_cache().clear()
+        with contextlib.ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in settings.DATABASES
+            ]
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        if queries is None:
+            queries = sum(len(context) for context in captured)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'queries': queries
+    }
+
+
+def _get(client, path, params):
+    response = client.get(path, params)
+    if response.status_code != 200:
+        raise RuntimeError(f'{path} returned {response.status_code}')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def service_calls(params):
+    """DataAggregationService calls for one range, keyed by name"""
+    start_time, end_time, error = TimeRangeService.parse_time_range(
+        params.get('period'), params.get('start_date'), params.get('end_date')
+    )
+    if error:
+        raise RuntimeError(error)
+    prev_start, prev_end = TimeRangeService.get_previous_period(start_time, end_time)
+    return {
+        'get_category_totals': lambda: DataAggregationService.get_category_totals(start_time, end_time),
+        'get_category_totals[previous]': lambda: DataAggregationService.get_category_totals(prev_start, prev_end),
+        'get_daily_volume_data': lambda: DataAggregationService.get_daily_volume_data(start_time, end_time),
+        'get_peaks': lambda: DataAggregationService.get_peaks(start_time, end_time),
+        'get_peaks[hour]': lambda: DataAggregationService.get_peaks(start_time, end_time, bucket='hour'),
+        'get_dashboard_data': lambda: DataAggregationService.get_dashboard_data(start_time, end_time),
+        'get_heatmap': lambda: DataAggregationService.get_heatmap(start_time, end_time),
+        'get_heatmap[minute]': lambda: DataAggregationService.get_heatmap(start_time, end_time, bucket='minute'),
+    }
+
+
+def run_dataset(label, repeat=3):
+    """
+    Benchmark every endpoint and service method against the current database.
+
+    Returns:
+        list: One result dict per (target, range)
+    """
+    client = Client()
+    results = []
+
+    def record(kind, target, range_label, fn):
+        results.append({
+            'dataset': label,
+            'kind': kind,
+            'target': target,
+            'range': range_label,
+            **measure(fn, repeat)
+        })
+
+    for range_label, params in benchmark_ranges().items():
+        for endpoint, extra in ENDPOINTS.items():
+            path = f'/{endpoint}/'
+            record('endpoint', endpoint, range_label, lambda: _get(client, path, {**params, **extra}))
+        for name, call in service_calls(params).items():
+            record('service', name, range_label, call)
+
+    for endpoint in RANGELESS_ENDPOINTS:
+        record('endpoint', endpoint, None, lambda: _get(client, f'/{endpoint}/', {}))
+    return results
+
+
+def run_benchmarks(sizes, scratch_dir, repeat=3, log=print):
+    """
+    Seed (or reuse) a scratch database per size and benchmark it.
+
+    Args:
+        sizes (list): Keys of DATASET_SIZES
+        scratch_dir (Path): Where the scratch databases live
+        repeat (int): Timed calls per target
+        log (callable): Progress output
+
+    Returns:
+        dict: {"meta": ..., "datasets": ..., "results": [...]}, JSON-serializable
+    """
+    scratch_dir.mkdir(parents=True, exist_ok=True)
+    datasets = {}
+    results = []
+    for label in sizes:
+        path = scratch_database(scratch_dir, label)
+        with use_database(path), override_settings(CACHES=BENCHMARK_CACHES):
+            log(f'Preparing {label} dataset in {path}...')
+            started = time.perf_counter()
+            records = seed_dataset(DATASET_SIZES[label])
+            datasets[label] = {
+                'records': records,
+                'seed_seconds': round(time.perf_counter() - started, 1)
+            }
+            log(f'Benchmarking {label} ({records} records)...')
+            results += run_dataset(label, repeat)
+
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'sqlite': connection.Database.sqlite_version,
+            'repeat': repeat,
+            'debug': settings.DEBUG
+        },
+        'datasets': datasets,
+        'results': results
+    }
+
+
+def result_key(result):
+    return (result['dataset'], result['kind'], result['target'], result['range'])
+
+
+def find_regressions(results, baseline, max_ratio):
+    """
+    Compare a run against a baseline run.
+
+    A target regresses when its median time exceeds the baseline's by more
+    than `max_ratio` (and by more than REGRESSION_FLOOR_MS), or when it issues
+    more queries than before.
+
+    Returns:
+        list: Human-readable regression descriptions
+    """
+    previous = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        name = '{} {} {} [{}]'.format(*result_key(result))
+        limit = max(before['median_ms'] * max_ratio, before['median_ms'] + REGRESSION_FLOOR_MS)
+        if result['median_ms'] > limit:
+            regressions.append(
+                f"{name}: {result['median_ms']:.1f}ms vs {before['median_ms']:.1f}ms"
+            )
+        if result['queries'] > before['queries']:
+            regressions.append(
+                f"{name}: {result['queries']} queries vs {before['queries']}"
+            )
+    return regressions
+
+
+def write_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
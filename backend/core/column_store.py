@@ -0,0 +1,425 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta, timezone as dt_timezone
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from .archive import ArchiveService
+from .data_stats import DataStatsService
+from .models import COUNT_FIELDS, TotalCount
+from .rollups import ceil_time, floor_time, segment_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, a single writer is assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+# Columns kept per minute: readings in the minute plus every raw count
+STORE_COLUMNS = ['records'] + COUNT_FIELDS
+
+# Minutes allocated past the newest reading, so appends rarely grow the files
+HEADROOM_MINUTES = 7 * 1440
+
+# Rows read from the database per round trip while building
+BUILD_CHUNK_SIZE = 100000
+
+# Values of settings.AGGREGATION_BACKEND
+BACKENDS = ['sql', 'columns']
+
+META_FILE = 'meta.json'
+LOCK_FILE = '.lock'
+
+
+def minute_of(timestamp):
+    """Epoch minute (UTC) a datetime falls in; naive datetimes are taken as UTC"""
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, dt_timezone.utc)
+    return int(timestamp.timestamp() // 60)
+
+
+def minutes_of(timestamps):
+    """Epoch minutes of a datetime64 array"""
+    return timestamps.astype('datetime64[m]').astype(np.int64)
+
+
+class ColumnStore:
+    """
+    Per-minute prefix sums of the count columns in memory-mapped files.
+
+    Entry i of a column holds the column's total over every minute before
+    base_minute + i. A range total is therefore two lookups, and any minute,
+    hour or day series is one vectorized difference, whatever the range size.
+    Readings need not be minute-aligned: a range's partial minutes at either
+    edge are summed from their rows (database and archive), so every answer
+    equals the SQL backend's.
+
+    The files live in one directory and every worker maps them read-only, so
+    the operating system keeps a single copy in memory. Writers take an
+    exclusive file lock and update the files in place. When the store has to
+    grow they write a new generation of files and switch meta.json over to
+    it; readers notice the new meta.json and map the new files. Readers take
+    a shared lock while they read.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.meta = None
+        self.columns = None
+
+    def _path(self, name, generation):
+        return self.directory / f'{name}-{generation}.npy'
+
+    def exists(self):
+        return (self.directory / META_FILE).exists()
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive=False):
+        if fcntl is None:
+            yield
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.directory / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)
+
+    def _mapped(self):
+        """
+        Current meta and read-only column maps, remapped after a writer switched generations.
+
+        Returns:
+            tuple or None: (meta, columns), None when the store has not been built
+        """
+        try:
+            stat = os.stat(self.directory / META_FILE)
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        with self.lock:
+            if stamp != self.stamp:
+                with open(self.directory / META_FILE) as f:
+                    meta = json.load(f)
+                self.columns = {
+                    name: np.load(self._path(name, meta['generation']), mmap_mode='r')
+                    for name in STORE_COLUMNS
+                }
+                self.meta = meta
+                self.stamp = stamp
+            return self.meta, self.columns
+
+    def _write_generation(self, base_minute, prefixes, previous=None):
+        """Write a full set of column files and point meta.json at them"""
+        generation = (previous['generation'] + 1) if previous else 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for name in STORE_COLUMNS:
+            np.save(self._path(name, generation), prefixes[name])
+
+        meta = {
+            'generation': generation,
+            'base_minute': base_minute,
+            'minutes': len(prefixes['records']) - 1
+        }
+        temporary = self.directory / f'.{META_FILE}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temporary, self.directory / META_FILE)
+
+        if previous:
+            # Readers still holding the old maps keep them until they remap
+            for name in STORE_COLUMNS:
+                self._path(name, previous['generation']).unlink(missing_ok=True)
+
+    def _split(self, meta, start_time, end_time):
+        """
+        Split an inclusive range into whole minutes and partial edge minutes.
+
+        Returns:
+            tuple: (low, high, edges): prefix indexes [low, high] of the whole
+            minutes, clipped to the store, and the half-open segments of the
+            partial minutes at the edges
+        """
+        end_exclusive = end_time + timedelta(microseconds=1)
+        first_minute = ceil_time(start_time, 'minute')
+        last_minute = floor_time(end_exclusive, 'minute')
+        if first_minute >= last_minute:
+            edges = [(start_time, end_exclusive)] if start_time < end_exclusive else []
+            return 0, 0, edges
+
+        base = meta['base_minute']
+        low = min(max(minute_of(first_minute) - base, 0), meta['minutes'])
+        high = min(max(minute_of(last_minute) - base, low), meta['minutes'])
+        edges = [
+            (a, b) for a, b in ((start_time, first_minute), (last_minute, end_exclusive)) if a < b
+        ]
+        return low, high, edges
+
+    @staticmethod
+    def _edge_minutes(edges):
+        """
+        Readings of the partial edge minutes, summed per minute like the store's columns.
+
+        Returns:
+            tuple: (ascending epoch minutes, STORE_COLUMNS to per-minute sums)
+        """
+        rows = segment_rows(edges)
+        if rows is None:
+            return np.zeros(0, dtype=np.int64), {
+                name: np.zeros(0, dtype=np.int64) for name in STORE_COLUMNS
+            }
+        minutes, groups = np.unique(minutes_of(rows['timestamp']), return_inverse=True)
+        sums = {name: np.zeros(len(minutes), dtype=np.int64) for name in STORE_COLUMNS}
+        np.add.at(sums['records'], groups, 1)
+        for field in COUNT_FIELDS:
+            np.add.at(sums[field], groups, rows[field])
+        return minutes, sums
+
+    def sum_range(self, start_time, end_time):
+        """
+        Totals of the raw count columns over an inclusive range.
+
+        Returns:
+            dict or None: Field name to total, None when the store is not built
+        """
+        mapped = self._mapped()
+        if mapped is None:
+            return None
+        meta, columns = mapped
+        low, high, edges = self._split(meta, start_time, end_time)
+        with self._locked():
+            totals = {field: int(columns[field][high] - columns[field][low]) for field in COUNT_FIELDS}
+        _, edge_sums = self._edge_minutes(edges)
+        return {field: totals[field] + int(edge_sums[field].sum()) for field in COUNT_FIELDS}
+
+    def daily_range(self, start_time, end_time):
+        """
+        Per-date totals over an inclusive range, like RollupService.daily_range.
+
+        Returns:
+            list or None: Dicts with 'date' and one total per raw field for
+            dates that have readings, None when the store is not built
+        """
+        mapped = self._mapped()
+        if mapped is None:
+            return None
+        meta, columns = mapped
+        base = meta['base_minute']
+        low, high, edges = self._split(meta, start_time, end_time)
+
+        by_day = {}
+        if low < high:
+            # Prefix indexes of every midnight inside the range, plus both ends
+            first_day = (base + low) // 1440 + 1
+            last_day = (base + high - 1) // 1440
+            day_edges = np.r_[low, np.arange(first_day, last_day + 1) * 1440 - base, high]
+            with self._locked():
+                sums = {name: np.diff(columns[name][day_edges]) for name in STORE_COLUMNS}
+            days = [(base + low) // 1440] + list(range(first_day, last_day + 1))
+            for index, day in enumerate(days):
+                by_day[day] = {name: int(sums[name][index]) for name in STORE_COLUMNS}
+
+        minutes, edge_sums = self._edge_minutes(edges)
+        for index, minute in enumerate(minutes.tolist()):
+            entry = by_day.setdefault(minute // 1440, {name: 0 for name in STORE_COLUMNS})
+            for name in STORE_COLUMNS:
+                entry[name] += int(edge_sums[name][index])
+
+        epoch = date(1970, 1, 1)
+        return [
+            dict(
+                date=epoch + timedelta(days=day),
+                **{field: by_day[day][field] for field in COUNT_FIELDS}
+            )
+            for day in sorted(by_day)
+            if by_day[day]['records']
+        ]
+
+    def rows(self, start_time, end_time):
+        """
+        Per-minute totals over an inclusive range, for minutes with readings.
+
+        A partial minute at an edge only counts its readings inside the range.
+
+        Returns:
+            dict or None: 'timestamp' (datetime64[us] minute starts) and one
+            array per raw field; None when the store is not built or the
+            range holds no readings
+        """
+        mapped = self._mapped()
+        if mapped is None:
+            return None
+        meta, columns = mapped
+        low, high, edges = self._split(meta, start_time, end_time)
+        with self._locked():
+            values = {name: np.diff(columns[name][low:high + 1]) for name in STORE_COLUMNS}
+        minutes = meta['base_minute'] + low + np.arange(len(values['records']))
+
+        edge_minutes, edge_sums = self._edge_minutes(edges)
+        minutes = np.concatenate([minutes, edge_minutes])
+        values = {name: np.concatenate([values[name], edge_sums[name]]) for name in STORE_COLUMNS}
+        present = np.flatnonzero(values['records'])
+        if not len(present):
+            return None
+        present = present[np.argsort(minutes[present], kind='stable')]
+        return {
+            'timestamp': minutes[present].astype('datetime64[m]').astype('datetime64[us]'),
+            **{field: values[field][present] for field in COUNT_FIELDS}
+        }
+
+    def add(self, minutes, counts):
+        """
+        Account for new readings. Does nothing until the store has been built.
+
+        Args:
+            minutes (np.ndarray): Epoch minute of every reading
+            counts (dict): Raw field name to an array of counts per reading
+        """
+        if not len(minutes) or not self.exists():
+            return
+        minutes = np.asarray(minutes, dtype=np.int64)
+        first, last = int(minutes.min()), int(minutes.max())
+        deltas = {'records': np.ones(len(minutes), dtype=np.int64)}
+        deltas.update({field: np.asarray(counts[field], dtype=np.int64) for field in COUNT_FIELDS})
+
+        with self._locked(exclusive=True):
+            meta, _ = self._mapped()
+            if first < meta['base_minute'] or last >= meta['base_minute'] + meta['minutes']:
+                meta = self._grow(meta, first, last)
+
+            base = meta['base_minute']
+            offset = first - base
+            for name in STORE_COLUMNS:
+                per_minute = np.zeros(last - first + 1, dtype=np.int64)
+                np.add.at(per_minute, minutes - first, deltas[name])
+                prefix = np.load(self._path(name, meta['generation']), mmap_mode='r+')
+                # Every prefix after a changed minute moves by the running change
+                prefix[offset + 1:offset + len(per_minute) + 1] += np.cumsum(per_minute)
+                prefix[offset + len(per_minute) + 1:] += per_minute.sum()
+                prefix.flush()
+                del prefix
+
+    def add_readings(self, timestamps, totals):
+        """add() for datetimes and per-reading totals dicts, as ingestion has them"""
+        self.add(
+            np.array([minute_of(timestamp) for timestamp in timestamps], dtype=np.int64),
+            {field: [counts[field] for counts in totals] for field in COUNT_FIELDS}
+        )
+
+    def _grow(self, meta, first, last):
+        """Rewrite the files so they cover [first, last] plus headroom (exclusive lock held)"""
+        old_base, old_minutes = meta['base_minute'], meta['minutes']
+        base = min(old_base, first - first % 1440)
+        minutes = max(old_base + old_minutes, last + 1) + HEADROOM_MINUTES - base
+        shift = old_base - base
+
+        prefixes = {}
+        for name in STORE_COLUMNS:
+            old = np.load(self._path(name, meta['generation']), mmap_mode='r')
+            prefix = np.empty(minutes + 1, dtype=np.int64)
+            prefix[:shift] = 0
+            prefix[shift:shift + old_minutes + 1] = old
+            prefix[shift + old_minutes + 1:] = old[-1]
+            prefixes[name] = prefix
+        self._write_generation(base, prefixes, previous=meta)
+        logger.info('Column store grown to %s minutes', minutes)
+        return self._mapped()[0]
+
+    def build(self, log=None):
+        """
+        Build the store from scratch from the archive and the database.
+
+        The new files replace the old ones in one step, so readers keep using
+        the old store until the build is done. Pause ingestion while building:
+        readings written meanwhile may be missed or counted twice.
+
+        Returns:
+            int: Readings added
+        """
+        stats = DataStatsService.get()
+        if stats.latest_timestamp is None:
+            base, minutes = minute_of(timezone.now()), 0
+        else:
+            base = minute_of(stats.earliest_timestamp)
+            base -= base % 1440
+            minutes = minute_of(stats.latest_timestamp) + 1 + HEADROOM_MINUTES - base
+        per_minute = {name: np.zeros(minutes, dtype=np.int64) for name in STORE_COLUMNS}
+        added = 0
+
+        def accumulate(timestamps, counts):
+            nonlocal added
+            indexes = minutes_of(timestamps) - base
+            np.add.at(per_minute['records'], indexes, 1)
+            for field in COUNT_FIELDS:
+                np.add.at(per_minute[field], indexes, counts[field])
+            added += len(indexes)
+            if log:
+                log(f'Read {added} readings...')
+
+        for rows in ArchiveService.iter_months(None, None):
+            accumulate(rows['timestamp'], rows)
+
+        boundary = ArchiveService.boundary()
+        queryset = TotalCount.objects.order_by('timestamp').values_list('timestamp', *COUNT_FIELDS)
+        if boundary:
+            queryset = queryset.filter(timestamp__gte=boundary)
+        chunk = []
+        for row in queryset.iterator(chunk_size=BUILD_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) == BUILD_CHUNK_SIZE:
+                accumulate(*self._unzip(chunk))
+                chunk = []
+        if chunk:
+            accumulate(*self._unzip(chunk))
+
+        prefixes = {
+            name: np.concatenate([[0], np.cumsum(values)]) for name, values in per_minute.items()
+        }
+        with self._locked(exclusive=True):
+            mapped = self._mapped()
+            self._write_generation(base, prefixes, previous=mapped[0] if mapped else None)
+        return added
+
+    @staticmethod
+    def _unzip(rows):
+        timestamps, *counts = zip(*rows)
+        return (
+            np.array([timestamp.replace(tzinfo=None) for timestamp in timestamps], dtype='datetime64[us]'),
+            {field: np.array(values, dtype=np.int64) for field, values in zip(COUNT_FIELDS, counts)}
+        )
+
+    def clear(self):
+        """Remove the store; aggregation falls back to SQL until it is rebuilt"""
+        with self._locked(exclusive=True):
+            (self.directory / META_FILE).unlink(missing_ok=True)
+            for path in self.directory.glob('*.npy'):
+                path.unlink()
+        with self.lock:
+            self.stamp = self.meta = self.columns = None
+
+
+column_store = ColumnStore(settings.COLUMN_STORE_DIR)
+
+
+def get_column_store():
+    """
+    The column store when it is the configured aggregation backend and built.
+
+    Returns:
+        ColumnStore or None: None means aggregate with SQL
+    """
+    if settings.AGGREGATION_BACKEND not in BACKENDS:
+        raise ImproperlyConfigured(f"AGGREGATION_BACKEND must be one of {BACKENDS}")
+    if settings.AGGREGATION_BACKEND != 'columns' or not column_store.exists():
+        return None
+    return column_store
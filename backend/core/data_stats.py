@@ -0,0 +1,86 @@
+from django.db.models import Count, DateTimeField, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from .models import ArchivedMonth, DataStats, TrafficRecord
+
+
+# Primary key of the one DataStats row
+STATS_ID = 1
+
+
+class DataStatsService:
+    """
+    Service for the maintained summary of stored traffic history.
+
+    Writers report what they inserted or removed inside their own
+    transaction, so the latest/earliest timestamp and the record count can be
+    read with a single primary key lookup instead of scanning traffic_record.
+    """
+
+    @staticmethod
+    def get():
+        """
+        Get the current stats, computing them once if the row is missing.
+
+        Returns:
+            DataStats: record_count, earliest_timestamp and latest_timestamp
+        """
+        try:
+            return DataStats.objects.get(pk=STATS_ID)
+        except DataStats.DoesNotExist:
+            return DataStatsService.recompute()
+
+    @staticmethod
+    def record_inserted(count, earliest, latest):
+        """
+        Account for `count` new records between `earliest` and `latest`.
+
+        Call inside the transaction that wrote the records.
+        """
+        if not count:
+            return
+        earliest = Value(earliest, output_field=DateTimeField())
+        latest = Value(latest, output_field=DateTimeField())
+        updated = DataStats.objects.filter(pk=STATS_ID).update(
+            record_count=F('record_count') + count,
+            # NULL on an empty history makes LEAST/GREATEST NULL too
+            earliest_timestamp=Coalesce(Least('earliest_timestamp', earliest), earliest),
+            latest_timestamp=Coalesce(Greatest('latest_timestamp', latest), latest)
+        )
+        if not updated:
+            DataStatsService.recompute()
+
+    @staticmethod
+    def reset():
+        """Mark the history as empty, after all records were deleted"""
+        DataStats.objects.update_or_create(pk=STATS_ID, defaults={
+            'record_count': 0,
+            'earliest_timestamp': None,
+            'latest_timestamp': None
+        })
+
+    @staticmethod
+    def recompute():
+        """
+        Recompute the stats from traffic_record with one full scan.
+
+        Archived months count as stored history too.
+
+        Returns:
+            DataStats: The refreshed row
+        """
+        stats = TrafficRecord.objects.aggregate(
+            record_count=Count('id'),
+            earliest_timestamp=Min('timestamp'),
+            latest_timestamp=Max('timestamp')
+        )
+        archived = ArchivedMonth.objects.aggregate(
+            record_count=Sum('record_count'),
+            earliest_timestamp=Min('earliest_timestamp'),
+            latest_timestamp=Max('latest_timestamp')
+        )
+        stats['record_count'] += archived['record_count'] or 0
+        for key, pick in (('earliest_timestamp', min), ('latest_timestamp', max)):
+            found = [value for value in (stats[key], archived[key]) if value is not None]
+            stats[key] = pick(found) if found else None
+        row, _ = DataStats.objects.update_or_create(pk=STATS_ID, defaults=stats)
+        return row
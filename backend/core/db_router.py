@@ -0,0 +1,36 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Alias of the read-only connection (see DATABASE_PROFILE in settings)
+READ_ALIAS = 'readonly'
+
+
+def read_only_name(path):
+    """NAME of a read-only SQLite connection to the database file at `path`"""
+    return f'file:{path}?mode=ro'
+
+
+class ReadWriteRouter:
+    """
+    Send reads to the read-only connection and everything else to the writer.
+
+    Both connections open the same WAL-mode SQLite file, so reads always see
+    committed data and never wait for an ingest or generator transaction to
+    finish. Reads made inside a transaction on the writer stay on the writer,
+    so they see that transaction's own uncommitted rows.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same database file behind both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
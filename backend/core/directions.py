@@ -0,0 +1,306 @@
+import numpy as np
+from datetime import timedelta
+from django.db.models import F, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncHour
+from .archive import ArchiveService, to_datetimes
+from .models import COUNT_FIELDS, DirectionCount, HourlyDirectionCount, DailyDirectionCount
+from .rollups import RollupService, ceil_time, fields_expression, floor_time, split_range
+from .utils import CATEGORY_PEAK_FIELDS, PEAK_BUCKETS, PEAK_COLUMNS, DataAggregationService
+
+
+# Approaches of an intersection, in the order of the matrix rows and columns
+APPROACHES = ['N', 'E', 'S', 'W']
+
+# Categories the directional views report, as sums of raw columns
+DIRECTION_CATEGORIES = {**PEAK_COLUMNS, 'total': COUNT_FIELDS}
+
+# HourlyDirectionCount column holding each category's highest reading per hour
+DIRECTION_PEAK_FIELDS = {**CATEGORY_PEAK_FIELDS, 'total': 'total_peak'}
+
+DEFAULT_DIRECTION_CATEGORY = 'total'
+
+
+def split_direction(direction):
+    """Movement code to its (origin, destination) approaches, e.g. 'S_W' -> ('S', 'W')"""
+    origin, _, destination = direction.partition('_')
+    return origin, destination
+
+
+def _sum_by(groups, size, values):
+    """Exact int64 sums of `values` per group index"""
+    sums = np.zeros(size, dtype=np.int64)
+    np.add.at(sums, groups, values)
+    return sums
+
+
+class DirectionService:
+    """
+    Service for turning-movement (origin-destination) analysis.
+
+    Reads follow the same tiers as the single-total views: whole days and
+    hours come from the per-direction rollups with one grouped query each,
+    partial hours from the covering index on direction_count and archived
+    months from their files, so the cost grows with the number of buckets,
+    not with the twelve movements of an intersection.
+    """
+
+    @staticmethod
+    def sum_range(start_time, end_time):
+        """
+        Sum raw counts per direction over an inclusive range using the rollups.
+
+        Returns:
+            dict: Direction code to {field: total}, only for directions with rows
+        """
+        segments = split_range(start_time, end_time)
+        totals = {}
+
+        def merge(direction, values):
+            entry = totals.setdefault(direction, {field: 0 for field in COUNT_FIELDS})
+            for field in COUNT_FIELDS:
+                entry[field] += values[field]
+
+        querysets = []
+        if segments['daily']:
+            first_day, last_day = segments['daily']
+            querysets.append(DailyDirectionCount.objects.filter(
+                bucket__gte=first_day.date(), bucket__lt=last_day.date()
+            ))
+        for segment_start, segment_end in segments['hourly']:
+            querysets.append(HourlyDirectionCount.objects.filter(
+                bucket__gte=segment_start, bucket__lt=segment_end
+            ))
+        boundary = ArchiveService.boundary() if segments['minute'] else None
+        for segment_start, segment_end in segments['minute']:
+            querysets.append(DirectionCount.objects.filter(
+                timestamp__gte=segment_start,
+                timestamp__lt=segment_end
+            ))
+            if boundary and segment_start < boundary:
+                archived = ArchiveService.direction_columns(segment_start, min(segment_end, boundary))
+                if archived is not None:
+                    names, codes = np.unique(archived['direction'], return_inverse=True)
+                    sums = {
+                        field: _sum_by(codes, len(names), archived[field]).tolist()
+                        for field in COUNT_FIELDS
+                    }
+                    for index, direction in enumerate(names.tolist()):
+                        merge(direction, {field: sums[field][index] for field in COUNT_FIELDS})
+
+        for queryset in querysets:
+            rows = queryset.values('direction').annotate(**RollupService._sums()).order_by()
+            for row in rows:
+                merge(row['direction'], RollupService._unpack(row))
+        return totals
+
+    @staticmethod
+    def get_totals(start_time, end_time):
+        """
+        Per-direction category totals over an inclusive range.
+
+        Returns:
+            list: Dicts with direction, origin, destination and one total per
+            category (including 'total'), ordered by direction
+        """
+        result = []
+        for direction, values in sorted(DirectionService.sum_range(start_time, end_time).items()):
+            origin, destination = split_direction(direction)
+            result.append({
+                'direction': direction,
+                'origin': origin,
+                'destination': destination,
+                **{
+                    category: sum(values[field] for field in fields)
+                    for category, fields in DIRECTION_CATEGORIES.items()
+                }
+            })
+        return result
+
+    @staticmethod
+    def get_od_matrix(start_time, end_time, category=DEFAULT_DIRECTION_CATEGORY):
+        """
+        Origin-destination matrix of one category over an inclusive range.
+
+        Rows are origins and columns destinations, both in APPROACHES order;
+        the diagonal holds U-turns.
+
+        Returns:
+            dict: category, approaches, matrix, origin_totals and destination_totals
+        """
+        fields = DIRECTION_CATEGORIES[category]
+        matrix = [[0] * len(APPROACHES) for _ in APPROACHES]
+        for direction, values in DirectionService.sum_range(start_time, end_time).items():
+            origin, destination = split_direction(direction)
+            if origin in APPROACHES and destination in APPROACHES:
+                matrix[APPROACHES.index(origin)][APPROACHES.index(destination)] = sum(
+                    values[field] for field in fields
+                )
+        return {
+            'category': category,
+            'approaches': APPROACHES,
+            'matrix': matrix,
+            'origin_totals': [sum(row) for row in matrix],
+            'destination_totals': [sum(column) for column in zip(*matrix)]
+        }
+
+    @staticmethod
+    def get_peaks(start_time, end_time, top_n=1, bucket='minute', category=DEFAULT_DIRECTION_CATEGORY):
+        """
+        Top-N peaks of every direction for one category.
+
+        Each direction is ranked by a ROW_NUMBER() window partitioned by
+        direction, so all movements come from one query. Hourly peaks read
+        whole hours from the hourly direction rollup and only the partial
+        hours at the edges from minute rows. Minute peaks only rank the minute
+        rows of each direction's top-N hours by hourly maximum (plus the
+        partial edges), which always contain its top-N readings. Ties go to
+        the earliest moment.
+
+        Args:
+            start_time (datetime): Start time
+            end_time (datetime): End time
+            top_n (int): Number of peaks to return per direction
+            bucket (str): 'minute' for single readings, 'hour' for hourly sums
+            category (str): Key of DIRECTION_CATEGORIES
+
+        Returns:
+            list: Dicts with direction, origin, destination and a 'peaks' list
+            of peak_hour/peak_date/peak_value/timestamp dicts, highest first
+        """
+        if bucket not in PEAK_BUCKETS:
+            raise ValueError(f"Invalid peak bucket: {bucket}")
+        if category not in DIRECTION_CATEGORIES:
+            raise ValueError(f"Invalid category: {category}")
+
+        value = fields_expression(DIRECTION_CATEGORIES[category])
+        candidates = {}
+        end_exclusive = end_time + timedelta(microseconds=1)
+
+        if bucket == 'hour':
+            first_hour = ceil_time(start_time, 'hour')
+            last_hour = floor_time(end_exclusive, 'hour')
+            if first_hour < last_hour:
+                DirectionService._rank_queryset(
+                    HourlyDirectionCount.objects.filter(
+                        bucket__gte=first_hour, bucket__lt=last_hour
+                    ).values('direction', moment=F('bucket'), value=value),
+                    top_n, candidates
+                )
+            # At most two partial hours remain, summed per direction and hour
+            for segment_start, segment_end in split_range(start_time, end_time)['minute']:
+                DirectionService._collect(
+                    DirectionCount.objects.filter(
+                        timestamp__gte=segment_start, timestamp__lt=segment_end
+                    ).values('direction', moment=TruncHour('timestamp')).annotate(
+                        value=Sum(value)
+                    ).order_by(),
+                    candidates
+                )
+                DirectionService._rank_archived(
+                    segment_start, segment_end, category, top_n, bucket, candidates
+                )
+        else:
+            boundary = DirectionService._rank_archived(
+                start_time, end_exclusive, category, top_n, bucket, candidates
+            )
+            if boundary and start_time < boundary:
+                start_time = boundary
+            if start_time <= end_time:
+                DirectionService._rank_queryset(
+                    DirectionCount.objects.filter(
+                        DirectionService._candidate_minutes(start_time, end_time, top_n, category)
+                    ).values('direction', moment=F('timestamp'), value=value),
+                    top_n, candidates
+                )
+
+        peaks = DataAggregationService._top_peaks(candidates, top_n)
+        result = []
+        for direction in sorted(peaks):
+            origin, destination = split_direction(direction)
+            result.append({
+                'direction': direction,
+                'origin': origin,
+                'destination': destination,
+                'peaks': peaks[direction]
+            })
+        return result
+
+    @staticmethod
+    def _candidate_minutes(start_time, end_time, top_n, category):
+        """
+        Filter for the minute rows that can hold a direction's top-N readings.
+
+        Returns:
+            Q: The partial hours at the range edges plus every hour that is
+            among the top-N hours of some direction by its category maximum
+        """
+        first_hour = ceil_time(start_time, 'hour')
+        last_hour = floor_time(end_time + timedelta(microseconds=1), 'hour')
+        if first_hour >= last_hour:
+            return Q(timestamp__range=(start_time, end_time))
+
+        hours = HourlyDirectionCount.objects.filter(
+            bucket__gte=first_hour, bucket__lt=last_hour
+        ).annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('direction')],
+            order_by=[F(DIRECTION_PEAK_FIELDS[category]).desc(), F('bucket').asc()]
+        )).filter(rank__lte=top_n).values_list('bucket', flat=True)
+
+        condition = (
+            Q(timestamp__gte=start_time, timestamp__lt=first_hour) |
+            Q(timestamp__gte=last_hour, timestamp__lte=end_time)
+        )
+        for hour in sorted(set(hours)):
+            condition |= Q(timestamp__gte=hour, timestamp__lt=hour + timedelta(hours=1))
+        return condition
+
+    @staticmethod
+    def _rank_queryset(queryset, top_n, candidates):
+        """Add the top-N (value, moment) rows per direction of a direction/moment/value queryset"""
+        DirectionService._collect(
+            queryset.annotate(rank=Window(
+                RowNumber(),
+                partition_by=[F('direction')],
+                order_by=[F('value').desc(), F('moment').asc()]
+            )).filter(rank__lte=top_n).order_by(),
+            candidates
+        )
+
+    @staticmethod
+    def _collect(rows, candidates):
+        for row in rows:
+            candidates.setdefault(row['direction'], []).append((int(row['value'] or 0), row['moment']))
+
+    @staticmethod
+    def _rank_archived(start_time, end_time, category, top_n, bucket, candidates):
+        """
+        Add top-N candidates per direction from archived rows in [start_time, end_time).
+
+        Returns:
+            datetime or None: The archive boundary
+        """
+        boundary = ArchiveService.boundary()
+        if not boundary or start_time >= boundary:
+            return boundary
+        columns = ArchiveService.direction_columns(start_time, min(end_time, boundary))
+        if columns is None:
+            return boundary
+
+        values = sum(columns[field] for field in DIRECTION_CATEGORIES[category])
+        moments = columns['timestamp']
+        if bucket == 'hour':
+            moments = moments.astype('datetime64[h]')
+        names, codes = np.unique(columns['direction'], return_inverse=True)
+        for code, direction in enumerate(names.tolist()):
+            found = codes == code
+            direction_moments, direction_values = moments[found], values[found]
+            if bucket == 'hour':
+                direction_moments, groups = np.unique(direction_moments, return_inverse=True)
+                direction_values = _sum_by(groups, len(direction_moments), direction_values)
+            # Highest value first, earliest moment on ties
+            top = np.lexsort((direction_moments, -direction_values))[:top_n]
+            candidates.setdefault(direction, []).extend(
+                zip(direction_values[top].tolist(), to_datetimes(direction_moments[top]))
+            )
+        return boundary
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Points kept by largest-triangle-three-buckets (LTTB) downsampling.
+
+    The first and last points are always kept. The points in between are
+    split into threshold - 2 buckets of equal size, and each bucket keeps
+    the point that spans the largest triangle with the previously kept
+    point and the mean of the next bucket. Peaks and dips survive, unlike
+    with plain averaging or striding.
+
+    Args:
+        x (np.ndarray): Ascending x values
+        y (np.ndarray): y values
+        threshold (int): Points to keep, at least 3
+
+    Returns:
+        np.ndarray: Ascending indices of the kept points (all of them when
+        there are no more than `threshold`)
+    """
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i holds points [edges[i], edges[i + 1]); the last point is its own bucket
+    edges = np.r_[
+        (np.arange(threshold - 1) * (count - 2) / (threshold - 2)).astype(np.int64) + 1,
+        count
+    ]
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x, edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y, edges[:-1]) / sizes
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Twice the triangle areas; only the argmax matters
+        areas = np.abs(
+            (x[previous] - mean_x[bucket + 1]) * (y[start:end] - y[previous]) -
+            (x[previous] - x[start:end]) * (mean_y[bucket + 1] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    kept[-1] = count - 1
+    return kept
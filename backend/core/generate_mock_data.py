@@ -1,85 +1,275 @@
-from django.core.management.base import BaseCommand
 from django.utils import timezone
-import random
 import numpy as np
-from datetime import datetime, timedelta
-from django.db import transaction
-from .models import TrafficRecord, TotalCount
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connection, transaction
+from django.db.models import Max
+from .column_store import column_store, minutes_of
+from .data_stats import DataStatsService
+from .models import HOURLY_PEAK_FIELDS, TrafficRecord, TotalCount, DirectionCount
+from .rollups import COUNT_FIELDS, RollupService
 
-def get_completely_random_count():
+# Upper bounds (inclusive) for the completely random mode
+RANDOM_COUNT_RANGES = {
+    'pedestrian': 200,
+    'two_wheeler': 150,
+    'car': 100,
+    'bus': 50,
+    'truck': 30
+}
+
+# Mean counts per minute at the busiest time of a weekday (seasonal mode)
+SEASONAL_BASE_RATES = {
+    'pedestrian': 90,
+    'two_wheeler': 70,
+    'car': 50,
+    'bus': 12,
+    'truck': 10
+}
+
+# Day-of-week multipliers, Monday first (seasonal mode)
+WEEKLY_FACTORS = {
+    'pedestrian': [1.0, 1.0, 1.0, 1.0, 1.05, 1.15, 1.1],
+    'two_wheeler': [1.0, 1.0, 1.0, 1.0, 1.0, 0.8, 0.65],
+    'car': [1.0, 1.0, 1.0, 1.0, 1.05, 0.85, 0.7],
+    'bus': [1.0, 1.0, 1.0, 1.0, 1.0, 0.7, 0.55],
+    'truck': [1.0, 1.0, 1.0, 1.0, 1.0, 0.5, 0.35]
+}
+
+# Share of each turning movement in every category (directions mode); the
+# four through movements carry a bit over half of the traffic
+MOVEMENT_SHARES = {
+    'N_S': 0.15, 'S_N': 0.15, 'E_W': 0.12, 'W_E': 0.12,
+    'N_E': 0.0575, 'N_W': 0.0575, 'S_E': 0.0575, 'S_W': 0.0575,
+    'E_N': 0.0575, 'E_S': 0.0575, 'W_N': 0.0575, 'W_S': 0.0575
+}
+
+DEFAULT_DAYS = 60
+DEFAULT_BATCH_SIZE = 50000
+
+
+def daily_profile(hours):
     """
-    Generate completely random counts with wide ranges and no patterns.
-    Each call will be completely independent and random.
+    Relative traffic intensity for fractional hours of the day.
+
+    Quiet nights, a morning rush around 08:30, a midday plateau and a wider
+    evening rush around 18:00. Peaks are close to 1.0.
     """
-    return {
-        'pedestrian': random.randint(0, 200),      # 0-200 pedestrians
-        'two_wheeler': random.randint(0, 150),     # 0-150 two-wheelers
-        'car': random.randint(0, 100),             # 0-100 cars
-        'bus': random.randint(0, 50),              # 0-50 buses
-        'truck': random.randint(0, 30)             # 0-30 trucks
-    }
-
-def generate_mock_data():
-    try:
-        # Get the latest record in the database
-        latest_record = TrafficRecord.objects.order_by('-timestamp').first()
-        now = timezone.now()
-
-        if not latest_record:
-            print("No existing records found. Starting from 2 months ago...")
-            # If no records exist, start from 2 months ago
-            latest_record = TrafficRecord.objects.create(timestamp=now - timedelta(days=60))
-            # Create initial total counts with completely random values
-            counts = get_completely_random_count()
-            TotalCount.objects.create(
-                traffic_record=latest_record,
-                pedestrian=counts['pedestrian'],
-                two_wheeler=counts['two_wheeler'],
-                car=counts['car'],
-                bus=counts['bus'],
-                truck=counts['truck']
+    morning = np.exp(-((hours - 8.5) ** 2) / (2 * 1.5 ** 2))
+    midday = 0.45 * np.exp(-((hours - 13.0) ** 2) / (2 * 2.5 ** 2))
+    evening = np.exp(-((hours - 18.0) ** 2) / (2 * 2.0 ** 2))
+    return 0.08 + 0.92 * np.clip(morning + midday + evening, 0, 1)
+
+
+def generate_counts(rng, timestamps, seasonal=False, rows_per_minute=1):
+    """
+    Generate counts for a batch of timestamps as NumPy arrays.
+
+    Args:
+        rng (np.random.Generator): Random source
+        timestamps (np.ndarray): datetime64[s] values (UTC)
+        seasonal (bool): Poisson counts with daily/weekly seasonality instead
+            of uniform random values
+        rows_per_minute (int): Readings per minute; seasonal rates are split
+            between them
+
+    Returns:
+        dict: Field name to int array
+    """
+    size = len(timestamps)
+    if not seasonal:
+        return {
+            field: rng.integers(0, high + 1, size=size)
+            for field, high in RANDOM_COUNT_RANGES.items()
+        }
+
+    seconds = timestamps.astype('datetime64[s]').astype(np.int64)
+    hours = (seconds % 86400) / 3600.0
+    # 1970-01-01 was a Thursday; shift so Monday is 0
+    weekdays = (seconds // 86400 + 3) % 7
+    profile = daily_profile(hours)
+
+    counts = {}
+    for field, base_rate in SEASONAL_BASE_RATES.items():
+        weekly = np.asarray(WEEKLY_FACTORS[field])[weekdays]
+        counts[field] = rng.poisson(base_rate * profile * weekly / rows_per_minute)
+    return counts
+
+
+def _insert_batch(record_ids, timestamps, counts):
+    """Insert one batch of TrafficRecord/TotalCount rows with executemany"""
+    # Match the format Django's SQLite backend stores aware datetimes in (naive UTC)
+    stamps = np.char.replace(np.datetime_as_string(timestamps, unit='s'), 'T', ' ').tolist()
+    ids = record_ids.tolist()
+    record_table = TrafficRecord._meta.db_table
+    count_table = TotalCount._meta.db_table
+    columns = ', '.join(COUNT_FIELDS)
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {record_table} (id, timestamp) VALUES (%s, %s)',
+            zip(ids, stamps)
+        )
+        cursor.executemany(
+            f'INSERT INTO {count_table} (traffic_record_id, timestamp, {columns}) '
+            f'VALUES (%s, %s, {", ".join(["%s"] * len(COUNT_FIELDS))})',
+            zip(ids, stamps, *(counts[field].tolist() for field in COUNT_FIELDS))
+        )
+
+
+def _insert_directions(rng, record_ids, timestamps, counts):
+    """Split a batch's counts across MOVEMENT_SHARES and insert the DirectionCount rows"""
+    stamps = np.char.replace(np.datetime_as_string(timestamps, unit='s'), 'T', ' ')
+    movements = list(MOVEMENT_SHARES)
+    shares = list(MOVEMENT_SHARES.values())
+    # (rows, movements) counts per field that add up to the row totals
+    split = {field: rng.multinomial(counts[field], shares) for field in COUNT_FIELDS}
+    table = DirectionCount._meta.db_table
+    columns = ', '.join(COUNT_FIELDS)
+
+    with connection.cursor() as cursor:
+        for index, movement in enumerate(movements):
+            cursor.executemany(
+                f'INSERT INTO {table} (traffic_record_id, timestamp, direction, {columns}) '
+                f'VALUES (%s, %s, %s, {", ".join(["%s"] * len(COUNT_FIELDS))})',
+                zip(
+                    record_ids.tolist(), stamps.tolist(), [movement] * len(record_ids),
+                    *(split[field][:, index].tolist() for field in COUNT_FIELDS)
+                )
             )
 
-        # Calculate the time difference between the latest record and now
-        time_diff = now - latest_record.timestamp
 
-        # If the difference is less than a minute, no need to generate mock data
-        if time_diff.total_seconds() < 60:
+def _accumulate_hourly(hourly, timestamps, counts):
+    """
+    Merge a batch's per-hour figures into `hourly`.
+
+    `hourly` maps the epoch hour to an array of the record count, one sum per
+    COUNT_FIELDS entry and one maximum per HOURLY_PEAK_FIELDS entry.
+    """
+    hours = timestamps.astype('datetime64[h]').astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+    columns = np.column_stack(
+        [np.ones(len(hours), dtype=np.int64)] + [counts[field] for field in COUNT_FIELDS]
+    )
+    readings = np.column_stack([
+        sum(counts[field] for field in fields).astype(np.int64)
+        for fields in HOURLY_PEAK_FIELDS.values()
+    ])
+    figures = np.hstack([
+        np.add.reduceat(columns, starts, axis=0),
+        np.maximum.reduceat(readings, starts, axis=0)
+    ])
+    summed = columns.shape[1]
+    for hour, row in zip(hours[starts].tolist(), figures):
+        if hour in hourly:
+            merged = hourly[hour]
+            row = np.r_[merged[:summed] + row[:summed], np.maximum(merged[summed:], row[summed:])]
+        hourly[hour] = row
+
+
+def _hourly_rows(hourly):
+    """Convert accumulated figures into rows for RollupService.load_hourly"""
+    rows = []
+    for hour, figures in sorted(hourly.items()):
+        values = figures.tolist()
+        rows.append(dict(
+            bucket=datetime.fromtimestamp(hour * 3600, dt_timezone.utc),
+            record_count=values[0],
+            **dict(zip(COUNT_FIELDS, values[1:])),
+            **dict(zip(HOURLY_PEAK_FIELDS, values[1 + len(COUNT_FIELDS):]))
+        ))
+    return rows
+
+
+def generate_mock_data(days=None, rows_per_minute=1, seed=None, seasonal=False,
+                       batch_size=DEFAULT_BATCH_SIZE, directions=False):
+    """
+    Generate mock traffic data from the latest record (or `days` ago) up to now.
+
+    Counts are produced in NumPy batches and written with executemany, one
+    transaction per batch, so readers are not locked out for the whole run.
+
+    Args:
+        days (int): Span to cover when the database is empty, or the most
+            history to add when it is not (default: 60 days / fill the gap)
+        rows_per_minute (int): Readings per minute, must divide 60
+        seed (int): Seed for reproducible data
+        seasonal (bool): Use realistic daily/weekly seasonality
+        batch_size (int): Rows inserted per transaction
+        directions (bool): Also split every reading into turning movements
+            (twelve direction_count rows per record)
+
+    Returns:
+        int: Number of records created
+    """
+    if rows_per_minute < 1 or 60 % rows_per_minute:
+        raise ValueError("rows_per_minute must be a divisor of 60")
+    step = timedelta(seconds=60 // rows_per_minute)
+
+    try:
+        # Get the latest timestamp in the database
+        latest_timestamp = DataStatsService.get().latest_timestamp
+        now = timezone.now().replace(microsecond=0)
+
+        if latest_timestamp:
+            start_time = latest_timestamp.replace(microsecond=0) + step
+            if days is not None:
+                start_time = max(start_time, now - timedelta(days=days))
+        else:
+            span = DEFAULT_DAYS if days is None else days
+            print(f"No existing records found. Starting from {span} days ago...")
+            start_time = now - timedelta(days=span)
+
+        total_rows = int((now - start_time) / step) + 1 if start_time <= now else 0
+        if total_rows <= 0:
             print("No new data needed. Latest record is less than a minute old.")
-            return
+            return 0
 
-        # Calculate how many records we'll create
-        minutes_diff = int(time_diff.total_seconds() / 60)
-        print(f"Generating completely random mock data for {minutes_diff} minutes...")
+        mode = 'seasonal' if seasonal else 'completely random'
+        print(f"Generating {total_rows} {mode} mock records...")
 
-        # Generate mock data for each missing timestamp (every minute)
-        current_time = latest_record.timestamp + timedelta(minutes=1)
+        rng = np.random.default_rng(seed)
+        base = np.datetime64(timezone.make_naive(start_time, dt_timezone.utc), 's')
+        step_seconds = np.timedelta64(int(step.total_seconds()), 's')
         records_created = 0
+        hourly = {}
+
+        while records_created < total_rows:
+            size = min(batch_size, total_rows - records_created)
+            offsets = np.arange(records_created, records_created + size)
+            timestamps = base + offsets * step_seconds
+            counts = generate_counts(rng, timestamps, seasonal, rows_per_minute)
 
-        # Use transaction to make the process faster
-        with transaction.atomic():
-            while current_time <= now:
-                # Generate completely random values with no patterns
-                counts = get_completely_random_count()
-
-                # Create a new TrafficRecord
-                new_record = TrafficRecord.objects.create(timestamp=current_time)
-                TotalCount.objects.create(
-                    traffic_record=new_record,
-                    pedestrian=counts['pedestrian'],
-                    two_wheeler=counts['two_wheeler'],
-                    car=counts['car'],
-                    bus=counts['bus'],
-                    truck=counts['truck']
+            with transaction.atomic():
+                next_id = (TrafficRecord.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+                record_ids = np.arange(next_id, next_id + size)
+                _insert_batch(record_ids, timestamps, counts)
+                if directions:
+                    _insert_directions(rng, record_ids, timestamps, counts)
+                DataStatsService.record_inserted(
+                    size,
+                    timezone.make_aware(timestamps[0].item(), dt_timezone.utc),
+                    timezone.make_aware(timestamps[-1].item(), dt_timezone.utc)
                 )
+            column_store.add(minutes_of(timestamps), counts)
 
-                records_created += 1
-                if records_created % 100 == 0:  # Show progress every 100 records
-                    print(f"Created {records_created} records...")
+            _accumulate_hourly(hourly, timestamps, counts)
+            records_created += size
+            print(f"Created {records_created} records...")
 
-                current_time += timedelta(minutes=1)
+        # Bring the hourly/daily rollups up to date with the new rows. The first
+        # hour may already hold older rows, so it is recomputed from the database.
+        if directions:
+            # Movement sums are not tracked in memory; recompute everything touched
+            RollupService.rebuild(start_time, timezone.make_aware(timestamps[-1].item(), dt_timezone.utc))
+        else:
+            first_hour = min(hourly)
+            RollupService.refresh(start_time, start_time)
+            RollupService.load_hourly(_hourly_rows(
+                {hour: sums for hour, sums in hourly.items() if hour != first_hour}
+            ))
 
-        print(f"Successfully created {records_created} completely random mock records.")
+        print(f"Successfully created {records_created} {mode} mock records.")
+        return records_created
 
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -0,0 +1,229 @@
+import json
+import re
+import time
+from functools import partial
+from django.db import transaction
+from .archive import ArchiveService
+from .column_store import column_store
+from .data_stats import DataStatsService
+from .live import watcher
+from .metrics import INGEST_BATCH_LATENCY, INGESTED_READINGS
+from .models import DEFAULT_SENSOR, TrafficRecord, TotalCount, DirectionCount
+from .rollups import COUNT_FIELDS, RollupService
+from .utils import TimeRangeService
+
+
+# Upper bound on readings accepted in one request
+MAX_BATCH_READINGS = 50000
+
+# Rows per INSERT statement
+INSERT_BATCH_SIZE = 2000
+
+# Rejection reasons returned to the client are capped to keep responses small
+MAX_REPORTED_ERRORS = 100
+
+# Origin_destination movement codes, e.g. S_W or N_E
+DIRECTION_PATTERN = re.compile(r'^[NSEW]_[NSEW]$')
+
+SENSOR_MAX_LENGTH = TrafficRecord._meta.get_field('sensor').max_length
+
+
+class IngestionError(ValueError):
+    """Raised when a payload cannot be parsed at all"""
+
+
+class IngestionService:
+    """Service for validating and bulk-writing detector readings"""
+
+    @staticmethod
+    def parse_payload(stream, content_type):
+        """
+        Parse a request body into a list of raw readings.
+
+        JSON bodies may be a list of readings or {"readings": [...]}. NDJSON
+        bodies (application/x-ndjson) hold one reading per line and are read
+        line by line.
+
+        Raises:
+            IngestionError: If the body is malformed or too large
+        """
+        if content_type in ('application/x-ndjson', 'application/ndjson'):
+            readings = []
+            for line_number, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                if len(readings) >= MAX_BATCH_READINGS:
+                    raise IngestionError(f"Batch exceeds {MAX_BATCH_READINGS} readings")
+                try:
+                    readings.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise IngestionError(f"Invalid JSON on line {line_number}: {e}")
+            return readings
+
+        try:
+            payload = json.load(stream)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise IngestionError(f"Invalid JSON: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get('readings')
+        if not isinstance(payload, list):
+            raise IngestionError('Expected a list of readings or {"readings": [...]}')
+        if len(payload) > MAX_BATCH_READINGS:
+            raise IngestionError(f"Batch exceeds {MAX_BATCH_READINGS} readings")
+        return payload
+
+    @staticmethod
+    def _parse_counts(value, label):
+        if not isinstance(value, dict):
+            raise ValueError(f"{label} must be an object")
+        unknown = set(value) - set(COUNT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown {label} fields: {sorted(unknown)}")
+        counts = {}
+        for field in COUNT_FIELDS:
+            count = value.get(field, 0)
+            if isinstance(count, bool) or not isinstance(count, int) or count < 0:
+                raise ValueError(f"{label}.{field} must be a non-negative integer")
+            counts[field] = count
+        return counts
+
+    @staticmethod
+    def validate_reading(raw):
+        """
+        Validate one raw reading.
+
+        A reading looks like {"sensor": "cam-1", "timestamp": "...",
+        "totals": {"car": 3, ...}, "directions": {"S_N": {"car": 2}, ...}}.
+        Totals default to the sum of the directions when omitted.
+
+        Returns:
+            dict: Normalized reading
+
+        Raises:
+            ValueError: If the reading is invalid
+        """
+        if not isinstance(raw, dict):
+            raise ValueError("Reading must be an object")
+
+        sensor = raw.get('sensor', DEFAULT_SENSOR)
+        if not isinstance(sensor, str) or not sensor or len(sensor) > SENSOR_MAX_LENGTH:
+            raise ValueError(f"sensor must be a non-empty string of at most {SENSOR_MAX_LENGTH} characters")
+
+        timestamp = raw.get('timestamp')
+        if not isinstance(timestamp, str):
+            raise ValueError("timestamp is required")
+        timestamp = TimeRangeService.parse_timestamp(timestamp)
+
+        directions = {}
+        raw_directions = raw.get('directions') or {}
+        if not isinstance(raw_directions, dict):
+            raise ValueError("directions must be an object")
+        for direction, counts in raw_directions.items():
+            if not DIRECTION_PATTERN.match(direction):
+                raise ValueError(f"Invalid direction code: {direction}")
+            directions[direction] = IngestionService._parse_counts(counts, direction)
+
+        if 'totals' in raw:
+            totals = IngestionService._parse_counts(raw['totals'], 'totals')
+        elif directions:
+            totals = {
+                field: sum(counts[field] for counts in directions.values())
+                for field in COUNT_FIELDS
+            }
+        else:
+            raise ValueError("Reading needs totals or directions")
+
+        return {
+            'sensor': sensor,
+            'timestamp': timestamp,
+            'totals': totals,
+            'directions': directions
+        }
+
+    @staticmethod
+    def ingest(raw_readings):
+        """
+        Validate, dedupe and store a batch of readings in one transaction.
+
+        Readings repeating a (sensor, timestamp) pair, either within the batch
+        or already stored, are rejected as duplicates. Readings that fall in an
+        archived month are rejected too, since archived months are read-only.
+
+        Returns:
+            dict: accepted/rejected/duplicates counts and the first errors
+        """
+        started = time.perf_counter()
+        errors = []
+        valid = []
+        seen = set()
+        duplicates = 0
+        boundary = ArchiveService.boundary()
+
+        for index, raw in enumerate(raw_readings):
+            try:
+                reading = IngestionService.validate_reading(raw)
+            except ValueError as e:
+                errors.append({'index': index, 'error': str(e)})
+                continue
+            if boundary and reading['timestamp'] < boundary:
+                errors.append({'index': index, 'error': 'Reading falls in an archived month'})
+                continue
+            key = (reading['sensor'], reading['timestamp'])
+            if key in seen:
+                duplicates += 1
+                errors.append({'index': index, 'error': 'Duplicate reading in batch'})
+                continue
+            seen.add(key)
+            valid.append((index, reading))
+
+        with transaction.atomic():
+            if valid:
+                timestamps = [reading['timestamp'] for _, reading in valid]
+                existing = set(TrafficRecord.objects.filter(
+                    sensor__in={reading['sensor'] for _, reading in valid},
+                    timestamp__range=(min(timestamps), max(timestamps))
+                ).values_list('sensor', 'timestamp'))
+                fresh = []
+                for index, reading in valid:
+                    if (reading['sensor'], reading['timestamp']) in existing:
+                        duplicates += 1
+                        errors.append({'index': index, 'error': 'Reading already stored'})
+                    else:
+                        fresh.append(reading)
+                valid = fresh
+
+            if valid:
+                records = TrafficRecord.objects.bulk_create([
+                    TrafficRecord(sensor=reading['sensor'], timestamp=reading['timestamp'])
+                    for reading in valid
+                ], batch_size=INSERT_BATCH_SIZE)
+                TotalCount.objects.bulk_create([
+                    TotalCount(traffic_record=record, timestamp=record.timestamp, **reading['totals'])
+                    for record, reading in zip(records, valid)
+                ], batch_size=INSERT_BATCH_SIZE)
+                DirectionCount.objects.bulk_create([
+                    DirectionCount(
+                        traffic_record=record, timestamp=record.timestamp, direction=direction, **counts
+                    )
+                    for record, reading in zip(records, valid)
+                    for direction, counts in reading['directions'].items()
+                ], batch_size=INSERT_BATCH_SIZE)
+                RollupService.refresh_timestamps(reading['timestamp'] for reading in valid)
+                timestamps = [reading['timestamp'] for reading in valid]
+                DataStatsService.record_inserted(len(valid), min(timestamps), max(timestamps))
+                totals = [reading['totals'] for reading in valid]
+                transaction.on_commit(partial(column_store.add_readings, timestamps, totals))
+                transaction.on_commit(watcher.notify)
+
+        errors.sort(key=lambda error: error['index'])
+        INGEST_BATCH_LATENCY.observe(time.perf_counter() - started)
+        INGESTED_READINGS.labels('accepted').inc(len(valid))
+        INGESTED_READINGS.labels('duplicate').inc(duplicates)
+        INGESTED_READINGS.labels('invalid').inc(len(errors) - duplicates)
+        return {
+            'accepted': len(valid),
+            'rejected': len(errors),
+            'duplicates': duplicates,
+            'errors': errors[:MAX_REPORTED_ERRORS]
+        }
@@ -0,0 +1,192 @@
+import re
+from .prompt_cache import STOPWORDS, normalize_prompt
+from .response_cache import get_cache, increment_stat
+
+
+# Phrases for each chart type, most specific first. The values of these tables
+# are those of llm_service's PIE_CHARTS/BAR_CHARTS/LINE_CHARTS, CATEGORIES and
+# DATE_RANGES (llm_service imports this module, so they cannot be imported
+# here); core/tests/test_intent_parser.py keeps the two in step
+CHART_PHRASES = [
+    ("bar-stacked", r"stacked (?:bar|column)s?|(?:bar|column)s? stacked"),
+    ("bar-horizontal", r"horizontal (?:bar|column)s?|(?:bar|column)s? horizontal"),
+    ("bar-simple", r"bars?|columns?|histograms?"),
+    ("line-linear", r"(?:linear|straight) lines?|linear"),
+    ("line-monotone", r"(?:smooth )?lines?|trends?|time series"),
+    ("pie", r"pies?"),
+    ("donut", r"donuts?|doughnuts?"),
+    ("gauge", r"gauges?|meters?"),
+]
+
+# Phrases for each category in llm_service.CATEGORIES; None means all of them,
+# which only applies when no single category is named as well
+CATEGORY_PHRASES = [
+    (None, r"all (?:vehicles?|categories|types)|every (?:vehicle|category|type)"),
+    ("pedestrians", r"pedestrians?|people|walkers?|foot traffic"),
+    ("twoWheelers", r"(?:two|2) ?wheelers?|bikes?|motorbikes?|motorcycles?|scooters?"),
+    ("fourWheelers", r"(?:four|4) ?wheelers?|cars?"),
+    ("trucks", r"trucks?|lorry|lorries|heavy vehicles?|buses|bus"),
+]
+
+# Phrases for each of llm_service.DATE_RANGES except CUSTOM
+DATE_RANGE_PHRASES = [
+    ("LAST_2_DAYS", r"(?:2|two) days|48 hours"),
+    ("LAST_7_DAYS", r"(?:7|seven) days|week|weekly"),
+    ("LAST_15_DAYS", r"(?:15|fifteen) days"),
+    ("LAST_30_DAYS", r"(?:30|thirty) days|month|monthly"),
+]
+
+RANGE_DAYS = {"LAST_2_DAYS": 2, "LAST_7_DAYS": 7, "LAST_15_DAYS": 15, "LAST_30_DAYS": 30}
+
+DEFAULT_DATE_RANGE = "LAST_7_DAYS"
+
+# Chart used when a prompt names categories but no chart type
+DEFAULT_CHART_TYPE = "line-monotone"
+
+CHART_NAMES = {
+    "bar-stacked": "stacked bar chart",
+    "bar-horizontal": "horizontal bar chart",
+    "bar-simple": "bar chart",
+    "line-linear": "line chart",
+    "line-monotone": "smoothed line chart",
+    "pie": "pie chart",
+    "donut": "donut chart",
+    "gauge": "gauge",
+}
+
+CATEGORY_LABELS = {
+    "pedestrians": "Pedestrians",
+    "twoWheelers": "Two-Wheelers",
+    "fourWheelers": "Four-Wheelers",
+    "trucks": "Trucks",
+}
+ALL_CATEGORIES = list(CATEGORY_LABELS)
+
+# Words that may surround a recognized request without changing it. Anything
+# else ("compare", "why", "peak", other numbers, ...) means the prompt asks for
+# more than a single chart and is left to the model.
+FILLER_WORDS = STOPWORDS | frozenset([
+    "chart", "charts", "graph", "graphs", "plot", "view", "visualize", "visualise",
+    "data", "traffic", "volume", "volumes", "count", "counts", "total", "totals",
+    "and", "in", "over", "by", "with", "on", "from", "as", "into", "see", "get",
+    "make", "create", "draw", "switch", "change", "set", "use", "using", "let",
+    "lets", "s", "now", "just", "only", "it", "this", "that", "need", "dashboard",
+    "distribution", "breakdown", "split", "vehicle", "vehicles", "type", "types",
+    "category", "categories", "last", "past", "previous", "recent", "day", "days",
+    "all", "everything",
+])
+
+STATS_NAME = "llm_intent_parser"
+
+
+def _compile(phrases):
+    return [(value, re.compile(rf"\b(?:{pattern})\b")) for value, pattern in phrases]
+
+
+CHART_PATTERNS = _compile(CHART_PHRASES)
+CATEGORY_PATTERNS = _compile(CATEGORY_PHRASES)
+DATE_RANGE_PATTERNS = _compile(DATE_RANGE_PHRASES)
+
+
+def _extract(text, patterns):
+    """Find every phrase in `text`, blanking matches so they are not reused"""
+    found = []
+    for value, pattern in patterns:
+        if pattern.search(text):
+            found.append(value)
+            text = pattern.sub(" ", text)
+    return found, text
+
+
+def parse_intent(prompt):
+    """
+    Map a prompt onto a single-chart dashboard state without calling a model.
+
+    Succeeds only when the prompt names one chart type or some categories,
+    and every other word is a known category, date range or filler word. The
+    chart defaults to a line chart, categories to all of them and the date
+    range to the last 7 days.
+
+    Args:
+        prompt (str): Raw user prompt
+
+    Returns:
+        dict or None: {"response", "state"} like the model's result, or None
+        when the prompt should go to the model
+    """
+    if "?" in prompt:
+        return None
+    text = normalize_prompt(prompt)
+
+    # Categories first, so "2 wheelers" is not read as a date range
+    categories, text = _extract(text, CATEGORY_PATTERNS)
+    date_ranges, text = _extract(text, DATE_RANGE_PATTERNS)
+    chart_types, text = _extract(text, CHART_PATTERNS)
+
+    if len(chart_types) > 1 or len(date_ranges) > 1:
+        return None
+    if not chart_types and not categories:
+        return None
+    if any(word not in FILLER_WORDS for word in text.split()):
+        return None
+
+    chart_type = chart_types[0] if chart_types else DEFAULT_CHART_TYPE
+    date_range = date_ranges[0] if date_ranges else DEFAULT_DATE_RANGE
+    days = RANGE_DAYS[date_range]
+    # "all" only widens the chart when no single category was named
+    categories = [c for c in categories if c is not None] or ALL_CATEGORIES
+
+    if chart_type.startswith(("bar", "line")):
+        category = [c for c in ALL_CATEGORIES if c in categories]
+        subject = " & ".join(CATEGORY_LABELS[c] for c in category)
+        if category == ALL_CATEGORIES:
+            subject = "Traffic"
+        title = f"{subject} Volume ({days} days)"
+        description = f"{CHART_NAMES[chart_type]} of {subject.lower()}"
+    else:
+        category = None
+        title = f"Traffic Distribution ({days} days)"
+        description = f"{CHART_NAMES[chart_type]} of the traffic mix"
+
+    response = f"Here is a {description} for the last {days} days."
+    if not date_ranges:
+        response = f"Here is a {description} for the last {days} days, since no period was mentioned."
+
+    return {
+        "response": response,
+        "state": {
+            "date_range": date_range,
+            "charts": [{
+                "type": chart_type,
+                "category": category,
+                "title": title,
+                "options": {
+                    "smooth_lines": chart_type == "line-monotone",
+                    "stacked": chart_type == "bar-stacked",
+                    "color_scheme": "auto",
+                },
+            }],
+        },
+    }
+
+
+def record_outcome(parsed):
+    increment_stat(STATS_NAME, "parsed" if parsed else "deferred")
+
+
+def parser_stats():
+    """
+    Share of prompts answered by the parser.
+
+    Returns:
+        dict: parsed, deferred and parse_ratio
+    """
+    cache = get_cache()
+    parsed = cache.get(f"stats:{STATS_NAME}:parsed", 0)
+    deferred = cache.get(f"stats:{STATS_NAME}:deferred", 0)
+    total = parsed + deferred
+    return {
+        "parsed": parsed,
+        "deferred": deferred,
+        "parse_ratio": round(parsed / total, 3) if total else 0.0
+    }
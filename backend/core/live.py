@@ -0,0 +1,232 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from .models import TotalCount
+
+
+# Path the ASGI application routes to the live feed
+LIVE_FEED_PATH = '/live/'
+
+# How often the shared watcher looks for new rows written by other processes
+# (mock generator, other workers); ingestion in this process wakes it at once
+POLL_INTERVAL_SECONDS = 10
+
+# Comment lines keep proxies from closing idle connections
+HEARTBEAT_SECONDS = 15
+
+# Events buffered per client before the oldest ones are dropped
+CLIENT_QUEUE_SIZE = 32
+
+
+def _read_snapshot():
+    return TotalCount.objects.aggregate(last_id=Max('id'), latest=Max('timestamp'))
+
+
+def _read_changes(last_id):
+    """
+    Summarize rows written since `last_id`.
+
+    Costs a single primary key lookup when nothing changed.
+
+    Returns:
+        dict or None: Event payload, or None when there is nothing new
+    """
+    current_id = TotalCount.objects.aggregate(last_id=Max('id'))['last_id']
+    if current_id == last_id:
+        return None
+    if current_id is None or (last_id is not None and current_id < last_id):
+        # History was cleared (and possibly regenerated); clients should reload
+        snapshot = _read_snapshot()
+        return {
+            'type': 'reset',
+            'last_id': snapshot['last_id'],
+            'latest_timestamp': snapshot['latest']
+        }
+
+    new_rows = TotalCount.objects.filter(id__gt=last_id or 0, id__lte=current_id).aggregate(
+        records=Count('id'),
+        latest=Max('timestamp'),
+        pedestrians=Sum('pedestrian'),
+        twoWheelers=Sum('two_wheeler'),
+        fourWheelers=Sum('car'),
+        buses=Sum('bus'),
+        trucks=Sum('truck')
+    )
+    return {
+        'type': 'update',
+        'last_id': current_id,
+        'latest_timestamp': new_rows['latest'],
+        'new_records': new_rows['records'],
+        'counts': {
+            'pedestrians': new_rows['pedestrians'] or 0,
+            'twoWheelers': new_rows['twoWheelers'] or 0,
+            'fourWheelers': new_rows['fourWheelers'] or 0,
+            'trucks': (new_rows['buses'] or 0) + (new_rows['trucks'] or 0)
+        }
+    }
+
+
+class LiveFeedWatcher:
+    """
+    One database watcher per process, shared by every connected client.
+
+    The watcher only runs while at least one client is subscribed, so idle
+    servers issue no queries, and each connected client costs none. It reads
+    the database when notify() reports a commit, and otherwise only every
+    poll_interval seconds to catch rows written by other processes.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL_SECONDS):
+        self.poll_interval = poll_interval
+        self.subscribers = set()
+        self.task = None
+        self.ready = None
+        self.wake = None
+        self.loop = None
+        self.last_id = None
+        self.latest_timestamp = None
+
+    async def subscribe(self):
+        """Register a client and start the watcher if needed"""
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.task is None:
+            # Created before any await so concurrent clients share one task
+            self.ready = asyncio.Event()
+            self.wake = asyncio.Event()
+            self.loop = asyncio.get_running_loop()
+            self.task = asyncio.ensure_future(self._run())
+        await self.ready.wait()
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self.wake:
+            # Let the watcher stop now rather than at its next poll
+            self.wake.set()
+
+    def notify(self):
+        """
+        Wake the watcher after new rows were committed in this process.
+
+        Safe to call from any thread (ingestion runs in sync views); a no-op
+        while no client is connected.
+        """
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # The event loop closed in the meantime
+            pass
+
+    def _wake(self):
+        if self.wake:
+            self.wake.set()
+
+    def _broadcast(self, event):
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _run(self):
+        try:
+            snapshot = await sync_to_async(_read_snapshot)()
+            self.last_id = snapshot['last_id']
+            self.latest_timestamp = snapshot['latest']
+            self.ready.set()
+
+            while self.subscribers:
+                try:
+                    await asyncio.wait_for(self.wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.wake.clear()
+                if not self.subscribers:
+                    break
+                event = await sync_to_async(_read_changes)(self.last_id)
+                if event is None:
+                    continue
+                self.last_id = event.pop('last_id')
+                # Backfilled rows can be older than what clients already have
+                if event['type'] == 'update' and self.latest_timestamp:
+                    event['latest_timestamp'] = max(self.latest_timestamp, event['latest_timestamp'])
+                self.latest_timestamp = event['latest_timestamp']
+                self._broadcast(event)
+        finally:
+            self.ready.set()
+            self.task = None
+            self.loop = None
+            self.wake = None
+
+
+watcher = LiveFeedWatcher()
+
+
+def format_event(event_type, payload):
+    data = json.dumps(payload, default=lambda value: value.isoformat())
+    return f'event: {event_type}\ndata: {data}\n\n'.encode()
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def live_events(scope, receive, send):
+    """
+    ASGI handler streaming Server-Sent Events to one dashboard.
+
+    Sends a 'snapshot' event on connect, then an 'update' event with the new
+    latest timestamp and the counts added since the previous event, or a
+    'reset' event when history was cleared.
+    """
+    if scope['method'] != 'GET':
+        await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    headers = [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]
+    if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False):
+        headers.append((b'access-control-allow-origin', b'*'))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+    queue = await watcher.subscribe()
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.body',
+            'body': format_event('snapshot', {'latest_timestamp': watcher.latest_timestamp}),
+            'more_body': True,
+        })
+        while not disconnect.done():
+            next_event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnect},
+                timeout=HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event in done:
+                # Events are shared between clients, so never mutate them here
+                event = next_event.result()
+                payload = {key: value for key, value in event.items() if key != 'type'}
+                body = format_event(event['type'], payload)
+            else:
+                next_event.cancel()
+                if disconnect.done():
+                    break
+                body = b': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        watcher.unsubscribe(queue)
+        disconnect.cancel()
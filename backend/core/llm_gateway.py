@@ -0,0 +1,165 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+# Calls running against the model at once
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "4"))
+
+# Calls allowed to wait for a worker; beyond this requests are rejected
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "8"))
+
+# How long a caller waits for its answer, queueing included
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "45"))
+
+# Weight of the latest call in the running average used for Retry-After
+LATENCY_SMOOTHING = 0.2
+
+
+class GatewayBusy(Exception):
+    """Raised when the queue is full; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM gateway is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class GatewayTimeout(Exception):
+    """Raised when a call does not finish before its deadline"""
+
+
+class LLMGateway:
+    """
+    Bounded execution layer for slow model calls.
+
+    Calls run on a fixed pool of worker threads, so a burst of prompts cannot
+    occupy more than `max_workers` model connections. At most `max_queue`
+    further calls wait for a worker; others fail fast with GatewayBusy.
+    Identical calls in flight at the same time share a single execution.
+    Streamed calls run in the request thread but take a slot via reserve().
+    """
+
+    def __init__(self, max_workers=LLM_MAX_WORKERS, max_queue=LLM_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.streams = 0
+        self.average_latency = None
+        self.coalesced = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def run(self, key, fn, *args, deadline=LLM_DEADLINE_SECONDS):
+        """
+        Run `fn(*args, timeout=...)` on the pool and wait for its result.
+
+        `fn` receives the seconds left before the deadline so it can bound its
+        own network calls.
+
+        Args:
+            key (str): Calls with equal keys in flight together are merged
+            fn (callable): The model call
+            deadline (float): Seconds the caller is willing to wait
+
+        Raises:
+            GatewayBusy: If the queue is full
+            GatewayTimeout: If the deadline passes first
+        """
+        expires_at = time.monotonic() + deadline
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self._check_capacity()
+                future = Future()
+                self.in_flight[key] = future
+                self.executor.submit(self._execute, key, future, fn, args, expires_at)
+
+        try:
+            return future.result(timeout=max(expires_at - time.monotonic(), 0))
+        except FutureTimeoutError:
+            with self.lock:
+                self.timed_out += 1
+            raise GatewayTimeout(f"LLM call did not finish within {deadline:g}s")
+
+    def reserve(self):
+        """
+        Take a slot for a call made outside the pool, such as a stream.
+
+        Returns:
+            callable: Releases the slot; safe to call more than once
+
+        Raises:
+            GatewayBusy: If the queue is full
+        """
+        with self.lock:
+            self._check_capacity()
+            self.streams += 1
+        released = False
+
+        def release():
+            nonlocal released
+            with self.lock:
+                if not released:
+                    released = True
+                    self.streams -= 1
+        return release
+
+    def _load(self):
+        return len(self.in_flight) + self.streams
+
+    def _check_capacity(self):
+        if self._load() >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise GatewayBusy(self.retry_after())
+
+    def record_latency(self, elapsed):
+        with self.lock:
+            self._record_latency(elapsed)
+
+    def _record_latency(self, elapsed):
+        if self.average_latency is None:
+            self.average_latency = elapsed
+        else:
+            self.average_latency += LATENCY_SMOOTHING * (elapsed - self.average_latency)
+
+    def _execute(self, key, future, fn, args, expires_at):
+        started = time.monotonic()
+        try:
+            remaining = expires_at - started
+            if remaining <= 0:
+                # Every caller of a stale job has already given up
+                raise GatewayTimeout("LLM call expired while queued")
+            future.set_result(fn(*args, timeout=remaining))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            elapsed = time.monotonic() - started
+            with self.lock:
+                self.in_flight.pop(key, None)
+                self._record_latency(elapsed)
+
+    def retry_after(self):
+        """Seconds until the queue should have room again (call with the lock held)"""
+        latency = self.average_latency or 1.0
+        waves = self._load() / self.max_workers
+        return max(1, math.ceil(waves * latency))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": len(self.in_flight),
+                "streaming": self.streams,
+                "average_latency": round(self.average_latency or 0.0, 3),
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out
+            }
@@ -1,12 +1,23 @@
 from google import genai
+from abc import ABC, abstractmethod
 from dotenv import load_dotenv
 from pathlib import Path
 import os
 import json
 from pydantic import BaseModel, ValidationError, field_validator
-from typing import List, Optional, Literal
+from typing import Iterator, List, Optional, Literal
 from google.genai import types
 import re
+import hashlib
+import threading
+import time
+import httpx
+from django.db import connections
+from .intent_parser import parse_intent, record_outcome
+from .llm_gateway import LLM_DEADLINE_SECONDS, GatewayTimeout, LLMGateway
+from .metrics import LLM_CALLS, LLM_LATENCY, record_llm_tokens
+from .prompt_cache import PromptCacheService, normalize_prompt
+from .streaming import ClosingIterator
 
 # Load .env file
 env_path = Path(__file__).parent.parent.parent / ".env"
@@ -128,19 +139,31 @@ class DashboardState(BaseModel):
 
 
 # ----------------------------------------------------------
-# 🔹 Main LLM Gateway Function
+# 🔹 Gemini client settings (overridable from .env)
 # ----------------------------------------------------------
-def process_user_prompt(user_prompt: str):
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found in .env file.")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
 
-    client = genai.Client(api_key=api_key)
+# Whole-request timeout, including reading the response
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
 
-    # ------------------------------------------------------
-    # 🔹 CORRECT & IMPROVED SYSTEM PROMPT
-    # ------------------------------------------------------
-    system_instruction = f"""
+# Attempts per prompt (1 disables retries), with exponential backoff between them
+GEMINI_MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+GEMINI_RETRY_INITIAL_DELAY = float(os.getenv("GEMINI_RETRY_INITIAL_DELAY", "0.5"))
+GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "8"))
+
+# Rate limiting and transient server errors are worth retrying
+GEMINI_RETRY_STATUS_CODES = [408, 429, 500, 502, 503, 504]
+
+# Keep-alive pool shared by every request in this process
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+
+
+# ----------------------------------------------------------
+# 🔹 System prompt (built once at import)
+# ----------------------------------------------------------
+def build_system_instruction() -> str:
+    return f"""
 You are an MCP (Model Control Protocol) system for a traffic dashboard.
 
 Your output must ALWAYS contain two sections:
@@ -216,23 +239,256 @@ Sure! Here's what I found.
 User request:
 """
 
+
+SYSTEM_INSTRUCTION = build_system_instruction()
+
+GENERATION_CONFIG = types.GenerateContentConfig(
+    system_instruction=SYSTEM_INSTRUCTION,
+    temperature=0.2,
+)
+
+
+
+# ----------------------------------------------------------
+# 🔹 Shared Gemini client
+# ----------------------------------------------------------
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> genai.Client:
+    """
+    Return the process-wide Gemini client, creating it on first use.
+
+    The client owns an HTTP connection pool, so reusing it keeps TLS
+    connections alive between prompts instead of opening one per request.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise ValueError("GEMINI_API_KEY not found in .env file.")
+
+                _client = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(
+                        timeout=int(GEMINI_TIMEOUT_SECONDS * 1000),
+                        retry_options=types.HttpRetryOptions(
+                            attempts=GEMINI_MAX_ATTEMPTS,
+                            initial_delay=GEMINI_RETRY_INITIAL_DELAY,
+                            max_delay=GEMINI_RETRY_MAX_DELAY,
+                            http_status_codes=GEMINI_RETRY_STATUS_CODES,
+                        ),
+                        client_args={
+                            "limits": httpx.Limits(
+                                max_connections=GEMINI_MAX_CONNECTIONS,
+                                max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+                            )
+                        },
+                    ),
+                )
+    return _client
+
+
+# ----------------------------------------------------------
+# 🔹 Model backends
+# ----------------------------------------------------------
+class LLMBackend(ABC):
+    """A model that turns a user prompt into raw <response>/<state> text"""
+    name = "base"
+
+    @abstractmethod
+    def generate(self, user_prompt: str, timeout: float) -> str:
+        """Return the whole raw text, within `timeout` seconds"""
+
+    def stream(self, user_prompt: str, timeout: float) -> Iterator[str]:
+        """Yield the raw text in chunks as it is generated"""
+        yield self.generate(user_prompt, timeout)
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def _config(self, timeout: float):
+        if timeout >= GEMINI_TIMEOUT_SECONDS:
+            return GENERATION_CONFIG
+        # Never let the HTTP call outlive the caller's deadline
+        return GENERATION_CONFIG.model_copy(update={
+            "http_options": types.HttpOptions(timeout=max(int(timeout * 1000), 1)),
+        })
+
+    def generate(self, user_prompt: str, timeout: float) -> str:
+        try:
+            response = get_client().models.generate_content(
+                model=GEMINI_MODEL,
+                contents=user_prompt,
+                config=self._config(timeout),
+            )
+        except Exception as e:
+            raise Exception(f"Gemini API call failed: {e}") from e
+        record_llm_tokens(self.name, response.usage_metadata)
+        return (response.text or "").strip()
+
+    def stream(self, user_prompt: str, timeout: float) -> Iterator[str]:
+        usage = None
+        try:
+            for chunk in get_client().models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=user_prompt,
+                config=self._config(timeout),
+            ):
+                # Running totals; the last chunk carries the final counts
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise Exception(f"Gemini API call failed: {e}") from e
+        record_llm_tokens(self.name, usage)
+
+
+# Characters per chunk when the fake model streams
+FAKE_STREAM_CHUNK_CHARS = 8
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline stand-in for load tests: answers after a fixed delay with a
+    valid dashboard state built from the categories named in the prompt.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = None):
+        if latency is None:
+            latency = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0.5"))
+        self.latency = latency
+
+    def generate(self, user_prompt: str, timeout: float) -> str:
+        if self.latency > timeout:
+            time.sleep(timeout)
+            raise GatewayTimeout("Fake model timed out")
+        time.sleep(self.latency)
+        return self._answer(user_prompt)
+
+    def stream(self, user_prompt: str, timeout: float) -> Iterator[str]:
+        # Spread the latency over the chunks like a real model would
+        text = self._answer(user_prompt)
+        chunks = [text[i:i + FAKE_STREAM_CHUNK_CHARS] for i in range(0, len(text), FAKE_STREAM_CHUNK_CHARS)]
+        for chunk in chunks:
+            time.sleep(self.latency / len(chunks))
+            yield chunk
+
+    def _answer(self, user_prompt: str) -> str:
+        prompt = user_prompt.lower()
+        if "pie" in prompt:
+            chart = {"type": "pie", "category": None}
+        else:
+            categories = [c for c in CATEGORIES if c.lower() in prompt] or CATEGORIES
+            chart = {"type": "line-monotone", "category": categories}
+        state = {
+            "date_range": "LAST_7_DAYS",
+            "charts": [dict(chart, title="Traffic (7 days)", options={})],
+        }
+        return f"<response>Here is your dashboard.</response>\n<state>{json.dumps(state)}</state>"
+
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def get_backend(name: str = None) -> LLMBackend:
+    name = name or os.getenv("LLM_BACKEND", GeminiBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}'. Use one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+backend = get_backend()
+
+# Shared by every request in this process
+gateway = LLMGateway()
+
+# Cached results are only reused for the same backend, model and system prompt
+PROMPT_CACHE_NAMESPACE = hashlib.sha256(
+    f"{backend.name}|{GEMINI_MODEL}|{SYSTEM_INSTRUCTION}".encode()
+).hexdigest()
+
+
+# ----------------------------------------------------------
+# 🔹 Main LLM Gateway Function
+# ----------------------------------------------------------
+def process_user_prompt(user_prompt: str):
+    if not user_prompt or not user_prompt.strip():
+        raise ValueError("user_prompt is required.")
+
+    # ------------------------------------------------------
+    # 🔹 Plain single-chart requests never need the model
+    # ------------------------------------------------------
+    local_result = parse_local_intent(user_prompt)
+    record_outcome(local_result is not None)
+    if local_result is not None:
+        LLM_CALLS.labels("local").inc()
+        return local_result
+
+    # ------------------------------------------------------
+    # 🔹 Answer repeated prompts from the cache
+    # ------------------------------------------------------
+    cached = PromptCacheService.get(user_prompt, PROMPT_CACHE_NAMESPACE)
+    if cached is not None:
+        LLM_CALLS.labels("cached").inc()
+        return cached
+
+    LLM_CALLS.labels("model").inc()
+
     # ------------------------------------------------------
-    # 🔹 Call Gemini API
+    # 🔹 Run on the bounded gateway; identical prompts in
+    #    flight together share one model call
     # ------------------------------------------------------
+    return gateway.run(
+        f"{PROMPT_CACHE_NAMESPACE}:{normalize_prompt(user_prompt)}",
+        run_model,
+        user_prompt,
+    )
+
+
+def parse_local_intent(user_prompt: str):
+    """Answer with the rule-based intent parser, or None to ask the model"""
+    parsed = parse_intent(user_prompt)
+    if parsed is None:
+        return None
+    try:
+        validated = DashboardState(**parsed["state"])
+    except ValidationError:
+        return None
+    return {
+        "response": parsed["response"],
+        "state": validated.model_dump(),
+    }
+
+
+def run_model(user_prompt: str, timeout: float):
+    """Gateway job: call the model once and cache the result for everyone"""
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=user_prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction,
-                temperature=0.2,
-            ),
-        )
-    except Exception as e:
-        raise Exception(f"Gemini API call failed: {e}") from e
-
-    raw_output = (response.text or "").strip()
+        result = generate_result(user_prompt, timeout)
+        if "error" not in result:
+            PromptCacheService.put(user_prompt, PROMPT_CACHE_NAMESPACE, result)
+        return result
+    finally:
+        # Worker threads outlive requests, so don't hold their connections
+        connections.close_all()
 
+
+def generate_result(user_prompt: str, timeout: float):
+    with LLM_LATENCY.labels(backend.name, "blocking").time():
+        raw_output = backend.generate(user_prompt, timeout)
+    return build_result(raw_output)
+
+
+def build_result(raw_output: str):
+    """Turn raw model text into the validated {"response", "state"} result"""
     # ------------------------------------------------------
     # 🔹 Extract <response> & <state>
     # ------------------------------------------------------
@@ -264,3 +520,110 @@ User request:
         "response": response_text,
         "state": state_output,
     }
+
+
+# ----------------------------------------------------------
+# 🔹 Streaming
+# ----------------------------------------------------------
+class ResponseTextStream:
+    """
+    Incrementally extracts the text inside <response>...</response> from raw
+    model output arriving in arbitrary chunks.
+    """
+    OPEN = "<response>"
+    CLOSE = "</response>"
+
+    def __init__(self):
+        self.raw = ""
+        self.position = None  # Index in `raw` of the next unsent character
+        self.started = False
+        self.closed = False
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk and return the newly completed part of the response text"""
+        self.raw += chunk
+        if self.closed:
+            return ""
+        if self.position is None:
+            start = self.raw.find(self.OPEN)
+            if start < 0:
+                return ""
+            self.position = start + len(self.OPEN)
+        if not self.started:
+            # Match extract_response_components, which strips the text
+            while self.position < len(self.raw) and self.raw[self.position].isspace():
+                self.position += 1
+
+        end = self.raw.find(self.CLOSE, self.position)
+        if end >= 0:
+            self.closed = True
+            text = self.raw[self.position:end].rstrip()
+        else:
+            # Hold back a possibly incomplete closing tag, and trailing
+            # whitespace in case the tag follows it
+            end = max(self.position, len(self.raw) - len(self.CLOSE) + 1)
+            text = self.raw[self.position:end].rstrip()
+            end = self.position + len(text)
+        self.position = end
+        self.started = self.started or bool(text)
+        return text
+
+
+def _answer_at_once(result):
+    if result.get("response"):
+        yield "token", {"text": result["response"]}
+    yield "done", result
+
+
+def _stream_model(user_prompt: str):
+    started = time.monotonic()
+    parser = ResponseTextStream()
+    for chunk in backend.stream(user_prompt, LLM_DEADLINE_SECONDS):
+        text = parser.feed(chunk)
+        if text:
+            yield "token", {"text": text}
+        if time.monotonic() - started > LLM_DEADLINE_SECONDS:
+            raise GatewayTimeout(f"LLM call did not finish within {LLM_DEADLINE_SECONDS:g}s")
+    elapsed = time.monotonic() - started
+    gateway.record_latency(elapsed)
+    LLM_LATENCY.labels(backend.name, "stream").observe(elapsed)
+
+    result = build_result(parser.raw.strip())
+    if "error" not in result:
+        PromptCacheService.put(user_prompt, PROMPT_CACHE_NAMESPACE, result)
+    yield "done", result
+
+
+def stream_user_prompt(user_prompt: str) -> ClosingIterator:
+    """
+    Streaming counterpart of process_user_prompt.
+
+    Returns (event, payload) pairs: 'token' events carry response text as it
+    arrives and a final 'done' event carries the validated result. Closing
+    the iterator releases its gateway slot.
+
+    Validation, the local parser, the cache and the gateway's capacity check
+    all run before returning, so callers can still answer with an error
+    status. Locally answered and cached prompts arrive as a single token.
+
+    Raises:
+        ValueError: If the prompt is empty
+        GatewayBusy: If the gateway has no free slot
+    """
+    if not user_prompt or not user_prompt.strip():
+        raise ValueError("user_prompt is required.")
+
+    local_result = parse_local_intent(user_prompt)
+    record_outcome(local_result is not None)
+    if local_result is not None:
+        LLM_CALLS.labels("local").inc()
+        return ClosingIterator(_answer_at_once(local_result))
+
+    cached = PromptCacheService.get(user_prompt, PROMPT_CACHE_NAMESPACE)
+    if cached is not None:
+        LLM_CALLS.labels("cached").inc()
+        return ClosingIterator(_answer_at_once(cached))
+
+    release = gateway.reserve()
+    LLM_CALLS.labels("model").inc()
+    return ClosingIterator(_stream_model(user_prompt), release)
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.archive import ARCHIVE_KEEP_MONTHS, ArchiveError, ArchiveService
+
+class Command(BaseCommand):
+    help = 'Moves closed months of minute-level traffic data into compressed archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=ARCHIVE_KEEP_MONTHS,
+            help=f'Closed months to keep in the database before the latest month (default: {ARCHIVE_KEEP_MONTHS})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the months that would be archived',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='VACUUM the database afterwards so the file shrinks',
+        )
+
+    def handle(self, *args, **options):
+        if options['keep_months'] < 0:
+            raise CommandError('--keep-months cannot be negative')
+
+        months = ArchiveService.closed_months(options['keep_months'])
+        if not months:
+            self.stdout.write('No months are due for archiving.')
+            return
+        if options['dry_run']:
+            for month in months:
+                self.stdout.write(f'Would archive {month:%Y-%m}')
+            return
+
+        try:
+            archived = ArchiveService.archive_closed_months(
+                options['keep_months'], log=self.stdout.write
+            )
+        except ArchiveError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {sum(count for _, count in archived)} records in {len(archived)} months'
+        ))
+
+        if options['vacuum']:
+            self.stdout.write('Vacuuming the database...')
+            ArchiveService.vacuum()
+            self.stdout.write(self.style.SUCCESS('Done'))
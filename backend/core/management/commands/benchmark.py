@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmarks import DATASET_SIZES, find_regressions, run_benchmarks, write_results
+
+class Command(BaseCommand):
+    help = 'Benchmarks every dashboard endpoint and aggregation method on synthetic datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            choices=list(DATASET_SIZES),
+            default=['10k'],
+            help='Dataset sizes to benchmark (default: 10k). Scratch databases are reused between runs.',
+        )
+        parser.add_argument(
+            '--scratch-dir',
+            default=str(settings.BASE_DIR / 'benchmarks'),
+            help='Directory for the scratch SQLite databases (default: backend/benchmarks)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timed calls per endpoint/method and range (default: 3)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results as JSON to this file',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Results JSON of an earlier run to compare against',
+        )
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=1.5,
+            help='Fail when a median time exceeds the baseline by this factor (default: 1.5)',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        results = run_benchmarks(
+            options['sizes'],
+            Path(options['scratch_dir']),
+            repeat=options['repeat'],
+            log=self.stdout.write
+        )
+
+        for result in results['results']:
+            self.stdout.write(
+                f"{result['dataset']:>4} {result['kind']:<8} {result['target']:<30} "
+                f"{result['range'] or '-':<7} {result['median_ms']:>10.1f}ms {result['queries']:>4} queries"
+            )
+
+        if options['output']:
+            write_results(results, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = find_regressions(results, baseline, options['max_regression'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
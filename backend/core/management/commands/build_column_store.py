@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.column_store import column_store
+
+class Command(BaseCommand):
+    help = 'Builds the memory-mapped column store from the database and the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Remove the store instead, so aggregation falls back to SQL',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            column_store.clear()
+            self.stdout.write(self.style.SUCCESS('Removed the column store'))
+            return
+
+        self.stdout.write(f'Building the column store in {column_store.directory}...')
+        added = column_store.build(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Built the column store from {added} readings'))
+        if settings.AGGREGATION_BACKEND != 'columns':
+            self.stdout.write(self.style.WARNING(
+                'Set AGGREGATION_BACKEND=columns to aggregate with it; '
+                'writers keep it up to date either way'
+            ))
@@ -1,6 +1,11 @@
 from django.core.management.base import BaseCommand
-from core.models import TrafficRecord, TotalCount
+from django.db import transaction
+from core.archive import ArchiveService
+from core.column_store import column_store
+from core.models import TrafficRecord, TotalCount, DirectionCount
 from core.generate_mock_data import generate_mock_data
+from core.data_stats import DataStatsService
+from core.rollups import RollupService
 
 class Command(BaseCommand):
     help = 'Clears all traffic data and generates new completely random data'
@@ -22,8 +27,14 @@ class Command(BaseCommand):
         try:
             # Clear all existing data
             self.stdout.write('Clearing all existing traffic data...')
-            TotalCount.objects.all().delete()
-            TrafficRecord.objects.all().delete()
+            with transaction.atomic():
+                DirectionCount.objects.all().delete()
+                TotalCount.objects.all().delete()
+                TrafficRecord.objects.all().delete()
+                RollupService.clear()
+                ArchiveService.clear()
+                DataStatsService.reset()
+                transaction.on_commit(column_store.clear)
             
             self.stdout.write(
                 self.style.SUCCESS('Successfully cleared all traffic data')
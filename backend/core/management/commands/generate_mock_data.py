@@ -1,10 +1,55 @@
-from django.core.management.base import BaseCommand
-from core.generate_mock_data import generate_mock_data
+from django.core.management.base import BaseCommand, CommandError
+from core.generate_mock_data import generate_mock_data, DEFAULT_BATCH_SIZE
 
 class Command(BaseCommand):
-    help = 'Generates completely random mock traffic data for missing timestamps'
+    help = 'Generates mock traffic data for missing timestamps'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Days of history to create when the database is empty (default: 60), '
+                 'or the most history to add when it is not',
+        )
+        parser.add_argument(
+            '--rows-per-minute',
+            type=int,
+            default=1,
+            help='Readings per minute; must divide 60 (default: 1)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed for reproducible data',
+        )
+        parser.add_argument(
+            '--seasonal',
+            action='store_true',
+            help='Generate realistic daily/weekly seasonality instead of completely random counts',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows inserted per transaction (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--directions',
+            action='store_true',
+            help='Also split every reading into the twelve turning movements',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Starting completely random mock data generation...')
-        generate_mock_data()
-        self.stdout.write(self.style.SUCCESS('Successfully generated completely random mock data')) 
\ No newline at end of file
+        self.stdout.write('Starting mock data generation...')
+        try:
+            generate_mock_data(
+                days=options['days'],
+                rows_per_minute=options['rows_per_minute'],
+                seed=options['seed'],
+                seasonal=options['seasonal'],
+                batch_size=options['batch_size'],
+                directions=options['directions'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS('Successfully generated mock data'))
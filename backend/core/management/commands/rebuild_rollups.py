@@ -0,0 +1,44 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.data_stats import DataStatsService
+from core.rollups import RollupService
+
+class Command(BaseCommand):
+    help = 'Rebuilds the hourly and daily rollup tables and the data stats from minute-level traffic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start-date',
+            help='First day to rebuild (YYYY-MM-DD). Defaults to the earliest record.',
+        )
+        parser.add_argument(
+            '--end-date',
+            help='Last day to rebuild (YYYY-MM-DD). Defaults to the latest record.',
+        )
+
+    def parse_date(self, value, end_of_day=False):
+        if not value:
+            return None
+        try:
+            parsed = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            raise CommandError(f'Invalid date "{value}". Use YYYY-MM-DD.')
+        if end_of_day:
+            parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+        return timezone.make_aware(parsed)
+
+    def handle(self, *args, **options):
+        start_time = self.parse_date(options['start_date'])
+        end_time = self.parse_date(options['end_date'], end_of_day=True)
+
+        self.stdout.write('Rebuilding traffic rollups...')
+        chunks = RollupService.rebuild(start_time, end_time)
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt rollups ({chunks} chunks)')
+        )
+
+        stats = DataStatsService.recompute()
+        self.stdout.write(
+            self.style.SUCCESS(f'Recomputed data stats ({stats.record_count} records)')
+        )
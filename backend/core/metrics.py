@@ -0,0 +1,134 @@
+import contextlib
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from django.db import connections
+
+
+# Latency buckets (seconds) for HTTP requests and DB time
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Queries issued by a single request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# Model calls take seconds, not milliseconds
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'HTTP requests by view, method and status',
+    ['view', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time until the view returned its response',
+    ['view', 'method'], buckets=REQUEST_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request',
+    ['view'], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds', 'Database time per request',
+    ['view'], buckets=REQUEST_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and outcome',
+    ['cache', 'outcome']
+)
+LLM_CALLS = Counter(
+    'llm_calls_total', 'How chat prompts were answered',
+    ['source']
+)
+LLM_LATENCY = Histogram(
+    'llm_call_duration_seconds', 'Model call latency',
+    ['backend', 'mode'], buckets=LLM_BUCKETS
+)
+LLM_TOKENS = Counter(
+    'llm_tokens_total', 'Tokens reported by the model',
+    ['backend', 'kind']
+)
+INGESTED_READINGS = Counter(
+    'ingested_readings_total', 'Readings received by the ingestion endpoint',
+    ['outcome']
+)
+INGEST_BATCH_LATENCY = Histogram(
+    'ingest_batch_duration_seconds', 'Time to validate and store one batch',
+    buckets=REQUEST_BUCKETS
+)
+
+
+def record_cache(cache, outcome):
+    CACHE_REQUESTS.labels(cache, outcome).inc()
+
+
+def record_llm_tokens(backend, usage):
+    """Count tokens from a Gemini usage_metadata object (ignored when missing)"""
+    if usage is None:
+        return
+    if usage.prompt_token_count:
+        LLM_TOKENS.labels(backend, 'prompt').inc(usage.prompt_token_count)
+    if usage.candidates_token_count:
+        LLM_TOKENS.labels(backend, 'completion').inc(usage.candidates_token_count)
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and their total time"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and DB load of every request, labelled by URL name.
+
+    Costs a few counter updates and one wrapper call per query. For streaming
+    responses the latency covers the time to the first byte.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            # Every alias: reads may go to the read-only connection
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        REQUEST_COUNT.labels(view, request.method, response.status_code).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(elapsed)
+        REQUEST_QUERIES.labels(view).observe(timer.count)
+        REQUEST_DB_TIME.labels(view).observe(timer.duration)
+        return response
+
+
+def render_metrics():
+    """
+    All metrics in the Prometheus text format.
+
+    Returns:
+        tuple: (body, content_type)
+    """
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Aggregate the per-worker files written by multi-process servers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:29
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncHour
+
+
+COUNT_FIELDS = ['pedestrian', 'two_wheeler', 'car', 'bus', 'truck']
+
+
+def populate_rollups(apps, schema_editor):
+    TotalCount = apps.get_model('core', 'TotalCount')
+    HourlyCount = apps.get_model('core', 'HourlyCount')
+    DailyCount = apps.get_model('core', 'DailyCount')
+    sums = {f'{field}_sum': Sum(field) for field in COUNT_FIELDS}
+
+    hourly_rows = TotalCount.objects.annotate(
+        bucket=TruncHour('traffic_record__timestamp')
+    ).values('bucket').annotate(records=Count('id'), **sums).order_by('bucket')
+    HourlyCount.objects.bulk_create([
+        HourlyCount(
+            bucket=row['bucket'],
+            record_count=row['records'],
+            **{field: row[f'{field}_sum'] or 0 for field in COUNT_FIELDS}
+        )
+        for row in hourly_rows.iterator()
+    ], batch_size=1000)
+
+    daily_rows = HourlyCount.objects.annotate(
+        day=TruncDate('bucket')
+    ).values('day').annotate(records=Sum('record_count'), **sums).order_by('day')
+    DailyCount.objects.bulk_create([
+        DailyCount(
+            bucket=row['day'],
+            record_count=row['records'],
+            **{field: row[f'{field}_sum'] or 0 for field in COUNT_FIELDS}
+        )
+        for row in daily_rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_totalcount_options_alter_trafficrecord_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedestrian', models.IntegerField(default=0)),
+                ('car', models.IntegerField(default=0)),
+                ('bus', models.IntegerField(default=0)),
+                ('truck', models.IntegerField(default=0)),
+                ('two_wheeler', models.IntegerField(default=0)),
+                ('record_count', models.IntegerField(default=0)),
+                ('bucket', models.DateField(unique=True)),
+            ],
+            options={
+                'db_table': 'daily_count',
+                'ordering': ['-bucket'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedestrian', models.IntegerField(default=0)),
+                ('car', models.IntegerField(default=0)),
+                ('bus', models.IntegerField(default=0)),
+                ('truck', models.IntegerField(default=0)),
+                ('two_wheeler', models.IntegerField(default=0)),
+                ('record_count', models.IntegerField(default=0)),
+                ('bucket', models.DateTimeField(unique=True)),
+            ],
+            options={
+                'db_table': 'hourly_count',
+                'ordering': ['-bucket'],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:52
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# Rows copied per UPDATE so the backfill never holds one huge write transaction
+BACKFILL_CHUNK = 10000
+
+
+def backfill_timestamps(apps, schema_editor):
+    TrafficRecord = apps.get_model('core', 'TrafficRecord')
+    TotalCount = apps.get_model('core', 'TotalCount')
+
+    record_timestamp = Subquery(
+        TrafficRecord.objects.filter(pk=OuterRef('traffic_record_id')).values('timestamp')[:1]
+    )
+    last_id = TotalCount.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for chunk_start in range(0, last_id + 1, BACKFILL_CHUNK):
+        TotalCount.objects.filter(
+            id__gte=chunk_start,
+            id__lt=chunk_start + BACKFILL_CHUNK,
+            timestamp__isnull=True
+        ).update(timestamp=record_timestamp)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_rollup_tables'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='totalcount',
+            options={'ordering': ['-timestamp']},
+        ),
+        migrations.AddField(
+            model_name='totalcount',
+            name='timestamp',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_timestamps, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='totalcount',
+            name='timestamp',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='trafficrecord',
+            index=models.Index(fields=['timestamp'], name='traffic_record_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='totalcount',
+            index=models.Index(fields=['timestamp', 'pedestrian', 'two_wheeler', 'car', 'bus', 'truck'], name='total_count_ts_counts_idx'),
+        ),
+    ]
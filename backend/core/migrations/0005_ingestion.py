@@ -0,0 +1,47 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_totalcount_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(max_length=10)),
+                ('pedestrian', models.IntegerField(default=0)),
+                ('car', models.IntegerField(default=0)),
+                ('bus', models.IntegerField(default=0)),
+                ('truck', models.IntegerField(default=0)),
+                ('two_wheeler', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'direction_count',
+            },
+        ),
+        migrations.AddField(
+            model_name='trafficrecord',
+            name='sensor',
+            field=models.CharField(db_default='default', default='default', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='trafficrecord',
+            constraint=models.UniqueConstraint(fields=('sensor', 'timestamp'), name='traffic_record_sensor_ts_uniq'),
+        ),
+        migrations.AddField(
+            model_name='directioncount',
+            name='traffic_record',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='direction_counts', to='core.trafficrecord'),
+        ),
+        migrations.AddConstraint(
+            model_name='directioncount',
+            constraint=models.UniqueConstraint(fields=('traffic_record', 'direction'), name='direction_count_record_dir_uniq'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:48
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def compute_stats(apps, schema_editor):
+    TrafficRecord = apps.get_model('core', 'TrafficRecord')
+    DataStats = apps.get_model('core', 'DataStats')
+
+    stats = TrafficRecord.objects.aggregate(
+        record_count=Count('id'),
+        earliest_timestamp=Min('timestamp'),
+        latest_timestamp=Max('timestamp')
+    )
+    DataStats.objects.update_or_create(pk=1, defaults=stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_ingestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_count', models.BigIntegerField(default=0)),
+                ('earliest_timestamp', models.DateTimeField(null=True)),
+                ('latest_timestamp', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'data_stats',
+            },
+        ),
+        migrations.RunPython(compute_stats, migrations.RunPython.noop),
+    ]
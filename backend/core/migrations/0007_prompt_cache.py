@@ -0,0 +1,30 @@
+# Generated by Django 5.2.2 on 2026-10-17 21:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_data_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('token_key', models.CharField(db_index=True, max_length=64)),
+                ('namespace', models.CharField(max_length=64)),
+                ('tokens', models.TextField()),
+                ('result', models.JSONField()),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'prompt_cache_entry',
+            },
+        ),
+    ]
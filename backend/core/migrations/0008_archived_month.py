@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-17 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_prompt_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('file_name', models.CharField(blank=True, max_length=64)),
+                ('record_count', models.BigIntegerField(default=0)),
+                ('earliest_timestamp', models.DateTimeField(null=True)),
+                ('latest_timestamp', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'archived_month',
+                'ordering': ['month'],
+            },
+        ),
+    ]
@@ -0,0 +1,151 @@
+# Generated by Django 5.2.2 on 2026-10-17 22:21
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate, TruncHour
+
+
+COUNT_FIELDS = ['pedestrian', 'two_wheeler', 'car', 'bus', 'truck']
+
+DIRECTION_PEAK_FIELDS = {
+    'pedestrian_peak': ['pedestrian'],
+    'two_wheeler_peak': ['two_wheeler'],
+    'car_peak': ['car'],
+    'heavy_peak': ['bus', 'truck'],
+    'total_peak': COUNT_FIELDS,
+}
+
+# Rows copied per UPDATE so the backfill never holds one huge write transaction
+BACKFILL_CHUNK = 10000
+
+
+def backfill_timestamps(apps, schema_editor):
+    TrafficRecord = apps.get_model('core', 'TrafficRecord')
+    DirectionCount = apps.get_model('core', 'DirectionCount')
+
+    record_timestamp = Subquery(
+        TrafficRecord.objects.filter(pk=OuterRef('traffic_record_id')).values('timestamp')[:1]
+    )
+    last_id = DirectionCount.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for chunk_start in range(0, last_id + 1, BACKFILL_CHUNK):
+        DirectionCount.objects.filter(
+            id__gte=chunk_start,
+            id__lt=chunk_start + BACKFILL_CHUNK,
+            timestamp__isnull=True
+        ).update(timestamp=record_timestamp)
+
+
+def populate_rollups(apps, schema_editor):
+    # Archived months are not visible here; rebuild_rollups adds them
+    DirectionCount = apps.get_model('core', 'DirectionCount')
+    HourlyDirectionCount = apps.get_model('core', 'HourlyDirectionCount')
+    DailyDirectionCount = apps.get_model('core', 'DailyDirectionCount')
+    sums = {f'{field}_sum': Sum(field) for field in COUNT_FIELDS}
+    peaks = {
+        f'{name}_max': Max(sum((F(field) for field in fields[1:]), F(fields[0])))
+        for name, fields in DIRECTION_PEAK_FIELDS.items()
+    }
+
+    hourly_rows = DirectionCount.objects.annotate(
+        bucket=TruncHour('timestamp')
+    ).values('bucket', 'direction').annotate(
+        records=Count('id'), **sums, **peaks
+    ).order_by('bucket', 'direction')
+    HourlyDirectionCount.objects.bulk_create([
+        HourlyDirectionCount(
+            bucket=row['bucket'],
+            direction=row['direction'],
+            record_count=row['records'],
+            **{field: row[f'{field}_sum'] or 0 for field in COUNT_FIELDS},
+            **{name: row[f'{name}_max'] or 0 for name in DIRECTION_PEAK_FIELDS}
+        )
+        for row in hourly_rows.iterator()
+    ], batch_size=1000)
+
+    daily_rows = HourlyDirectionCount.objects.annotate(
+        day=TruncDate('bucket')
+    ).values('day', 'direction').annotate(records=Sum('record_count'), **sums).order_by('day', 'direction')
+    DailyDirectionCount.objects.bulk_create([
+        DailyDirectionCount(
+            bucket=row['day'],
+            direction=row['direction'],
+            record_count=row['records'],
+            **{field: row[f'{field}_sum'] or 0 for field in COUNT_FIELDS}
+        )
+        for row in daily_rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_archived_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDirectionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedestrian', models.IntegerField(default=0)),
+                ('car', models.IntegerField(default=0)),
+                ('bus', models.IntegerField(default=0)),
+                ('truck', models.IntegerField(default=0)),
+                ('two_wheeler', models.IntegerField(default=0)),
+                ('record_count', models.IntegerField(default=0)),
+                ('bucket', models.DateField()),
+                ('direction', models.CharField(max_length=10)),
+            ],
+            options={
+                'db_table': 'daily_direction_count',
+                'ordering': ['-bucket', 'direction'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyDirectionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedestrian', models.IntegerField(default=0)),
+                ('car', models.IntegerField(default=0)),
+                ('bus', models.IntegerField(default=0)),
+                ('truck', models.IntegerField(default=0)),
+                ('two_wheeler', models.IntegerField(default=0)),
+                ('record_count', models.IntegerField(default=0)),
+                ('bucket', models.DateTimeField()),
+                ('direction', models.CharField(max_length=10)),
+                ('pedestrian_peak', models.IntegerField(default=0)),
+                ('two_wheeler_peak', models.IntegerField(default=0)),
+                ('car_peak', models.IntegerField(default=0)),
+                ('heavy_peak', models.IntegerField(default=0)),
+                ('total_peak', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'hourly_direction_count',
+                'ordering': ['-bucket', 'direction'],
+            },
+        ),
+        migrations.AddField(
+            model_name='directioncount',
+            name='timestamp',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_timestamps, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='directioncount',
+            name='timestamp',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='directioncount',
+            index=models.Index(fields=['timestamp', 'direction', 'pedestrian', 'two_wheeler', 'car', 'bus', 'truck'], name='direction_count_ts_counts_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailydirectioncount',
+            constraint=models.UniqueConstraint(fields=('bucket', 'direction'), name='daily_direction_bucket_dir_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlydirectioncount',
+            constraint=models.UniqueConstraint(fields=('bucket', 'direction'), name='hourly_direction_bucket_dir_uniq'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
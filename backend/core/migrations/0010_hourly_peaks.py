@@ -0,0 +1,73 @@
+# Generated by Django 5.2.2 on 2026-10-17 22:52
+
+from django.db import migrations, models
+from django.db.models import F, Max
+from django.db.models.functions import TruncHour
+
+
+HOURLY_PEAK_FIELDS = {
+    'pedestrian_peak': ['pedestrian'],
+    'two_wheeler_peak': ['two_wheeler'],
+    'car_peak': ['car'],
+    'heavy_peak': ['bus', 'truck'],
+    'total_peak': ['pedestrian', 'two_wheeler', 'car', 'bus', 'truck'],
+}
+
+
+def populate_maxima(apps, schema_editor):
+    # Archived months are not visible here; rebuild_rollups adds them
+    TotalCount = apps.get_model('core', 'TotalCount')
+    HourlyCount = apps.get_model('core', 'HourlyCount')
+    peaks = {
+        f'{name}_max': Max(sum((F(field) for field in fields[1:]), F(fields[0])))
+        for name, fields in HOURLY_PEAK_FIELDS.items()
+    }
+
+    maxima = {
+        row['bucket']: row
+        for row in TotalCount.objects.annotate(
+            bucket=TruncHour('timestamp')
+        ).values('bucket').annotate(**peaks).order_by().iterator()
+    }
+    buckets = []
+    for bucket in HourlyCount.objects.filter(bucket__in=list(maxima)).iterator():
+        for name in HOURLY_PEAK_FIELDS:
+            setattr(bucket, name, maxima[bucket.bucket][f'{name}_max'] or 0)
+        buckets.append(bucket)
+    HourlyCount.objects.bulk_update(buckets, list(HOURLY_PEAK_FIELDS), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_direction_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hourlycount',
+            name='car_peak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hourlycount',
+            name='heavy_peak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hourlycount',
+            name='pedestrian_peak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hourlycount',
+            name='total_peak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hourlycount',
+            name='two_wheeler_peak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_maxima, migrations.RunPython.noop),
+    ]
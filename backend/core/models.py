@@ -1,17 +1,41 @@
 from django.db import models
 
+# Sensor assigned to readings that do not name one (e.g. mock data)
+DEFAULT_SENSOR = 'default'
+
+# Raw count columns shared by minute rows, rollup buckets and the archive
+COUNT_FIELDS = ['pedestrian', 'two_wheeler', 'car', 'bus', 'truck']
+
+# Hourly rollup maxima: column name to the raw columns summed per reading
+HOURLY_PEAK_FIELDS = {
+    'pedestrian_peak': ['pedestrian'],
+    'two_wheeler_peak': ['two_wheeler'],
+    'car_peak': ['car'],
+    'heavy_peak': ['bus', 'truck'],
+    'total_peak': COUNT_FIELDS,
+}
+
 class TrafficRecord(models.Model):
+    sensor = models.CharField(max_length=64, default=DEFAULT_SENSOR, db_default=DEFAULT_SENSOR)
     timestamp = models.DateTimeField()
 
     class Meta:
         db_table = 'traffic_record'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='traffic_record_ts_idx'),
+        ]
+        constraints = [
+            # One reading per sensor and minute; also serves ingestion dedupe lookups
+            models.UniqueConstraint(fields=['sensor', 'timestamp'], name='traffic_record_sensor_ts_uniq'),
+        ]
 
     def __str__(self):
         return f"Record at {self.timestamp}"
 
 class TotalCount(models.Model):
     traffic_record = models.ForeignKey(TrafficRecord, on_delete=models.CASCADE, related_name='total_counts')
+    timestamp = models.DateTimeField()  # Copy of traffic_record.timestamp so range scans skip the join
     pedestrian = models.IntegerField(default=0)
     car = models.IntegerField(default=0)  # This maps to four_wheelers in your application
     bus = models.IntegerField(default=0)
@@ -20,7 +44,19 @@ class TotalCount(models.Model):
 
     class Meta:
         db_table = 'total_count'
-        ordering = ['-traffic_record__timestamp']
+        ordering = ['-timestamp']
+        indexes = [
+            # Covering index: range SUMs and ORDER BY timestamp are answered from the index alone
+            models.Index(
+                fields=['timestamp', 'pedestrian', 'two_wheeler', 'car', 'bus', 'truck'],
+                name='total_count_ts_counts_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.timestamp is None and self.traffic_record_id:
+            self.timestamp = self.traffic_record.timestamp
+        super().save(*args, **kwargs)
 
     @property
     def heavy_vehicles(self):
@@ -33,7 +69,155 @@ class TotalCount(models.Model):
         return self.car
 
     def __str__(self):
-        return f"Counts for {self.traffic_record.timestamp}"
+        return f"Counts for {self.timestamp}"
+
+class DirectionCount(models.Model):
+    traffic_record = models.ForeignKey(TrafficRecord, on_delete=models.CASCADE, related_name='direction_counts')
+    timestamp = models.DateTimeField()  # Copy of traffic_record.timestamp so range scans skip the join
+    direction = models.CharField(max_length=10)  # Origin_destination, e.g. S_W, S_N
+    pedestrian = models.IntegerField(default=0)
+    car = models.IntegerField(default=0)
+    bus = models.IntegerField(default=0)
+    truck = models.IntegerField(default=0)
+    two_wheeler = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'direction_count'
+        indexes = [
+            # Covering index: per-direction range SUMs and peak windows never touch the table
+            models.Index(
+                fields=['timestamp', 'direction', 'pedestrian', 'two_wheeler', 'car', 'bus', 'truck'],
+                name='direction_count_ts_counts_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['traffic_record', 'direction'], name='direction_count_record_dir_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.timestamp is None and self.traffic_record_id:
+            self.timestamp = self.traffic_record.timestamp
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.direction} counts for record {self.traffic_record_id}"
+
+class RollupCount(models.Model):
+    """Pre-aggregated category sums over a fixed time bucket"""
+    pedestrian = models.IntegerField(default=0)
+    car = models.IntegerField(default=0)
+    bus = models.IntegerField(default=0)
+    truck = models.IntegerField(default=0)
+    two_wheeler = models.IntegerField(default=0)
+    record_count = models.IntegerField(default=0)  # Number of minute rows in the bucket
+
+    class Meta:
+        abstract = True
+
+class HourlyRollupCount(RollupCount):
+    """Hourly sums plus the highest single reading of every category"""
+    # Highest single reading per category, so minute peaks only open the best hours
+    pedestrian_peak = models.IntegerField(default=0)
+    two_wheeler_peak = models.IntegerField(default=0)
+    car_peak = models.IntegerField(default=0)
+    heavy_peak = models.IntegerField(default=0)
+    total_peak = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+class HourlyCount(HourlyRollupCount):
+    bucket = models.DateTimeField(unique=True)  # Start of the hour
+
+    class Meta:
+        db_table = 'hourly_count'
+        ordering = ['-bucket']
+
+    def __str__(self):
+        return f"Hourly counts for {self.bucket}"
+
+class DailyCount(RollupCount):
+    bucket = models.DateField(unique=True)
+
+    class Meta:
+        db_table = 'daily_count'
+        ordering = ['-bucket']
+
+    def __str__(self):
+        return f"Daily counts for {self.bucket}"
+
+class HourlyDirectionCount(HourlyRollupCount):
+    bucket = models.DateTimeField()  # Start of the hour
+    direction = models.CharField(max_length=10)
+
+    class Meta:
+        db_table = 'hourly_direction_count'
+        ordering = ['-bucket', 'direction']
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'direction'], name='hourly_direction_bucket_dir_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Hourly {self.direction} counts for {self.bucket}"
+
+class DailyDirectionCount(RollupCount):
+    bucket = models.DateField()
+    direction = models.CharField(max_length=10)
+
+    class Meta:
+        db_table = 'daily_direction_count'
+        ordering = ['-bucket', 'direction']
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'direction'], name='daily_direction_bucket_dir_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Daily {self.direction} counts for {self.bucket}"
+
+class DataStats(models.Model):
+    """Single-row summary of the stored history, kept current by every writer"""
+    record_count = models.BigIntegerField(default=0)
+    earliest_timestamp = models.DateTimeField(null=True)
+    latest_timestamp = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = 'data_stats'
+
+    def __str__(self):
+        return f"{self.record_count} records up to {self.latest_timestamp}"
+
+class ArchivedMonth(models.Model):
+    """Calendar month of minute rows moved out of the database into a file"""
+    month = models.DateField(unique=True)  # First day of the month (UTC)
+    file_name = models.CharField(max_length=64, blank=True)  # Relative to TRAFFIC_ARCHIVE_DIR, empty for gaps
+    record_count = models.BigIntegerField(default=0)
+    earliest_timestamp = models.DateTimeField(null=True)
+    latest_timestamp = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'archived_month'
+        ordering = ['month']
+
+    def __str__(self):
+        return f"Archive of {self.month:%Y-%m} ({self.record_count} records)"
+
+class PromptCacheEntry(models.Model):
+    """Validated LLM result for a normalized prompt"""
+    key = models.CharField(max_length=64, unique=True)  # Hash of namespace and normalized prompt
+    token_key = models.CharField(max_length=64, db_index=True)  # Hash of namespace and sorted token set
+    namespace = models.CharField(max_length=64)  # Model and system prompt the result came from
+    tokens = models.TextField()  # Space-separated sorted tokens, for similarity matching
+    result = models.JSONField()
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'prompt_cache_entry'
+
+    def __str__(self):
+        return f"Cached prompt: {self.tokens}"
 
 # class VehicleData(models.Model):
 #     # Constants
@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from datetime import timedelta
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .metrics import record_cache
+from .models import PromptCacheEntry
+from .response_cache import get_cache, increment_stat
+
+
+# Entries older than this are treated as misses and purged
+PROMPT_CACHE_TTL_SECONDS = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Least recently used entries beyond this are evicted
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "1000"))
+
+# Jaccard similarity a differently worded prompt needs to reuse a result. The
+# default 1.0 only reuses results of the same normalized prompt: reordered or
+# similar wording can ask for a different dashboard ("cars before trucks"), so
+# deployments opt in to word-order and fuzzy matching with a lower value
+PROMPT_CACHE_SIMILARITY = float(os.getenv("PROMPT_CACHE_SIMILARITY", "1.0"))
+
+# Filler words that never change what dashboard a prompt asks for
+STOPWORDS = frozenset([
+    "a", "an", "the", "me", "us", "please", "can", "could", "would", "you",
+    "i", "want", "like", "to", "show", "give", "display", "of", "for", "some",
+])
+
+STATS_NAME = "llm_prompt_cache"
+
+logger = logging.getLogger(__name__)
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Fold case, Unicode forms, punctuation and whitespace"""
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    text = PUNCTUATION.sub(" ", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def prompt_tokens(normalized):
+    """Set of meaningful tokens, ignoring word order and filler words"""
+    return frozenset(token for token in normalized.split() if token not in STOPWORDS)
+
+
+def similarity(tokens, other_tokens):
+    """
+    Jaccard similarity of two token sets.
+
+    Prompts naming different numbers ("last 2 days" vs "last 7 days") never
+    match, however similar the rest is.
+    """
+    if not tokens or not other_tokens:
+        return 0.0
+    if any(token.isdigit() for token in tokens ^ other_tokens):
+        return 0.0
+    return len(tokens & other_tokens) / len(tokens | other_tokens)
+
+
+def _digest(*parts):
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+class PromptCacheService:
+    """
+    Service for the persistent cache of LLM dashboard results.
+
+    Lookups try the normalized prompt. With PROMPT_CACHE_SIMILARITY below
+    1.0 they then try the same words in any order and the most similar
+    cached token set. Only results whose state validated, or that had no
+    state at all, are stored.
+    """
+
+    @staticmethod
+    def get(prompt, namespace):
+        """
+        Look up a cached result for a prompt.
+
+        Args:
+            prompt (str): Raw user prompt
+            namespace (str): Identifies the model and system prompt in use
+
+        Returns:
+            dict or None: Cached result, or None on a miss
+        """
+        normalized = normalize_prompt(prompt)
+        tokens = prompt_tokens(normalized)
+        fresh = PromptCacheEntry.objects.filter(
+            namespace=namespace,
+            created_at__gte=timezone.now() - timedelta(seconds=PROMPT_CACHE_TTL_SECONDS)
+        )
+
+        outcome = "exact_hits"
+        entry = fresh.filter(key=_digest(namespace, normalized)).first()
+        fuzzy = PROMPT_CACHE_SIMILARITY < 1.0 and tokens
+        if entry is None and fuzzy:
+            outcome = "similar_hits"
+            entry = fresh.filter(token_key=_digest(namespace, *sorted(tokens))).first()
+        if entry is None and fuzzy:
+            best_score = PROMPT_CACHE_SIMILARITY
+            for entry_id, entry_tokens in fresh.values_list("id", "tokens"):
+                score = similarity(tokens, frozenset(entry_tokens.split()))
+                if score >= best_score:
+                    best_score, entry = score, entry_id
+            if entry is not None:
+                entry = fresh.filter(id=entry).first()
+
+        if entry is None:
+            increment_stat(STATS_NAME, "misses")
+            record_cache("llm_prompt", "miss")
+            return None
+
+        try:
+            PromptCacheEntry.objects.filter(id=entry.id).update(
+                hits=F("hits") + 1,
+                last_used_at=timezone.now()
+            )
+        except DatabaseError as e:
+            # Recency is best effort; a busy database must not fail the hit
+            logger.warning("Could not update prompt cache entry: %s", e)
+        increment_stat(STATS_NAME, outcome)
+        record_cache("llm_prompt", outcome[:-1])
+        return entry.result
+
+    @staticmethod
+    def put(prompt, namespace, result):
+        """
+        Store a result and evict expired and least recently used entries.
+
+        Failures are logged and swallowed: the result was already computed and
+        losing a cache entry only costs a future model call.
+        """
+        normalized = normalize_prompt(prompt)
+        tokens = sorted(prompt_tokens(normalized))
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                PromptCacheEntry.objects.update_or_create(
+                    key=_digest(namespace, normalized),
+                    defaults={
+                        "token_key": _digest(namespace, *tokens),
+                        "namespace": namespace,
+                        "tokens": " ".join(tokens),
+                        "result": result,
+                        "created_at": now,
+                        "last_used_at": now,
+                    }
+                )
+                PromptCacheService.evict()
+        except DatabaseError as e:
+            logger.warning("Could not store prompt cache entry: %s", e)
+
+    @staticmethod
+    def evict():
+        """Drop expired entries and trim the cache to PROMPT_CACHE_MAX_ENTRIES"""
+        PromptCacheEntry.objects.filter(
+            created_at__lt=timezone.now() - timedelta(seconds=PROMPT_CACHE_TTL_SECONDS)
+        ).delete()
+        stale_ids = PromptCacheEntry.objects.order_by("-last_used_at").values_list(
+            "id", flat=True
+        )[PROMPT_CACHE_MAX_ENTRIES:]
+        PromptCacheEntry.objects.filter(id__in=list(stale_ids)).delete()
+
+    @staticmethod
+    def clear():
+        PromptCacheEntry.objects.all().delete()
+
+    @staticmethod
+    def stats():
+        """
+        Hit counters of the prompt cache.
+
+        Returns:
+            dict: entries, exact/similar hits, misses and hit_ratio
+        """
+        cache = get_cache()
+        exact = cache.get(f"stats:{STATS_NAME}:exact_hits", 0)
+        similar = cache.get(f"stats:{STATS_NAME}:similar_hits", 0)
+        misses = cache.get(f"stats:{STATS_NAME}:misses", 0)
+        total = exact + similar + misses
+        return {
+            "entries": PromptCacheEntry.objects.count(),
+            "exact_hits": exact,
+            "similar_hits": similar,
+            "misses": misses,
+            "hit_ratio": round((exact + similar) / total, 3) if total else 0.0
+        }
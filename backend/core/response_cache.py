@@ -0,0 +1,243 @@
+import hashlib
+import time
+from functools import wraps
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+    quote_etag
+)
+from .data_stats import DataStatsService
+from .metrics import record_cache
+from .streaming import negotiate_format
+
+
+# Cache alias configured in settings.CACHES
+CACHE_ALIAS = 'dashboard'
+
+# How long a request waits for another worker already computing the same entry
+COMPUTE_WAIT_SECONDS = 5
+COMPUTE_POLL_SECONDS = 0.05
+
+# Views whose hit/miss counters are reported by cache_stats()
+CACHED_VIEWS = []
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def data_version():
+    """
+    Version string of the stored data, or None when there is none.
+
+    Combines the latest timestamp with the record count, so backfilled
+    readings older than the latest one also invalidate cached responses.
+    """
+    stats = DataStatsService.get()
+    if stats.latest_timestamp is None:
+        return None
+    return f'{stats.latest_timestamp.isoformat()}:{stats.record_count}'
+
+
+def canonical_range(params):
+    """
+    Reduce time range query parameters to the form the views act on.
+
+    Custom dates take precedence over the period, exactly like
+    TimeRangeService.parse_time_range, so equivalent requests share entries.
+    """
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    if start_date and end_date:
+        return ('range', start_date, end_date)
+    period = params.get('period') or '7'
+    try:
+        period = str(int(period))
+    except ValueError:
+        pass
+    return ('period', period)
+
+
+def build_cache_key(view_name, params, extra_params=(), version=None, output_format=None):
+    parts = [view_name, *canonical_range(params)]
+    parts += [f'{name}={params.get(name, "")}' for name in extra_params]
+    if output_format:
+        parts.append(f'format={output_format}')
+    parts.append(version or 'empty')
+    digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    return f'response:{view_name}:{digest}'
+
+
+def increment_stat(name, outcome):
+    """Increment a persistent hit/miss style counter"""
+    cache = get_cache()
+    key = f'stats:{name}:{outcome}'
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def cache_stats():
+    """
+    Hit/miss counters for every cached view.
+
+    Returns:
+        dict: View name to hits, misses and hit_ratio
+    """
+    cache = get_cache()
+    stats = {}
+    for view_name in CACHED_VIEWS:
+        hits = cache.get(f'stats:{view_name}:hits', 0)
+        misses = cache.get(f'stats:{view_name}:misses', 0)
+        total = hits + misses
+        stats[view_name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 3) if total else 0.0
+        }
+    return stats
+
+
+def response_etag(key):
+    """
+    Weak ETag for a response cache key (the key's digest).
+
+    Weak from the start because CompressionMiddleware weakens the ETag of
+    every body it encodes, while a 304 has no body to encode: both then carry
+    the very same validator.
+    """
+    return 'W/' + quote_etag(key.rsplit(':', 1)[-1])
+
+
+def _negotiated_key(request, view_name, extra_params, formats):
+    """
+    Cache key of a request, computed from the data version alone.
+
+    Returns:
+        str or None: None when the requested format is invalid, which the
+        view reports itself
+    """
+    output_format = None
+    if formats:
+        try:
+            output_format = negotiate_format(request, formats)
+        except ValueError:
+            return None
+    return build_cache_key(view_name, request.GET, extra_params, data_version(), output_format)
+
+
+def _not_modified(request, etag, formats):
+    """304 response when the client's If-None-Match still matches, else None"""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        record_cache('dashboard', 'not_modified')
+        _add_validators(response, etag, formats)
+    return response
+
+
+def _add_validators(response, etag, formats):
+    # no-cache: clients may store the body but must revalidate it every time
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+    if formats:
+        patch_vary_headers(response, ['Accept'])
+
+
+def conditional_response(view_name, extra_params=(), formats=None):
+    """
+    Answer If-None-Match with 304 Not Modified for a view without caching it.
+
+    For views whose body only depends on the query and the stored data, like
+    the streamed /data/ export: the ETag is derived like a cache key, so
+    checking it costs the data version lookup and nothing is computed when
+    the client's copy is current.
+
+    Args:
+        view_name (str): Name used in the ETag
+        extra_params (tuple): Query parameters that change the response
+        formats (list): Export formats the view negotiates
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = _negotiated_key(request, view_name, extra_params, formats)
+            if key is None:
+                return view(request, *args, **kwargs)
+            etag = response_etag(key)
+            not_modified = _not_modified(request, etag, formats)
+            if not_modified is not None:
+                return not_modified
+            response = view(request, *args, **kwargs)
+            _add_validators(response, etag, formats)
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_dashboard_response(view_name, extra_params=(), formats=None):
+    """
+    Cache successful responses of a dashboard view.
+
+    The key is the canonical (period, start, end) plus any extra query
+    parameters and the data version, so entries go stale by themselves as
+    soon as new data lands. Concurrent misses for the same key
+    wait for the first worker instead of recomputing. The key also serves
+    as ETag: a request whose If-None-Match still matches gets a 304 before
+    the cache or the view is consulted.
+
+    Args:
+        view_name (str): Name used in cache keys and stats
+        extra_params (tuple): Further query parameters that change the response
+        formats (list): Export formats the view negotiates (see
+            negotiate_format); each one is cached separately
+    """
+    CACHED_VIEWS.append(view_name)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = _negotiated_key(request, view_name, extra_params, formats)
+            if key is None:
+                return view(request, *args, **kwargs)
+            etag = response_etag(key)
+            not_modified = _not_modified(request, etag, formats)
+            if not_modified is not None:
+                return not_modified
+
+            cache = get_cache()
+            cached = cache.get(key)
+            if cached is None and not cache.add(f'{key}:lock', 1, timeout=COMPUTE_WAIT_SECONDS):
+                deadline = time.monotonic() + COMPUTE_WAIT_SECONDS
+                while cached is None and time.monotonic() < deadline:
+                    time.sleep(COMPUTE_POLL_SECONDS)
+                    cached = cache.get(key)
+
+            if cached is not None:
+                increment_stat(view_name, 'hits')
+                record_cache('dashboard', 'hit')
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Cache'] = 'HIT'
+                _add_validators(response, etag, formats)
+                return response
+
+            increment_stat(view_name, 'misses')
+            record_cache('dashboard', 'miss')
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, (response.content, response['Content-Type']))
+            finally:
+                cache.delete(f'{key}:lock')
+            response['X-Cache'] = 'MISS'
+            _add_validators(response, etag, formats)
+            return response
+        return wrapper
+    return decorator
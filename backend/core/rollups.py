@@ -0,0 +1,530 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import CharField, Count, F, Func, IntegerField, Max, Q, Sum, Value
+from django.db.models.functions import Cast, TruncDate, TruncHour
+from datetime import timedelta
+from .archive import ArchiveService
+from .models import (
+    COUNT_FIELDS, HOURLY_PEAK_FIELDS, TotalCount, HourlyCount, DailyCount,
+    DirectionCount, HourlyDirectionCount, DailyDirectionCount
+)
+
+# How much history a single rebuild step recomputes at once
+REBUILD_CHUNK = timedelta(days=7)
+
+
+def floor_time(timestamp, unit):
+    """Truncate a datetime to the start of its minute, hour or day"""
+    timestamp = timestamp.replace(second=0, microsecond=0)
+    if unit != 'minute':
+        timestamp = timestamp.replace(minute=0)
+    if unit == 'day':
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+def ceil_time(timestamp, unit):
+    """Round a datetime up to the next minute, hour or day boundary"""
+    floored = floor_time(timestamp, unit)
+    if floored == timestamp:
+        return floored
+    return floored + timedelta(**{f'{unit}s': 1})
+
+
+def fields_expression(fields):
+    """Sum of raw count columns as one expression, e.g. bus + truck"""
+    expression = F(fields[0])
+    for field in fields[1:]:
+        expression = expression + F(field)
+    return expression
+
+
+def epoch_bucket(expression, seconds, offset=0):
+    """
+    SQL expression for the start of the fixed-size bucket holding a datetime, in Unix seconds.
+
+    Buckets start every `seconds` from the epoch shifted by `offset`. Uses
+    SQLite's native strftime('%s'); Django's Trunc functions would call
+    back into Python for every row.
+    """
+    epoch = Cast(
+        Func(Value('%s'), expression, function='strftime', output_field=CharField()),
+        IntegerField()
+    )
+    return (epoch - offset) / seconds * seconds + offset
+
+
+def epoch_slots(timestamps, seconds, offset=0):
+    """The same bucket starts for a datetime64 array"""
+    epoch = timestamps.astype('datetime64[s]').astype(np.int64)
+    return (epoch - offset) // seconds * seconds + offset
+
+
+def group_buckets(slots, counts):
+    """
+    Sum rows that share a bucket.
+
+    Args:
+        slots (np.ndarray): Bucket start per row
+        counts (np.ndarray): (rows, fields) counts
+
+    Returns:
+        tuple: (ascending unique slots, (buckets, fields) int64 sums)
+    """
+    unique, groups = np.unique(slots, return_inverse=True)
+    sums = np.zeros((len(unique), counts.shape[1]), dtype=np.int64)
+    np.add.at(sums, groups, counts)
+    return unique, sums
+
+
+def split_range(start_time, end_time):
+    """
+    Split an inclusive time range into the coarsest rollup segments covering it.
+
+    Whole days are read from the daily rollup, whole hours at the edges from
+    the hourly rollup and only the remaining partial hours from minute rows.
+
+    Args:
+        start_time (datetime): Range start (inclusive)
+        end_time (datetime): Range end (inclusive)
+
+    Returns:
+        dict: 'daily' (tuple or None), 'hourly' and 'minute' (lists of tuples),
+        each segment being a half-open (start, end) pair
+    """
+    # Work on a half-open range so segments never double count a boundary row
+    end_exclusive = end_time + timedelta(microseconds=1)
+    segments = {'daily': None, 'hourly': [], 'minute': []}
+
+    if end_exclusive <= start_time:
+        return segments
+
+    first_hour = ceil_time(start_time, 'hour')
+    last_hour = floor_time(end_exclusive, 'hour')
+    if first_hour >= last_hour:
+        segments['minute'].append((start_time, end_exclusive))
+        return segments
+
+    first_day = ceil_time(start_time, 'day')
+    last_day = floor_time(end_exclusive, 'day')
+    if first_day < last_day:
+        segments['daily'] = (first_day, last_day)
+        hourly = [(first_hour, first_day), (last_day, last_hour)]
+    else:
+        hourly = [(first_hour, last_hour)]
+
+    minute = [(start_time, first_hour), (last_hour, end_exclusive)]
+    segments['hourly'] = [(a, b) for a, b in hourly if a < b]
+    segments['minute'] = [(a, b) for a, b in minute if a < b]
+    return segments
+
+
+def segment_rows(segments):
+    """
+    Minute rows of half-open, non-overlapping segments, from the database and the archive.
+
+    Returns:
+        dict or None: 'timestamp' (datetime64[us]) and one array per count
+        field, ordered by timestamp; None when there are no rows
+    """
+    if not segments:
+        return None
+    parts = []
+    condition = Q()
+    for segment_start, segment_end in segments:
+        condition |= Q(timestamp__gte=segment_start, timestamp__lt=segment_end)
+    rows = list(TotalCount.objects.filter(condition).order_by().values_list(
+        Cast('timestamp', CharField()), *COUNT_FIELDS
+    ))
+    if rows:
+        timestamps, *counts = zip(*rows)
+        parts.append({
+            'timestamp': np.array(timestamps, dtype='datetime64[us]'),
+            **{field: np.array(values, dtype=np.int64) for field, values in zip(COUNT_FIELDS, counts)}
+        })
+    boundary = ArchiveService.boundary()
+    for segment_start, segment_end in segments:
+        if boundary and segment_start < boundary:
+            archived = ArchiveService.columns(segment_start, min(segment_end, boundary))
+            if archived is not None:
+                parts.append({
+                    'timestamp': archived['timestamp'].astype('datetime64[us]'),
+                    **{field: archived[field].astype(np.int64) for field in COUNT_FIELDS}
+                })
+    if not parts:
+        return None
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    order = np.argsort(columns['timestamp'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
+
+
+class RollupService:
+    """Service for maintaining and reading the hourly/daily rollup tables"""
+
+    @staticmethod
+    def _sums():
+        # Aliased so annotations never clash with the model's own count fields
+        return {f'{field}_sum': Sum(field) for field in COUNT_FIELDS}
+
+    @staticmethod
+    def _unpack(row):
+        return {field: row[f'{field}_sum'] or 0 for field in COUNT_FIELDS}
+
+    @staticmethod
+    def refresh(start_time, end_time):
+        """
+        Recompute every rollup bucket touched by the given time range.
+
+        Writers call this after inserting or deleting minute rows. Buckets are
+        rebuilt from source data (the archive for archived months), so
+        refreshing is idempotent and also picks up deletions.
+
+        Args:
+            start_time (datetime): Earliest changed timestamp
+            end_time (datetime): Latest changed timestamp
+        """
+        hour_start = floor_time(start_time, 'hour')
+        hour_end = floor_time(end_time, 'hour') + timedelta(hours=1)
+
+        with transaction.atomic():
+            boundary = ArchiveService.boundary()
+            archived = boundary is not None and hour_start < boundary
+            RollupService._refresh_hours(
+                HourlyCount, TotalCount, (), hour_start, hour_end,
+                ArchiveService.hourly_rows(hour_start, min(hour_end, boundary)) if archived else [],
+                maxima=HOURLY_PEAK_FIELDS
+            )
+            RollupService._refresh_hours(
+                HourlyDirectionCount, DirectionCount, ('direction',), hour_start, hour_end,
+                ArchiveService.hourly_direction_rows(hour_start, min(hour_end, boundary))
+                if archived else [],
+                maxima=HOURLY_PEAK_FIELDS
+            )
+            RollupService._refresh_days(hour_start, hour_end)
+
+    @staticmethod
+    def _refresh_hours(model, source, keys, hour_start, hour_end, archived_rows, maxima=None):
+        """
+        Replace the buckets of an hourly rollup in [hour_start, hour_end).
+
+        Args:
+            model: Hourly rollup model
+            source: Minute-level model the sums are taken from
+            keys (tuple): Extra grouping columns shared by both (e.g. direction)
+            archived_rows (list): Precomputed buckets for the archived hours
+            maxima (dict): Rollup column to the raw columns whose per-row sum
+                it holds the hourly maximum of
+        """
+        maxima = maxima or {}
+        hourly_rows = source.objects.filter(
+            timestamp__gte=hour_start,
+            timestamp__lt=hour_end
+        ).annotate(
+            bucket=TruncHour('timestamp')
+        ).values('bucket', *keys).annotate(
+            records=Count('id'),
+            **RollupService._sums(),
+            **{f'{name}_max': Max(fields_expression(fields)) for name, fields in maxima.items()}
+        ).order_by('bucket', *keys)
+
+        buckets = [
+            model(
+                bucket=row['bucket'],
+                record_count=row['records'],
+                **{key: row[key] for key in keys},
+                **RollupService._unpack(row),
+                **{name: row[f'{name}_max'] or 0 for name in maxima}
+            )
+            for row in hourly_rows
+        ]
+        buckets += [model(**row) for row in archived_rows]
+
+        model.objects.filter(bucket__gte=hour_start, bucket__lt=hour_end).delete()
+        model.objects.bulk_create(buckets, batch_size=1000)
+
+    @staticmethod
+    def refresh_timestamps(timestamps):
+        """
+        Refresh only the hours that contain the given timestamps.
+
+        Consecutive hours are refreshed together, so a batch mixing live
+        readings with an old backfill does not recompute everything between.
+
+        Args:
+            timestamps (iterable): Datetimes of rows that were written
+        """
+        hours = sorted({floor_time(timestamp, 'hour') for timestamp in timestamps})
+        run_start = run_end = None
+        for hour in hours:
+            if run_end is not None and hour == run_end + timedelta(hours=1):
+                run_end = hour
+                continue
+            if run_start is not None:
+                RollupService.refresh(run_start, run_end)
+            run_start = run_end = hour
+        if run_start is not None:
+            RollupService.refresh(run_start, run_end)
+
+    @staticmethod
+    def load_hourly(rows):
+        """
+        Store precomputed hourly sums and refresh the days they fall in.
+
+        Bulk writers that already hold their counts in memory use this to
+        skip re-reading the minute rows. Each row must cover its whole hour.
+
+        Args:
+            rows (list): Dicts with 'bucket', 'record_count', one sum per raw
+                field and the HOURLY_PEAK_FIELDS maxima
+        """
+        if not rows:
+            return
+        first_bucket = min(row['bucket'] for row in rows)
+        last_bucket = max(row['bucket'] for row in rows)
+
+        with transaction.atomic():
+            HourlyCount.objects.filter(
+                bucket__gte=first_bucket, bucket__lte=last_bucket
+            ).delete()
+            HourlyCount.objects.bulk_create(
+                [HourlyCount(**row) for row in rows], batch_size=1000
+            )
+            RollupService._refresh_days(first_bucket, last_bucket + timedelta(hours=1))
+
+    @staticmethod
+    def _refresh_days(start_time, end_time):
+        """Rebuild the daily buckets overlapping [start_time, end_time) from the hourly rollups"""
+        day_start = floor_time(start_time, 'day')
+        day_end = ceil_time(end_time, 'day')
+
+        for daily_model, hourly_model, keys in (
+            (DailyCount, HourlyCount, ()),
+            (DailyDirectionCount, HourlyDirectionCount, ('direction',)),
+        ):
+            daily_rows = hourly_model.objects.filter(
+                bucket__gte=day_start,
+                bucket__lt=day_end
+            ).annotate(
+                day=TruncDate('bucket')
+            ).values('day', *keys).annotate(
+                records=Sum('record_count'), **RollupService._sums()
+            ).order_by('day', *keys)
+
+            daily_model.objects.filter(
+                bucket__gte=day_start.date(), bucket__lt=day_end.date()
+            ).delete()
+            daily_model.objects.bulk_create([
+                daily_model(
+                    bucket=row['day'],
+                    record_count=row['records'],
+                    **{key: row[key] for key in keys},
+                    **RollupService._unpack(row)
+                )
+                for row in daily_rows
+            ], batch_size=1000)
+
+    @staticmethod
+    def rebuild(start_time=None, end_time=None):
+        """
+        Rebuild the rollups over a range (or all history) in bounded chunks.
+
+        Returns:
+            int: Number of chunks processed
+        """
+        if start_time is None or end_time is None:
+            bounds = TotalCount.objects.values_list('timestamp', flat=True)
+            first = bounds.order_by('timestamp').first()
+            last = bounds.order_by('-timestamp').first()
+            archived_first, archived_last = ArchiveService.time_bounds()
+            if archived_first:
+                # The archive always holds the oldest history
+                first = archived_first
+                last = last or archived_last
+            if start_time is None and end_time is None:
+                # A full rebuild also drops buckets left behind by deleted history
+                RollupService.clear()
+            if first is None:
+                return 0
+            start_time = start_time or first
+            end_time = end_time or last
+
+        chunks = 0
+        chunk_start = floor_time(start_time, 'day')
+        while chunk_start <= end_time:
+            chunk_end = min(chunk_start + REBUILD_CHUNK - timedelta(microseconds=1), end_time)
+            RollupService.refresh(chunk_start, chunk_end)
+            chunk_start += REBUILD_CHUNK
+            chunks += 1
+        return chunks
+
+    @staticmethod
+    def clear():
+        """Remove all rollup rows"""
+        for model in (HourlyCount, DailyCount, HourlyDirectionCount, DailyDirectionCount):
+            model.objects.all().delete()
+
+    @staticmethod
+    def sum_range(start_time, end_time):
+        """
+        Sum raw category counts over an inclusive range using the rollups.
+
+        Returns:
+            dict: Field name to total (0 when there is no data)
+        """
+        segments = split_range(start_time, end_time)
+        totals = {field: 0 for field in COUNT_FIELDS}
+
+        querysets = []
+        if segments['daily']:
+            first_day, last_day = segments['daily']
+            querysets.append(DailyCount.objects.filter(
+                bucket__gte=first_day.date(), bucket__lt=last_day.date()
+            ))
+        for segment_start, segment_end in segments['hourly']:
+            querysets.append(HourlyCount.objects.filter(
+                bucket__gte=segment_start, bucket__lt=segment_end
+            ))
+        boundary = ArchiveService.boundary() if segments['minute'] else None
+        for segment_start, segment_end in segments['minute']:
+            querysets.append(TotalCount.objects.filter(
+                timestamp__gte=segment_start,
+                timestamp__lt=segment_end
+            ))
+            if boundary and segment_start < boundary:
+                # Partial hours of archived months come from the month files
+                partial = ArchiveService.sum_range(segment_start, min(segment_end, boundary))
+                for field in COUNT_FIELDS:
+                    totals[field] += partial[field]
+
+        for queryset in querysets:
+            partial = RollupService._unpack(queryset.aggregate(**RollupService._sums()))
+            for field in COUNT_FIELDS:
+                totals[field] += partial[field]
+        return totals
+
+    @staticmethod
+    def bucket_range(start_time, end_time, seconds, offset=0):
+        """
+        Category sums per fixed-size time bucket over an inclusive range.
+
+        Every part of the range is grouped in SQL on the coarsest tier that
+        still fits inside the buckets: the daily rollup for buckets of whole
+        days, the hourly rollup for whole hours and minute rows for the rest
+        (archived minute rows with NumPy).
+
+        Args:
+            start_time (datetime): Range start (inclusive)
+            end_time (datetime): Range end (inclusive)
+            seconds (int): Bucket size
+            offset (int): Shift of the bucket starts from the Unix epoch
+
+        Returns:
+            tuple: (ascending bucket starts in Unix seconds, (buckets, fields)
+            sums in COUNT_FIELDS order), only buckets with data
+        """
+        end_exclusive = end_time + timedelta(microseconds=1)
+        querysets = []
+        if seconds % 3600:
+            minute = [(start_time, end_exclusive)] if start_time < end_exclusive else []
+        else:
+            segments = split_range(start_time, end_time)
+            hourly = list(segments['hourly'])
+            if segments['daily'] and seconds % 86400 == 0:
+                first_day, last_day = segments['daily']
+                querysets.append(DailyCount.objects.filter(
+                    bucket__gte=first_day.date(), bucket__lt=last_day.date()
+                ))
+            elif segments['daily']:
+                hourly.append(segments['daily'])
+            for segment_start, segment_end in hourly:
+                querysets.append(HourlyCount.objects.filter(
+                    bucket__gte=segment_start, bucket__lt=segment_end
+                ))
+            minute = segments['minute']
+
+        parts = []
+        boundary = ArchiveService.boundary() if minute else None
+        for segment_start, segment_end in minute:
+            querysets.append(TotalCount.objects.filter(
+                timestamp__gte=segment_start,
+                timestamp__lt=segment_end
+            ))
+            if boundary and segment_start < boundary:
+                for rows in ArchiveService.iter_months(segment_start, min(segment_end, boundary)):
+                    parts.append(group_buckets(
+                        epoch_slots(rows['timestamp'], seconds, offset),
+                        np.column_stack([rows[field] for field in COUNT_FIELDS])
+                    ))
+
+        for queryset in querysets:
+            time_field = 'timestamp' if queryset.model is TotalCount else 'bucket'
+            rows = list(queryset.values(
+                slot=epoch_bucket(F(time_field), seconds, offset)
+            ).annotate(**RollupService._sums()).order_by().values_list(
+                'slot', *RollupService._sums()
+            ))
+            if rows:
+                rows = np.array(rows, dtype=np.int64)
+                parts.append((rows[:, 0], rows[:, 1:]))
+
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(COUNT_FIELDS)), dtype=np.int64)
+        return group_buckets(
+            np.concatenate([slots for slots, _ in parts]),
+            np.concatenate([sums for _, sums in parts])
+        )
+
+    @staticmethod
+    def daily_range(start_time, end_time):
+        """
+        Per-date category sums over an inclusive range using the rollups.
+
+        Returns:
+            list: Dicts with 'date' and one total per raw field, ordered by date
+        """
+        segments = split_range(start_time, end_time)
+        by_date = {}
+
+        def merge(rows, date_key):
+            for row in rows:
+                entry = by_date.setdefault(
+                    row[date_key], {field: 0 for field in COUNT_FIELDS}
+                )
+                for field, value in RollupService._unpack(row).items():
+                    entry[field] += value
+
+        if segments['daily']:
+            first_day, last_day = segments['daily']
+            merge(DailyCount.objects.filter(
+                bucket__gte=first_day.date(), bucket__lt=last_day.date()
+            ).values('bucket').annotate(**RollupService._sums()).order_by(), 'bucket')
+        for segment_start, segment_end in segments['hourly']:
+            merge(HourlyCount.objects.filter(
+                bucket__gte=segment_start, bucket__lt=segment_end
+            ).annotate(
+                day=TruncDate('bucket')
+            ).values('day').annotate(**RollupService._sums()).order_by(), 'day')
+        boundary = ArchiveService.boundary() if segments['minute'] else None
+        for segment_start, segment_end in segments['minute']:
+            merge(TotalCount.objects.filter(
+                timestamp__gte=segment_start,
+                timestamp__lt=segment_end
+            ).values('timestamp__date').annotate(
+                **RollupService._sums()
+            ).order_by(), 'timestamp__date')
+            # Archived parts of the segment, one date at a time (a segment
+            # without a whole hour can still cross midnight)
+            piece_start = segment_start
+            while boundary and piece_start < min(segment_end, boundary):
+                piece_end = min(
+                    segment_end, boundary, floor_time(piece_start, 'day') + timedelta(days=1)
+                )
+                partial = ArchiveService.sum_range(piece_start, piece_end)
+                if any(partial.values()):
+                    merge([{
+                        'date': piece_start.date(),
+                        **{f'{field}_sum': value for field, value in partial.items()}
+                    }], 'date')
+                piece_start = piece_end
+
+        return [dict(date=date, **by_date[date]) for date in sorted(by_date)]
@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
+from core.db_router import READ_ALIAS, read_only_name
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -74,14 +78,91 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DATABASE_PROFILE=production tunes SQLite for concurrent serving: WAL journal
+# (readers never wait for a writer), persistent connections, and a read-only
+# 'readonly' alias on the same file that core.db_router sends reads to.
+
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'development')
+
+SQLITE_PATH = BASE_DIR / 'db.sqlite3'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': SQLITE_PATH,
     }
 }
 
+if DATABASE_PROFILE == 'production':
+    SQLITE_PRAGMAS = [
+        'PRAGMA synchronous = NORMAL',  # Durable up to the last checkpoint with WAL
+        'PRAGMA mmap_size = 268435456',  # Read pages straight from a 256 MB mapping
+        'PRAGMA cache_size = -65536',  # 64 MB page cache per connection
+        'PRAGMA busy_timeout = 5000',  # Wait up to 5 s for another writer
+        'PRAGMA temp_store = MEMORY',
+    ]
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(['PRAGMA journal_mode = WAL', *SQLITE_PRAGMAS]),
+                # Take the write lock up front, where busy_timeout applies, instead
+                # of failing when a read transaction later tries to upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
+        },
+        READ_ALIAS: {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': read_only_name(SQLITE_PATH),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(SQLITE_PRAGMAS),
+            },
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+    DATABASE_ROUTERS = ['core.db_router.ReadWriteRouter']
+
+
+# Archive
+# Closed months of minute data are moved here as one compressed file per month
+# (see `manage.py archive_traffic_data`). Back it up together with the database.
+
+TRAFFIC_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+
+# Aggregation
+# 'sql' aggregates in the database (rollups for whole hours and days). 'columns'
+# reads the memory-mapped column store in COLUMN_STORE_DIR instead, once it has
+# been built with `manage.py build_column_store`; until then SQL is used.
+
+AGGREGATION_BACKEND = os.getenv('AGGREGATION_BACKEND', 'sql')
+
+COLUMN_STORE_DIR = BASE_DIR / 'column_store'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The dashboard cache is file based so every worker process shares entries.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'dashboard',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,12 +225,16 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'if-none-match',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
 
+# Let browser clients read the validators of conditional GETs
+CORS_EXPOSE_HEADERS = ['etag']
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
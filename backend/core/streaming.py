@@ -0,0 +1,278 @@
+import io
+import json
+import numpy as np
+from datetime import datetime
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import msgpack
+except ImportError:  # Optional, only needed for format=msgpack
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional, only needed for format=arrow
+    pa = None
+
+
+# Rows serialized per yielded chunk; keeps per-chunk overhead low without buffering
+ROWS_PER_CHUNK = 500
+
+# Export formats by ?format= name, with the media type they are served as
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'msgpack': 'application/vnd.msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Further media types clients send in Accept for the same formats
+FORMAT_ALIASES = {
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.apache.arrow.file': 'arrow',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonlines': 'ndjson'
+}
+
+# Formats that need an optional package, and whether it is installed
+OPTIONAL_FORMATS = {'msgpack': msgpack is not None, 'arrow': pa is not None}
+
+
+class StreamJSONEncoder(DjangoJSONEncoder):
+    """Keeps full microsecond precision so timestamps round-trip as keyset cursors"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            encoded = o.isoformat()
+            return encoded[:-6] + 'Z' if encoded.endswith('+00:00') else encoded
+        return super().default(o)
+
+
+class ClosingIterator:
+    """
+    Iterator that runs `on_close` once, when exhausted or closed.
+
+    Unlike a generator's finally block, this also runs when the response is
+    closed before iteration started (e.g. the client disconnected).
+    """
+
+    def __init__(self, iterable, on_close=None):
+        self.iterator = iter(iterable)
+        self.on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if hasattr(self.iterator, 'close'):
+            self.iterator.close()
+        if self.on_close:
+            on_close, self.on_close = self.on_close, None
+            on_close()
+
+
+def _encode(value):
+    return json.dumps(value, cls=StreamJSONEncoder)
+
+
+def _chunked(rows, size=ROWS_PER_CHUNK):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_ndjson(rows):
+    """
+    Encode rows as newline-delimited JSON, one object per line.
+
+    Args:
+        rows (iterable): Dicts to serialize
+
+    Yields:
+        str: Chunks of NDJSON text
+    """
+    for batch in _chunked(rows):
+        yield ''.join(_encode(row) + '\n' for row in batch)
+
+
+def stream_json(rows, limit=None, cursor=None):
+    """
+    Encode rows as a single JSON document without building it in memory.
+
+    The document keeps the shape of the original /data/ response and adds a
+    'next_after' cursor when the page was cut off by the limit.
+
+    Args:
+        rows (iterable): Dicts to serialize
+        limit (int): Page size the rows were fetched with, if any
+        cursor (callable): Keyset cursor of a row, given the last one
+
+    Yields:
+        str: Chunks of the JSON document
+    """
+    yield '{"data": ['
+    total = 0
+    last_row = None
+    for batch in _chunked(rows):
+        prefix = ',' if total else ''
+        yield prefix + ','.join(_encode(row) for row in batch)
+        total += len(batch)
+        last_row = batch[-1]
+
+    next_after = None
+    if cursor and limit and total >= limit and last_row is not None:
+        next_after = cursor(last_row)
+    yield '], "total_records": %d, "next_after": %s}' % (total, _encode(next_after))
+
+
+def negotiate_format(request, formats):
+    """
+    Pick the response format from ?format= or else the Accept header.
+
+    Accept entries are tried by descending quality (ties in header order);
+    when none names a supported format, the first of `formats` is used, so
+    browsers and `*/*` get the default.
+
+    Args:
+        request (HttpRequest): Incoming request
+        formats (list): Supported EXPORT_FORMATS names, default first
+
+    Returns:
+        str: Format name
+
+    Raises:
+        ValueError: If ?format= names an unsupported or unavailable format
+    """
+    available = [name for name in formats if OPTIONAL_FORMATS.get(name, True)]
+    requested = request.GET.get('format')
+    if requested:
+        if requested not in formats:
+            raise ValueError(f"format must be one of: {', '.join(formats)}")
+        if requested not in available:
+            raise ValueError(f"format '{requested}' is not available on this server")
+        return requested
+
+    media_types = {EXPORT_FORMATS[name]: name for name in available}
+    media_types.update({alias: name for alias, name in FORMAT_ALIASES.items() if name in available})
+    accepted = []
+    for position, entry in enumerate(request.headers.get('Accept', '').split(',')):
+        media_type, *params = [part.strip() for part in entry.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and media_type.lower() in media_types:
+            accepted.append((-quality, position, media_types[media_type.lower()]))
+    return min(accepted)[2] if accepted else formats[0]
+
+
+def _column_values(batch, name, time_column):
+    """A batch column as int64, the time column as Unix epoch milliseconds"""
+    if name == time_column:
+        return batch[name].astype('datetime64[ms]').astype(np.int64)
+    return batch[name].astype(np.int64, copy=False)
+
+
+def stream_csv(names, batches, time_column='timestamp'):
+    """
+    Encode column batches as CSV with a header row.
+
+    The time column is written as Unix epoch milliseconds (UTC) and every
+    other column as an integer, so no quoting is ever needed.
+
+    Args:
+        names (list): Column names, in output order
+        batches (iterable): Dicts of equal-length arrays keyed by name
+        time_column (str): Name of the datetime64 column
+
+    Yields:
+        str: Chunks of CSV text
+    """
+    yield ','.join(names) + '\r\n'
+    line = ','.join(['%d'] * len(names)) + '\r\n'
+    for batch in batches:
+        rows = zip(*(_column_values(batch, name, time_column).tolist() for name in names))
+        yield ''.join(line % row for row in rows)
+
+
+def stream_msgpack(names, batches, time_column='timestamp'):
+    """
+    Encode column batches as a stream of MessagePack maps.
+
+    Every map holds one batch as column name -> array of integers, the time
+    column as Unix epoch milliseconds (UTC); read them back one map at a
+    time with msgpack.Unpacker.
+
+    Args:
+        names (list): Column names, in output order
+        batches (iterable): Dicts of equal-length arrays keyed by name
+        time_column (str): Name of the datetime64 column
+
+    Yields:
+        bytes: One packed map per batch
+    """
+    packer = msgpack.Packer()
+    for batch in batches:
+        yield packer.pack({
+            name: _column_values(batch, name, time_column).tolist() for name in names
+        })
+
+
+def stream_arrow(names, batches, time_column='timestamp'):
+    """
+    Encode column batches as an Arrow IPC stream, one record batch per batch.
+
+    The time column is typed timestamp[ms, UTC], every other column int64.
+
+    Args:
+        names (list): Column names, in output order
+        batches (iterable): Dicts of equal-length arrays keyed by name
+        time_column (str): Name of the datetime64 column
+
+    Yields:
+        bytes: The schema, then one encoded record batch per batch
+    """
+    schema = pa.schema([
+        (name, pa.timestamp('ms', tz='UTC') if name == time_column else pa.int64())
+        for name in names
+    ])
+    sink = io.BytesIO()
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    writer = pa.ipc.new_stream(sink, schema)
+    yield drain()
+    for batch in batches:
+        writer.write_batch(pa.record_batch([
+            pa.array(_column_values(batch, name, time_column), type=schema.field(name).type)
+            for name in names
+        ], schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+
+# Column batch encoders by format name
+COLUMN_ENCODERS = {'csv': stream_csv, 'msgpack': stream_msgpack, 'arrow': stream_arrow}
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+import pytest
+from core.archive import ArchiveService
+from core.ingestion import IngestionService
+from core.models import ArchivedMonth, TotalCount
+from core.rollups import COUNT_FIELDS
+from core.utils import DataAggregationService
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+MONTH = utc(2020, 1, 1)
+BOUNDARY = utc(2020, 2, 1)
+
+# Readings every 20 seconds at :07, :27 and :47 from Jan 29 through Feb 1
+FIRST_READING = utc(2020, 1, 29, 0, 0, 7)
+STEP = timedelta(seconds=20)
+READINGS = 4 * 1440 * 3
+
+# Inclusive ranges within the archived month, across the boundary and within the live one
+RANGES = [
+    (FIRST_READING, FIRST_READING + READINGS * STEP),
+    (utc(2020, 1, 29, 5, 13, 30), utc(2020, 1, 31, 18)),
+    (utc(2020, 1, 30, 22, 41, 5), utc(2020, 2, 1, 3, 2, 9)),
+    (utc(2020, 1, 31, 23, 59, 30), utc(2020, 2, 1, 0, 0, 30)),
+    (utc(2020, 2, 1, 0, 20), utc(2020, 2, 1, 23, 59, 59)),
+]
+
+
+def snapshot():
+    """Totals, daily series and peaks of every range"""
+    return [
+        (
+            DataAggregationService.get_category_totals(start_time, end_time),
+            DataAggregationService.get_daily_volume_data(start_time, end_time),
+            DataAggregationService.get_peaks(start_time, end_time, top_n=3),
+            DataAggregationService.get_peaks(start_time, end_time, top_n=3, bucket='hour'),
+        )
+        for start_time, end_time in RANGES
+    ]
+
+
+@pytest.mark.django_db
+def test_archiving_a_month_keeps_every_answer(settings, tmp_path):
+    settings.TRAFFIC_ARCHIVE_DIR = tmp_path
+    counts = np.random.default_rng(18).integers(0, 40, size=(READINGS, len(COUNT_FIELDS)))
+    result = IngestionService.ingest([
+        {
+            'sensor': 'archive',
+            'timestamp': (FIRST_READING + index * STEP).isoformat(),
+            'totals': dict(zip(COUNT_FIELDS, map(int, row)))
+        }
+        for index, row in enumerate(counts)
+    ])
+    assert result['accepted'] == READINGS
+    before = snapshot()
+
+    archived = ArchiveService.archive_month(MONTH)
+    # Jan 29 to 31
+    assert archived == 3 * 1440 * 3
+    assert not TotalCount.objects.filter(timestamp__lt=BOUNDARY).exists()
+    assert ArchiveService.boundary() == BOUNDARY
+    assert (tmp_path / ArchivedMonth.objects.get().file_name).exists()
+
+    assert snapshot() == before
@@ -0,0 +1,53 @@
+import json
+import os
+import pytest
+from django.test import override_settings
+from core.benchmarks import (
+    BENCHMARK_CACHES,
+    DATASET_SIZES,
+    ENDPOINTS,
+    PERIODS,
+    RANGELESS_ENDPOINTS,
+    find_regressions,
+    run_dataset,
+    seed_dataset,
+)
+
+
+# The module fixture seeds the test database, which is only set up for django_db tests
+pytestmark = pytest.mark.django_db
+
+# Results JSON of an earlier `manage.py benchmark --output` run to compare against
+BASELINE_PATH = os.getenv('BENCHMARK_BASELINE')
+
+# Same default as `manage.py benchmark --max-regression`
+MAX_REGRESSION = float(os.getenv('BENCHMARK_MAX_REGRESSION', '1.5'))
+
+DATASET = '10k'
+
+
+@pytest.fixture(scope='module')
+def results(django_db_setup, django_db_blocker):
+    """The benchmark suite run once against the 10k dataset in the test database"""
+    with django_db_blocker.unblock(), override_settings(CACHES=BENCHMARK_CACHES):
+        records = seed_dataset(DATASET_SIZES[DATASET])
+        assert records >= DATASET_SIZES[DATASET]
+        return {'results': run_dataset(DATASET)}
+
+
+def test_every_target_is_measured(results):
+    endpoints = {
+        (result['target'], result['range'])
+        for result in results['results'] if result['kind'] == 'endpoint'
+    }
+    ranges = [f'{period}d' for period in PERIODS] + ['custom']
+    expected = {(endpoint, label) for endpoint in ENDPOINTS for label in ranges}
+    assert endpoints == expected | {(endpoint, None) for endpoint in RANGELESS_ENDPOINTS}
+
+
+def test_no_regressions_against_baseline(results):
+    if not BASELINE_PATH:
+        pytest.skip('set BENCHMARK_BASELINE to a results JSON to compare against')
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    assert find_regressions(results, baseline, MAX_REGRESSION) == []
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+import pytest
+from django.test import override_settings
+from core import column_store as column_store_module
+from core.column_store import ColumnStore
+from core.ingestion import IngestionService
+from core.rollups import COUNT_FIELDS, RollupService
+from core.utils import DataAggregationService
+
+
+# The module fixture writes to the test database, which is only set up for django_db tests
+pytestmark = pytest.mark.django_db
+
+# Readings every 20 seconds at :07, :27 and :47, so no reading sits on a minute start
+START = datetime(2021, 3, 1, 0, 0, 7, tzinfo=dt_timezone.utc)
+STEP = timedelta(seconds=20)
+READINGS = 3 * 1440 * 2
+
+SENSOR = 'parity'
+
+# Inclusive ranges whose ends cut through minutes, hours and days
+RANGES = [
+    (START, START + READINGS * STEP),
+    (START + timedelta(seconds=30), START + timedelta(days=1, hours=5, seconds=10)),
+    (START + timedelta(hours=3, minutes=1, seconds=17), START + timedelta(hours=3, minutes=58, seconds=40)),
+    (START + timedelta(hours=23, minutes=59, seconds=50), START + timedelta(days=1, seconds=1)),
+    # Ends exactly on readings, which are inclusive
+    (START + 90 * STEP, START + 2000 * STEP),
+    # Inside one minute: holding one reading, and falling between two
+    (START + 30 * STEP - timedelta(seconds=5), START + 30 * STEP + timedelta(seconds=5)),
+    (START + 30 * STEP + timedelta(seconds=1), START + 31 * STEP - timedelta(seconds=1)),
+    # No readings at all
+    (START - timedelta(days=2, seconds=13), START - timedelta(days=1, seconds=41)),
+]
+
+
+@pytest.fixture(scope='module')
+def store(django_db_setup, django_db_blocker, tmp_path_factory):
+    """A column store built over readings that are not minute-aligned"""
+    rng = np.random.default_rng(19)
+    counts = rng.integers(0, 30, size=(READINGS, len(COUNT_FIELDS)))
+    readings = [
+        {
+            'sensor': SENSOR,
+            'timestamp': (START + index * STEP).isoformat(),
+            'totals': dict(zip(COUNT_FIELDS, map(int, row)))
+        }
+        for index, row in enumerate(counts)
+    ]
+    store = ColumnStore(tmp_path_factory.mktemp('columns'))
+    with django_db_blocker.unblock(), pytest.MonkeyPatch.context() as patch:
+        assert IngestionService.ingest(readings)['accepted'] == READINGS
+        store.build()
+        patch.setattr(column_store_module, 'column_store', store)
+        yield store
+
+
+def both_backends(function, *args, **kwargs):
+    results = []
+    for backend in ['sql', 'columns']:
+        with override_settings(AGGREGATION_BACKEND=backend):
+            results.append(function(*args, **kwargs))
+    return results
+
+
+@pytest.mark.parametrize('start_time, end_time', RANGES)
+def test_store_matches_the_rollups(store, start_time, end_time):
+    assert store.sum_range(start_time, end_time) == RollupService.sum_range(start_time, end_time)
+    assert store.daily_range(start_time, end_time) == RollupService.daily_range(start_time, end_time)
+
+
+@pytest.mark.parametrize('start_time, end_time', RANGES)
+@pytest.mark.parametrize('interval', ['1m', '15m', '1h', '1d'])
+def test_volume_series_matches(store, start_time, end_time, interval):
+    (sql_slots, sql_series), (slots, series) = both_backends(
+        DataAggregationService.get_volume_series, start_time, end_time, interval
+    )
+    np.testing.assert_array_equal(slots, sql_slots)
+    for category, values in sql_series.items():
+        np.testing.assert_array_equal(series[category], values)
+
+
+@pytest.mark.parametrize('start_time, end_time', RANGES)
+def test_responses_match(store, start_time, end_time):
+    for function, kwargs in [
+        (DataAggregationService.get_category_totals, {}),
+        (DataAggregationService.get_daily_volume_data, {}),
+        (DataAggregationService.get_peaks, {'top_n': 3}),
+        (DataAggregationService.get_peaks, {'top_n': 3, 'bucket': 'hour'}),
+        (DataAggregationService.get_heatmap, {'bucket': 'minute'}),
+        (DataAggregationService.get_heatmap, {'bucket': 'hour'}),
+    ]:
+        sql, columns = both_backends(function, start_time, end_time, **kwargs)
+        assert columns == sql, function.__name__
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pytest
+from core.compression import brotli
+from core.ingestion import IngestionService
+from core.rollups import COUNT_FIELDS
+
+
+FIRST_READING = datetime(2021, 9, 1, 0, 0, 7, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture
+def readings(db):
+    result = IngestionService.ingest([
+        {
+            'sensor': 'etag',
+            'timestamp': (FIRST_READING + index * timedelta(minutes=1)).isoformat(),
+            'totals': {field: index % 17 for field in COUNT_FIELDS}
+        }
+        for index in range(3 * 1440)
+    ])
+    assert result['accepted'] == 3 * 1440
+
+
+@pytest.mark.parametrize('encoding', [
+    'gzip',
+    pytest.param('br', marks=pytest.mark.skipif(brotli is None, reason='brotli is not installed')),
+    None,
+])
+@pytest.mark.parametrize('path', ['/dashboard/?period=3', '/data/?period=3'])
+def test_not_modified_repeats_the_etag(client, readings, encoding, path):
+    headers = {'HTTP_ACCEPT_ENCODING': encoding} if encoding else {}
+    response = client.get(path, **headers)
+    assert response.status_code == 200
+    assert response.get('Content-Encoding') == encoding
+    etag = response['ETag']
+    assert etag.startswith('W/"')
+
+    not_modified = client.get(path, HTTP_IF_NONE_MATCH=etag, **headers)
+    assert not_modified.status_code == 304
+    assert not_modified['ETag'] == etag
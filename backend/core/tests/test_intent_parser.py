@@ -0,0 +1,76 @@
+import pytest
+from core import llm_service
+from core.intent_parser import (
+    ALL_CATEGORIES,
+    CATEGORY_PHRASES,
+    CHART_NAMES,
+    CHART_PHRASES,
+    DATE_RANGE_PHRASES,
+    DEFAULT_CHART_TYPE,
+    DEFAULT_DATE_RANGE,
+    RANGE_DAYS,
+    parse_intent,
+)
+
+
+def chart_of(prompt):
+    result = parse_intent(prompt)
+    assert result is not None, prompt
+    return result["state"]["date_range"], result["state"]["charts"][0]
+
+
+@pytest.mark.parametrize("prompt, date_range, chart_type, categories", [
+    ("show all trucks for the last 7 days", "LAST_7_DAYS", "line-monotone", ["trucks"]),
+    ("bar chart of all pedestrians this week", "LAST_7_DAYS", "bar-simple", ["pedestrians"]),
+    ("show me all the cars", "LAST_7_DAYS", "line-monotone", ["fourWheelers"]),
+    ("all bikes and cars over 30 days", "LAST_30_DAYS", "line-monotone", ["twoWheelers", "fourWheelers"]),
+])
+def test_all_does_not_override_named_categories(prompt, date_range, chart_type, categories):
+    parsed_range, chart = chart_of(prompt)
+    assert (parsed_range, chart["type"], chart["category"]) == (date_range, chart_type, categories)
+    assert not chart["title"].startswith("Traffic")
+
+
+@pytest.mark.parametrize("prompt", [
+    "bar chart of all vehicles",
+    "line chart of every category for 2 days",
+    "show everything as a stacked bar chart",
+    "all types over the last 15 days",
+])
+def test_all_categories_without_a_named_one(prompt):
+    _, chart = chart_of(prompt)
+    assert chart["category"] == ALL_CATEGORIES
+    assert chart["title"].startswith("Traffic Volume")
+
+
+def test_pie_charts_have_no_category():
+    date_range, chart = chart_of("pie chart of all vehicles last month")
+    assert (date_range, chart["type"], chart["category"]) == ("LAST_30_DAYS", "pie", None)
+
+
+@pytest.mark.parametrize("prompt", [
+    "why are there so many trucks?",
+    "compare cars and trucks",
+    "bar chart and pie chart of cars",
+    "show the weather",
+])
+def test_other_prompts_are_left_to_the_model(prompt):
+    assert parse_intent(prompt) is None
+
+
+def test_tables_match_the_model_schema():
+    chart_types = llm_service.PIE_CHARTS + llm_service.BAR_CHARTS + llm_service.LINE_CHARTS
+    assert sorted(value for value, _ in CHART_PHRASES) == sorted(chart_types)
+    assert sorted(CHART_NAMES) == sorted(chart_types)
+    assert [value for value, _ in CATEGORY_PHRASES if value] == llm_service.CATEGORIES
+    assert ALL_CATEGORIES == llm_service.CATEGORIES
+    ranges = [value for value in llm_service.DATE_RANGES if value != "CUSTOM"]
+    assert [value for value, _ in DATE_RANGE_PHRASES] == ranges
+    assert list(RANGE_DAYS) == ranges
+    assert DEFAULT_DATE_RANGE in ranges
+    assert DEFAULT_CHART_TYPE in chart_types
+
+
+def test_parsed_states_validate_against_the_model_schema():
+    for prompt in ["bar chart of all vehicles", "show me all the cars", "donut of trucks for 2 days"]:
+        llm_service.DashboardState(**parse_intent(prompt)["state"])
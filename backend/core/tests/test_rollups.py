@@ -0,0 +1,186 @@
+import importlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+import pytest
+from django.apps import apps
+from core.ingestion import IngestionService
+from core.models import HourlyCount
+from core.rollups import COUNT_FIELDS, RollupService, epoch_slots
+from core.utils import MONDAY_OFFSET, PEAK_COLUMNS, DataAggregationService
+
+
+# The module fixture writes to the test database, which is only set up for django_db tests
+pytestmark = pytest.mark.django_db
+
+DAY = datetime(2021, 6, 1, tzinfo=dt_timezone.utc)
+DAYS = 3
+
+# One sensor reads every 20 seconds at :07, :27 and :47, another on every hour start
+STEP = timedelta(seconds=20)
+OFFSET = timedelta(seconds=7)
+
+# An hour without any reading
+GAP_HOUR = DAY + timedelta(hours=30)
+
+# Small counts, so peaks tie often
+MAX_COUNT = 8
+
+H = timedelta(hours=1)
+S = timedelta(seconds=1)
+
+# Inclusive ranges over every mix of the day, hour and minute tiers
+RANGES = [
+    (DAY, DAY + DAYS * 24 * H - S),
+    (DAY + 24 * H, DAY + 48 * H - timedelta(microseconds=1)),
+    (DAY + 2 * H, DAY + 5 * H),
+    (DAY + 2 * H + 13 * S, DAY + 2 * H + 40 * timedelta(minutes=1)),
+    (DAY + 23 * H + 59 * timedelta(minutes=1), DAY + 24 * H + 5 * S),
+    (DAY + 3 * H + 30 * S, DAY + 50 * H + 47 * S),
+    (DAY + 20 * H + 7 * S, DAY + 27 * H),
+    (GAP_HOUR - 10 * S, GAP_HOUR + H + 10 * S),
+    (DAY + 5 * H + 27 * S, DAY + 5 * H + 27 * S),
+    (DAY + 5 * H + 28 * S, DAY + 5 * H + 46 * S),
+    (DAY + 6 * H, DAY + 5 * H),
+]
+
+
+@pytest.fixture(scope='module')
+def readings(django_db_setup, django_db_blocker):
+    """Timestamps (datetime64[us]) and (readings, fields) counts of the ingested readings"""
+    moments = [DAY + OFFSET + index * STEP for index in range(DAYS * 24 * 180)]
+    hour_starts = [DAY + hour * H for hour in range(DAYS * 24)]
+    sensors = ['every-20s'] * len(moments) + ['hourly'] * len(hour_starts)
+    moments += hour_starts
+    counts = np.random.default_rng(5).integers(0, MAX_COUNT, size=(len(moments), len(COUNT_FIELDS)))
+    kept = [index for index, moment in enumerate(moments) if not GAP_HOUR <= moment < GAP_HOUR + H]
+
+    with django_db_blocker.unblock():
+        result = IngestionService.ingest([
+            {
+                'sensor': sensors[index],
+                'timestamp': moments[index].isoformat(),
+                'totals': dict(zip(COUNT_FIELDS, map(int, counts[index])))
+            }
+            for index in kept
+        ])
+    assert result['accepted'] == len(kept)
+    timestamps = np.array(
+        [moments[index].replace(tzinfo=None) for index in kept], dtype='datetime64[us]'
+    )
+    order = np.argsort(timestamps, kind='stable')
+    return timestamps[order], counts[kept][order]
+
+
+def inside(readings, start_time, end_time):
+    """Brute-force selection of the readings in an inclusive range"""
+    timestamps, counts = readings
+    start, end = (np.datetime64(moment.replace(tzinfo=None), 'us') for moment in (start_time, end_time))
+    mask = (timestamps >= start) & (timestamps <= end)
+    return timestamps[mask], counts[mask]
+
+
+def category_values(counts):
+    return {
+        category: sum(counts[:, COUNT_FIELDS.index(field)] for field in fields)
+        for category, fields in PEAK_COLUMNS.items()
+    }
+
+
+@pytest.mark.parametrize('start_time, end_time', RANGES)
+def test_sum_range(readings, start_time, end_time):
+    _, counts = inside(readings, start_time, end_time)
+    expected = dict(zip(COUNT_FIELDS, counts.sum(axis=0).tolist()))
+    assert RollupService.sum_range(start_time, end_time) == expected
+
+
+@pytest.mark.parametrize('start_time, end_time', RANGES)
+def test_daily_range(readings, start_time, end_time):
+    timestamps, counts = inside(readings, start_time, end_time)
+    days = timestamps.astype('datetime64[D]')
+    expected = [
+        dict(date=day.item(), **dict(zip(COUNT_FIELDS, counts[days == day].sum(axis=0).tolist())))
+        for day in np.unique(days)
+    ]
+    assert RollupService.daily_range(start_time, end_time) == expected
+
+
+@pytest.mark.parametrize('start_time, end_time', RANGES)
+@pytest.mark.parametrize('seconds, offset', [
+    (60, 0), (900, 0), (3600, 0), (86400, 0), (7 * 86400, MONDAY_OFFSET)
+])
+def test_bucket_range(readings, start_time, end_time, seconds, offset):
+    timestamps, counts = inside(readings, start_time, end_time)
+    slots = epoch_slots(timestamps, seconds, offset)
+    expected_slots = np.unique(slots)
+    expected = np.array(
+        [counts[slots == slot].sum(axis=0) for slot in expected_slots]
+    ).reshape(-1, len(COUNT_FIELDS))
+
+    found_slots, sums = RollupService.bucket_range(start_time, end_time, seconds, offset)
+    np.testing.assert_array_equal(found_slots, expected_slots)
+    np.testing.assert_array_equal(sums, expected)
+
+
+@pytest.mark.parametrize('start_time, end_time', RANGES)
+@pytest.mark.parametrize('bucket', ['minute', 'hour'])
+@pytest.mark.parametrize('top_n', [1, 5])
+def test_rank_peaks(readings, start_time, end_time, bucket, top_n):
+    timestamps, counts = inside(readings, start_time, end_time)
+    if bucket == 'hour':
+        hours = timestamps.astype('datetime64[h]')
+        moments = np.unique(hours)
+        values = {
+            category: np.array([value[hours == hour].sum() for hour in moments], dtype=np.int64)
+            for category, value in category_values(counts).items()
+        }
+    else:
+        moments, values = timestamps, category_values(counts)
+
+    peaks = DataAggregationService._rank_peaks(start_time, end_time, top_n, bucket)
+    for category, value in values.items():
+        # Highest value first, earliest moment on ties
+        top = sorted(zip((-value).tolist(), moments.tolist()))[:top_n]
+        expected = [(-negative, moment.replace(tzinfo=dt_timezone.utc)) for negative, moment in top]
+        assert [(peak['peak_value'], peak['timestamp']) for peak in peaks[category]] == expected
+
+
+def hourly_maxima(readings):
+    """Highest single reading per hour of every HourlyCount peak field"""
+    timestamps, counts = readings
+    hours = timestamps.astype('datetime64[h]')
+    column = {field: counts[:, index] for index, field in enumerate(COUNT_FIELDS)}
+    values = {
+        'pedestrian_peak': column['pedestrian'],
+        'two_wheeler_peak': column['two_wheeler'],
+        'car_peak': column['car'],
+        'heavy_peak': column['bus'] + column['truck'],
+        'total_peak': counts.sum(axis=1)
+    }
+    return {
+        hour.item().replace(tzinfo=dt_timezone.utc): {
+            name: int(value[hours == hour].max()) for name, value in values.items()
+        }
+        for hour in np.unique(hours)
+    }
+
+
+def stored_maxima(names):
+    return {
+        row['bucket']: {name: row[name] for name in names}
+        for row in HourlyCount.objects.filter(
+            bucket__gte=DAY, bucket__lt=DAY + DAYS * 24 * H
+        ).values('bucket', *names)
+    }
+
+
+def test_hourly_peaks_hold_the_highest_reading(readings):
+    expected = hourly_maxima(readings)
+    assert stored_maxima(list(next(iter(expected.values())))) == expected
+
+
+def test_migration_fills_the_hourly_peaks(readings):
+    migration = importlib.import_module('core.migrations.0010_hourly_peaks')
+    names = list(migration.HOURLY_PEAK_FIELDS)
+    HourlyCount.objects.update(**{name: 0 for name in names})
+    migration.populate_maxima(apps, None)
+    assert stored_maxima(names) == hourly_maxima(readings)
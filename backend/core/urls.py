@@ -21,6 +21,7 @@ from . import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('data/', views.get_all_data, name='get_all_data'),
+    path('ingest/', views.ingest_readings, name='ingest_readings'),
     path('card-data/', views.get_card_data, name='get_card_data'),
     path(
         'traffic-volume-data/',
@@ -30,7 +31,15 @@ urlpatterns = [
     path('peak-time-data/', 
          views.get_peak_time_data, 
          name='get_peak_time_data'),
+    path('dashboard/', views.get_dashboard_data, name='get_dashboard_data'),
+    path('heatmap/', views.get_heatmap, name='get_heatmap'),
+    path('direction-totals/', views.get_direction_totals, name='get_direction_totals'),
+    path('od-matrix/', views.get_od_matrix, name='get_od_matrix'),
+    path('direction-peaks/', views.get_direction_peaks, name='get_direction_peaks'),
     path('latest-data-info/', views.get_latest_data_info, name='get_latest_data_info'),
+    path('cache-stats/', views.get_cache_stats, name='get_cache_stats'),
+    path('metrics', views.get_metrics, name='get_metrics'),
     path('debug-card-data/', views.debug_card_data, name='debug_card_data'),
-    path('get-output-from-llm/', views.get_output_from_llm, name="get_output_from_llm")
+    path('get-output-from-llm/', views.get_output_from_llm, name="get_output_from_llm"),
+    path('get-output-from-llm/stream/', views.stream_output_from_llm, name="stream_output_from_llm")
 ]
@@ -1,7 +1,17 @@
-from django.db.models import Sum, F
+import heapq
+import numpy as np
+from django.db.models import CharField, F, Q
+from django.db.models.functions import Cast
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import TrafficRecord, TotalCount
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+from itertools import chain, islice
+from .archive import ArchiveService, rows_past, to_datetimes
+from .column_store import get_column_store
+from .data_stats import DataStatsService
+from .downsampling import lttb_indices
+from .models import COUNT_FIELDS, HourlyCount, TotalCount
+from .rollups import RollupService, ceil_time, epoch_slots, floor_time, group_buckets, segment_rows
 
 
 # Constants
@@ -32,6 +42,61 @@ FIELD_MAPPINGS = {
     'trucks': 'bus + truck'  # Special case for heavy vehicles
 }
 
+# Peak categories as sums of raw columns
+PEAK_COLUMNS = {
+    'pedestrians': ['pedestrian'],
+    'twoWheelers': ['two_wheeler'],
+    'fourWheelers': ['car'],
+    'trucks': ['bus', 'truck']
+}
+
+# Hourly rollup column holding each category's highest reading per hour
+CATEGORY_PEAK_FIELDS = {
+    'pedestrians': 'pedestrian_peak',
+    'twoWheelers': 'two_wheeler_peak',
+    'fourWheelers': 'car_peak',
+    'trucks': 'heavy_peak'
+}
+
+PEAK_BUCKETS = ['minute', 'hour']
+
+# Most peaks a request may ask for per category (or per direction)
+MAX_PEAKS = 100
+
+DEFAULT_PEAK = {
+    'peak_hour': 12,
+    'peak_date': 'N/A',
+    'peak_value': 0
+}
+
+# Unix time starts on a Thursday; weekly buckets start on Mondays
+MONDAY_OFFSET = 4 * 86400
+
+# Volume series intervals: (bucket size in seconds, offset of the starts, label format)
+VOLUME_INTERVALS = {
+    '1m': (60, 0, '%b %d %H:%M'),
+    '5m': (300, 0, '%b %d %H:%M'),
+    '15m': (900, 0, '%b %d %H:%M'),
+    '1h': (3600, 0, '%b %d %H:00'),
+    '1d': (86400, 0, '%b %d'),
+    '1w': (7 * 86400, MONDAY_OFFSET, 'Week of %b %d')
+}
+
+# Most points a volume series may return; longer ones need max_points
+MAX_VOLUME_POINTS = 20000
+
+# Columns of the bulk record export (/data/), in order
+RECORD_COLUMNS = ['id', 'timestamp', 'pedestrians', 'two_wheelers', 'four_wheelers', 'heavy_vehicles']
+
+# Heatmap rows, Monday first (hours of day are the columns)
+HEATMAP_WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Percentiles reported for every heatmap cell, by response key
+HEATMAP_PERCENTILES = {
+    'p50': 50,
+    'p95': 95
+}
+
 
 class TimeRangeService:
     """Service for handling time range calculations and validation"""
@@ -49,21 +114,21 @@ class TimeRangeService:
         Returns:
             tuple: (start_time, end_time, error_message)
         """
-        # Get the latest record for reference
-        latest_record = TrafficRecord.objects.order_by('-timestamp').first()
-        if not latest_record:
+        # Get the latest timestamp for reference
+        latest_timestamp = DataStatsService.get().latest_timestamp
+        if latest_timestamp is None:
             return None, None, "No data available"
         
         if start_date and end_date:
             try:
-                start_time = datetime.strptime(start_date, '%Y-%m-%d')
-                end_time = datetime.strptime(end_date, '%Y-%m-%d')
+                start_time = timezone.make_aware(datetime.strptime(start_date, '%Y-%m-%d'))
+                end_time = timezone.make_aware(datetime.strptime(end_date, '%Y-%m-%d'))
             except ValueError:
                 return None, None, "Invalid date format. Use YYYY-MM-DD."
         else:
             try:
                 period = int(period or 7)
-                end_time = latest_record.timestamp
+                end_time = latest_timestamp
                 # Subtract (period - 1) days to include exactly 'period' days including today
                 start_time = end_time - timedelta(days=period - 1)
             except ValueError:
@@ -71,6 +136,32 @@ class TimeRangeService:
         
         return start_time, end_time, None
     
+    @staticmethod
+    def parse_timestamp(value, end_of_day=False):
+        """
+        Parse an ISO 8601 datetime or a YYYY-MM-DD date into an aware datetime.
+        
+        Args:
+            value (str): Datetime or date string
+            end_of_day (bool): Map a bare date to its last microsecond instead of midnight
+            
+        Returns:
+            datetime: Parsed timestamp
+            
+        Raises:
+            ValueError: If the value is not a valid date or datetime
+        """
+        day = parse_date(value)
+        if day is not None:
+            parsed = datetime.combine(day, time.max if end_of_day else time.min)
+        else:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError(f"Invalid timestamp: {value}")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+    
     @staticmethod
     def get_previous_period(start_time, end_time):
         """Calculate the previous period for comparison"""
@@ -116,25 +207,25 @@ class DataAggregationService:
         """
         Get total counts for all categories in the specified time range.
         
+        Whole days and hours are read from the rollup tables, so the cost
+        depends on the number of days rather than the number of minutes. With
+        the column store backend it is two lookups per category.
+        
         Returns:
             dict: Category totals
         """
-        totals = TotalCount.objects.filter(
-            traffic_record__timestamp__range=(start_time, end_time)
-        ).aggregate(
-            pedestrians=Sum('pedestrian'),
-            twoWheelers=Sum('two_wheeler'),
-            fourWheelers=Sum('car'),
-            buses=Sum('bus'),
-            trucks=Sum('truck')
-        )
-        
-        # Calculate heavy vehicles (buses + trucks)
-        totals['trucks'] = (totals['buses'] or 0) + (totals['trucks'] or 0)
+        store = get_column_store()
+        totals = store.sum_range(start_time, end_time) if store else None
+        if totals is None:
+            totals = RollupService.sum_range(start_time, end_time)
         
-        # Ensure all values are integers and remove buses field
-        result = {k: int(v or 0) for k, v in totals.items() if k != 'buses'}
-        return result
+        # Heavy vehicles are reported as trucks (buses + trucks)
+        return {
+            'pedestrians': int(totals['pedestrian']),
+            'twoWheelers': int(totals['two_wheeler']),
+            'fourWheelers': int(totals['car']),
+            'trucks': int(totals['bus'] + totals['truck'])
+        }
     
     @staticmethod
     def get_daily_volume_data(start_time, end_time):
@@ -142,74 +233,563 @@ class DataAggregationService:
         Get daily traffic volume data aggregated by date.
         
         Returns:
-            QuerySet: Daily aggregated data
-        """
-        return TotalCount.objects.filter(
-            traffic_record__timestamp__range=(start_time, end_time)
-        ).values('traffic_record__timestamp__date').annotate(
-            pedestrians=Sum('pedestrian'),
-            twoWheelers=Sum('two_wheeler'),
-            fourWheelers=Sum('car'),
-            trucks=Sum('bus') + Sum('truck')
-        ).order_by('traffic_record__timestamp__date')
+            list: Daily aggregated data ordered by date
+        """
+        store = get_column_store()
+        daily = store.daily_range(start_time, end_time) if store else None
+        if daily is None:
+            daily = RollupService.daily_range(start_time, end_time)
+        return [
+            {
+                'date': entry['date'],
+                'pedestrians': entry['pedestrian'],
+                'twoWheelers': entry['two_wheeler'],
+                'fourWheelers': entry['car'],
+                'trucks': entry['bus'] + entry['truck']
+            }
+            for entry in daily
+        ]
     
     @staticmethod
-    def get_peak_hour(category, start_time, end_time):
+    def get_volume_series(start_time, end_time, interval, max_points=None):
         """
-        Calculate peak hour, date, and actual peak value for a given category.
+        Category sums per fixed-size bucket, optionally downsampled.
+        
+        Buckets are grouped in SQL on the rollup tiers (see
+        RollupService.bucket_range), or from the column store's minute sums.
+        With max_points, a longer series is reduced with LTTB on the total of
+        all categories, so every kept bucket still carries all of them.
         
         Args:
-            category (str): Category name
             start_time (datetime): Start time
             end_time (datetime): End time
+            interval (str): Key of VOLUME_INTERVALS
+            max_points (int): Most buckets to return
             
         Returns:
-            dict: Contains peak_hour (int), peak_date (str), and peak_value (int)
+            tuple: (bucket starts as datetime64[s], dict of category arrays),
+            only buckets with data
         """
-        if category == 'trucks':
-            # For trucks, sum bus and truck counts
-            peak_record = TotalCount.objects.filter(
-                traffic_record__timestamp__range=(start_time, end_time)
-            ).annotate(
-                total_count=F('bus') + F('truck')
-            ).order_by('-total_count').first()
-            if peak_record:
-                peak_value = peak_record.bus + peak_record.truck
+        seconds, offset, _ = VOLUME_INTERVALS[interval]
+        store = get_column_store()
+        if store:
+            minutes = store.rows(start_time, end_time)
+            if minutes is None:
+                slots, sums = np.zeros(0, dtype=np.int64), np.zeros((0, len(COUNT_FIELDS)), dtype=np.int64)
             else:
-                peak_value = 0
+                slots, sums = group_buckets(
+                    epoch_slots(minutes['timestamp'], seconds, offset),
+                    np.column_stack([minutes[field] for field in COUNT_FIELDS])
+                )
         else:
-            field_map = {
-                'pedestrians': 'pedestrian',
-                'twoWheelers': 'two_wheeler',
-                'fourWheelers': 'car'
+            slots, sums = RollupService.bucket_range(start_time, end_time, seconds, offset)
+        
+        columns = dict(zip(COUNT_FIELDS, sums.T))
+        series = {
+            category: sum(columns[field] for field in fields)
+            for category, fields in PEAK_COLUMNS.items()
+        }
+        if max_points and len(slots) > max_points:
+            kept = lttb_indices(slots, sum(series.values()), max_points)
+            slots = slots[kept]
+            series = {category: values[kept] for category, values in series.items()}
+        return slots.astype('datetime64[s]'), series
+    
+    @staticmethod
+    def iter_records(start_time=None, end_time=None, after=None, limit=None,
+                     descending=True, chunk_size=2000):
+        """
+        Iterate over minute records with their counts in a single query.
+        
+        Rows are fetched from a server-side iterator in chunks, so memory use
+        stays constant however much history is requested. Archived months are
+        read one month file at a time, before or after the database rows
+        depending on the order.
+        
+        Args:
+            start_time (datetime): Earliest timestamp to include
+            end_time (datetime): Latest timestamp to include
+            after (tuple): Keyset cursor from parse_record_cursor, only rows
+                past it in the (timestamp, id) iteration order
+            limit (int): Maximum number of rows
+            descending (bool): Newest first when True
+            chunk_size (int): Rows fetched from the database per round trip
+            
+        Yields:
+            dict: Record id, timestamp and category counts
+        """
+        boundary = ArchiveService.boundary()
+        queryset = DataAggregationService._record_queryset(
+            start_time, end_time, after, descending, boundary
+        ).values_list('id', 'timestamp', 'pedestrian', 'two_wheeler', 'car', 'heavy')
+        if limit:
+            queryset = queryset[:limit]
+        
+        tiers = [
+            queryset.iterator(chunk_size=chunk_size),
+            DataAggregationService._iter_archived(
+                start_time, end_time, after, descending, boundary
+            )
+        ]
+        rows = chain(*(tiers if descending else reversed(tiers)))
+        if limit:
+            rows = islice(rows, limit)
+        
+        for record_id, timestamp, pedestrians, two_wheelers, four_wheelers, heavy in rows:
+            yield {
+                'id': record_id,
+                'timestamp': timestamp,
+                'pedestrians': pedestrians,
+                'two_wheelers': two_wheelers,
+                'four_wheelers': four_wheelers,
+                'heavy_vehicles': heavy
             }
-            field = field_map.get(category)
-            if not field:
-                return {
-                    'peak_hour': 12,
-                    'peak_date': 'N/A',
-                    'peak_value': 0
+    
+    @staticmethod
+    def record_cursor(row):
+        """Keyset cursor of an iter_records row: '<ISO timestamp>,<id>'"""
+        timestamp = row['timestamp'].isoformat().replace('+00:00', 'Z')
+        return f"{timestamp},{row['id']}"
+    
+    @staticmethod
+    def parse_record_cursor(value):
+        """
+        Parse a keyset cursor made by record_cursor.
+        
+        A bare timestamp is accepted too and skips every row at that timestamp.
+        
+        Returns:
+            tuple: (aware timestamp, record id or None)
+            
+        Raises:
+            ValueError: If the timestamp or id is invalid
+        """
+        timestamp, separator, record_id = value.rpartition(',')
+        if not separator:
+            return TimeRangeService.parse_timestamp(value), None
+        if not record_id.isdigit():
+            raise ValueError(f"Invalid cursor: {value}")
+        return TimeRangeService.parse_timestamp(timestamp), int(record_id)
+    
+    @staticmethod
+    def iter_record_columns(start_time=None, end_time=None, after=None, limit=None,
+                            descending=True, chunk_size=10000):
+        """
+        Iterate over the rows of iter_records as column arrays.
+        
+        Made for the columnar export formats: timestamps are read as text and
+        parsed by NumPy, and archived months are sliced without ever building
+        datetime objects or per-row dicts.
+        
+        Args:
+            start_time, end_time, after, limit, descending: As for iter_records
+            chunk_size (int): Most rows per yielded batch
+            
+        Yields:
+            dict: RECORD_COLUMNS to arrays of equal length, 'timestamp' as
+            datetime64[us]; batches never span both tiers
+        """
+        boundary = ArchiveService.boundary()
+        queryset = DataAggregationService._record_queryset(
+            start_time, end_time, after, descending, boundary
+        ).values_list(
+            'id', Cast('timestamp', CharField()), 'pedestrian', 'two_wheeler', 'car', 'heavy'
+        )
+        if limit:
+            queryset = queryset[:limit]
+        
+        def database_batches():
+            rows = queryset.iterator(chunk_size=chunk_size)
+            while True:
+                batch = list(islice(rows, chunk_size))
+                if not batch:
+                    return
+                ids, timestamps, *counts = zip(*batch)
+                yield [
+                    np.array(ids), np.array(timestamps, dtype='datetime64[us]'), *map(np.array, counts)
+                ]
+        
+        def archived_batches():
+            step = -1 if descending else 1
+            for rows in DataAggregationService._archived_months(
+                start_time, end_time, after, descending, boundary
+            ):
+                columns = [
+                    rows['id'],
+                    rows['timestamp'].astype('datetime64[us]'),
+                    rows['pedestrian'],
+                    rows['two_wheeler'],
+                    rows['car'],
+                    rows['bus'] + rows['truck']
+                ]
+                for offset in range(0, len(columns[0]), chunk_size):
+                    yield [column[::step][offset:offset + chunk_size] for column in columns]
+        
+        tiers = [database_batches(), archived_batches()]
+        remaining = limit
+        for columns in chain(*(tiers if descending else reversed(tiers))):
+            if remaining is not None:
+                columns = [column[:remaining] for column in columns]
+                remaining -= len(columns[0])
+            yield dict(zip(RECORD_COLUMNS, columns))
+            if remaining == 0:
+                return
+    
+    @staticmethod
+    def _record_queryset(start_time, end_time, after, descending, boundary):
+        """Database rows of iter_records, ordered and with the heavy vehicle sum"""
+        queryset = TotalCount.objects.all()
+        if start_time:
+            queryset = queryset.filter(timestamp__gte=start_time)
+        if end_time:
+            queryset = queryset.filter(timestamp__lte=end_time)
+        if after:
+            timestamp, record_id = after
+            lookup = 'lt' if descending else 'gt'
+            past = Q(**{f'timestamp__{lookup}': timestamp})
+            if record_id is not None:
+                # Bounded on the timestamp first: a bare OR would make SQLite sort the whole range
+                queryset = queryset.filter(**{f'timestamp__{lookup}e': timestamp})
+                past |= Q(**{f'id__{lookup}': record_id})
+            queryset = queryset.filter(past)
+        if boundary:
+            queryset = queryset.filter(timestamp__gte=boundary)
+        order = ('-timestamp', '-id') if descending else ('timestamp', 'id')
+        return queryset.annotate(heavy=F('bus') + F('truck')).order_by(*order)
+    
+    @staticmethod
+    def _iter_archived(start_time, end_time, after, descending, boundary):
+        """Rows of iter_records that live in the archive, as value tuples"""
+        step = -1 if descending else 1
+        for rows in DataAggregationService._archived_months(
+            start_time, end_time, after, descending, boundary
+        ):
+            columns = [
+                rows['id'].tolist(),
+                to_datetimes(rows['timestamp']),
+                rows['pedestrian'].tolist(),
+                rows['two_wheeler'].tolist(),
+                rows['car'].tolist(),
+                (rows['bus'] + rows['truck']).tolist()
+            ]
+            yield from zip(*(column[::step] for column in columns))
+    
+    @staticmethod
+    def _archived_months(start_time, end_time, after, descending, boundary):
+        """Archived month columns holding rows of iter_records, in iteration order of the months"""
+        if boundary is None:
+            return
+        lower = start_time
+        upper = end_time + timedelta(microseconds=1) if end_time else None
+        if after and descending:
+            cursor = after[0] + timedelta(microseconds=1)
+            upper = min(upper, cursor) if upper else cursor
+        elif after:
+            lower = max(lower, after[0]) if lower else after[0]
+        upper = min(upper, boundary) if upper else boundary
+        for rows in ArchiveService.iter_months(lower, upper, descending=descending):
+            if after:
+                rows = rows_past(rows, *after, descending=descending)
+            if len(rows['timestamp']):
+                yield rows
+    
+    @staticmethod
+    def get_peaks(start_time, end_time, top_n=1, bucket='minute'):
+        """
+        Compute category totals and the top-N peaks of every category.
+        
+        Totals come from get_category_totals. Peaks are ranked from the
+        hourly rollup for whole hours and from minute rows for the rest:
+        hourly peaks only read the partial hours at the range edges, and
+        minute peaks only the minute rows of each category's top-N hours by
+        hourly maximum (plus the edges), which always hold its top-N
+        readings. Ties go to the earliest moment. Archived months are read
+        from their files the same way. The column store only holds
+        per-minute sums, so it is used for the totals but never for ranking.
+        
+        Args:
+            start_time (datetime): Start time
+            end_time (datetime): End time
+            top_n (int): Number of peaks to return per category
+            bucket (str): 'minute' for single readings, 'hour' for hourly sums
+            
+        Returns:
+            tuple: (totals dict, peaks dict mapping category to a list of
+            peak_hour/peak_date/peak_value/timestamp dicts, highest first)
+        """
+        if bucket not in PEAK_BUCKETS:
+            raise ValueError(f"Invalid peak bucket: {bucket}")
+        
+        totals = DataAggregationService.get_category_totals(start_time, end_time)
+        return totals, DataAggregationService._rank_peaks(start_time, end_time, top_n, bucket)
+    
+    @staticmethod
+    def _rank_peaks(start_time, end_time, top_n, bucket):
+        """Top-N peaks per category from the hourly rollup and the minute rows it points to"""
+        candidates = {category: [] for category in PEAK_COLUMNS}
+        end_exclusive = end_time + timedelta(microseconds=1)
+        first_hour = ceil_time(start_time, 'hour')
+        last_hour = floor_time(end_exclusive, 'hour')
+        if first_hour >= last_hour:
+            segments = [(start_time, end_exclusive)] if start_time < end_exclusive else []
+        else:
+            segments = [
+                (a, b) for a, b in ((start_time, first_hour), (last_hour, end_exclusive)) if a < b
+            ]
+            peak_fields = [CATEGORY_PEAK_FIELDS[category] for category in PEAK_COLUMNS]
+            hours = list(HourlyCount.objects.filter(
+                bucket__gte=first_hour, bucket__lt=last_hour
+            ).order_by('bucket').values_list('bucket', *COUNT_FIELDS, *peak_fields))
+            moments = [row[0] for row in hours]
+            sums = [dict(zip(COUNT_FIELDS, row[1:])) for row in hours]
+            for index, (category, fields) in enumerate(PEAK_COLUMNS.items()):
+                if bucket == 'hour':
+                    values = [sum(row[field] for field in fields) for row in sums]
+                else:
+                    values = [row[1 + len(COUNT_FIELDS) + index] for row in hours]
+                # Highest value first, earliest hour on ties (hours are ascending)
+                top = heapq.nsmallest(top_n, range(len(hours)), key=lambda i: (-values[i], i))
+                if bucket == 'hour':
+                    candidates[category] += [(values[i], moments[i]) for i in top]
+                else:
+                    segments += [(moments[i], moments[i] + timedelta(hours=1)) for i in top]
+        
+        columns = segment_rows(sorted(set(segments)))
+        if columns is not None:
+            DataAggregationService._rank_rows(columns, top_n, bucket, candidates)
+        return DataAggregationService._top_peaks(candidates, top_n)
+    
+    @staticmethod
+    def _rank_rows(columns, top_n, bucket, candidates):
+        """Add top-N (value, moment) pairs per category of rows held as arrays"""
+        moments = columns['timestamp']
+        values = {
+            category: sum(columns[field] for field in fields)
+            for category, fields in PEAK_COLUMNS.items()
+        }
+        if bucket == 'hour':
+            hours = moments.astype('datetime64[h]')
+            starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+            moments = hours[starts]
+            values = {category: np.add.reduceat(value, starts) for category, value in values.items()}
+        
+        for category, value in values.items():
+            # Highest value first, earliest moment on ties
+            top = np.lexsort((moments, -value))[:top_n]
+            candidates[category] += zip(value[top].tolist(), to_datetimes(moments[top]))
+    
+    @staticmethod
+    def _top_peaks(candidates, top_n):
+        """Peak dicts from (value, moment) candidates, highest first"""
+        return {
+            category: [
+                {
+                    'peak_hour': moment.hour,
+                    'peak_date': moment.strftime('%Y-%m-%d'),
+                    'peak_value': value,
+                    'timestamp': moment
                 }
-            peak_record = TotalCount.objects.filter(
-                traffic_record__timestamp__range=(start_time, end_time)
-            ).order_by(f'-{field}').first()
-            if peak_record:
-                peak_value = getattr(peak_record, field, 0)
-            else:
-                peak_value = 0
-        if peak_record:
-            timestamp = peak_record.traffic_record.timestamp
-            return {
-                'peak_hour': timestamp.hour,
-                'peak_date': timestamp.strftime('%Y-%m-%d'),
-                'peak_value': peak_value
+                for value, moment in sorted(found, key=lambda peak: (-peak[0], peak[1]))[:top_n]
+            ]
+            for category, found in candidates.items()
+        }
+    
+    @staticmethod
+    def get_dashboard_data(start_time, end_time, top_n=1, bucket='minute'):
+        """
+        Gather everything the dashboard shows for one range in a single pass.
+        
+        The daily series is read once from the rollups (or the column store)
+        and the current totals are its sums, so the range is not summed a
+        second time. Peaks are ranked as in get_peaks, minus its totals, and
+        the previous period only needs its totals.
+        
+        Returns:
+            dict: current_totals, previous_totals, daily_volume and peaks
+        """
+        if bucket not in PEAK_BUCKETS:
+            raise ValueError(f"Invalid peak bucket: {bucket}")
+        
+        daily_volume = DataAggregationService.get_daily_volume_data(start_time, end_time)
+        current_totals = {
+            category: int(sum(entry[category] for entry in daily_volume))
+            for category in PEAK_COLUMNS
+        }
+        peaks = DataAggregationService._rank_peaks(start_time, end_time, top_n, bucket)
+        prev_start_time, prev_end_time = TimeRangeService.get_previous_period(
+            start_time, end_time
+        )
+        return {
+            'current_totals': current_totals,
+            'previous_totals': DataAggregationService.get_category_totals(
+                prev_start_time, prev_end_time
+            ),
+            'daily_volume': daily_volume,
+            'peaks': peaks
+        }
+    
+    @staticmethod
+    def get_peak_hour(category, start_time, end_time):
+        """
+        Calculate peak hour, date, and actual peak value for a given category.
+        
+        Prefer get_peaks when more than one category is needed.
+        
+        Args:
+            category (str): Category name
+            start_time (datetime): Start time
+            end_time (datetime): End time
+            
+        Returns:
+            dict: Contains peak_hour (int), peak_date (str), and peak_value (int)
+        """
+        _, peaks = DataAggregationService.get_peaks(start_time, end_time)
+        if peaks.get(category):
+            peak = peaks[category][0]
+            return {key: peak[key] for key in ('peak_hour', 'peak_date', 'peak_value')}
+        return dict(DEFAULT_PEAK)
+    
+    @staticmethod
+    def get_heatmap(start_time, end_time, bucket='hour'):
+        """
+        Hour-of-day x weekday statistics of every category.
+        
+        Each cell of the 7x24 grid (UTC, Monday first) summarizes the values
+        that fall into it: hourly sums from the hourly rollup for the 'hour'
+        bucket (whole hours of the range only), or single readings for
+        'minute'. Values are fetched in one query per tier and reduced with
+        vectorized NumPy, so there is no per-cell query or loop.
+        
+        Args:
+            start_time (datetime): Start time
+            end_time (datetime): End time
+            bucket (str): 'hour' for hourly volumes, 'minute' for single readings
+            
+        Returns:
+            dict: bucket, weekdays, hours, samples (values per cell) and, per
+            category, 'mean' plus one grid per HEATMAP_PERCENTILES key; cells
+            without data are None
+        """
+        if bucket not in PEAK_BUCKETS:
+            raise ValueError(f"Invalid heatmap bucket: {bucket}")
+        
+        cells, columns = DataAggregationService._heatmap_values(start_time, end_time, bucket)
+        size = len(HEATMAP_WEEKDAYS) * 24
+        samples = np.bincount(cells, minlength=size)
+        
+        def grid(values):
+            return [values[day * 24:(day + 1) * 24] for day in range(len(HEATMAP_WEEKDAYS))]
+        
+        result = {
+            'bucket': bucket,
+            'weekdays': HEATMAP_WEEKDAYS,
+            'hours': list(range(24)),
+            'samples': grid(samples.tolist())
+        }
+        for category, fields in PEAK_COLUMNS.items():
+            statistics = DataAggregationService._cell_statistics(
+                cells, sum(columns[field] for field in fields), samples
+            )
+            result[category] = {
+                key: grid([
+                    round(float(value), 2) if count else None
+                    for value, count in zip(values, samples)
+                ])
+                for key, values in statistics.items()
             }
+        return result
+    
+    @staticmethod
+    def _heatmap_values(start_time, end_time, bucket):
+        """
+        Cell index (weekday * 24 + hour, Monday = 0) and raw counts of every heatmap value.
+        
+        Returns:
+            tuple: (int array of cells, dict of int arrays per raw field)
+        """
+        parts = []
+        
+        def add_columns(columns):
+            moments = columns['timestamp']
+            # 1970-01-01 was a Thursday; shift so Monday is 0
+            weekdays = (moments.astype('datetime64[D]').astype(np.int64) + 3) % 7
+            hours = moments.astype('datetime64[h]').astype(np.int64) % 24
+            parts.append((
+                weekdays * 24 + hours,
+                np.column_stack([columns[field] for field in COUNT_FIELDS]).astype(np.int64)
+            ))
+        
+        def add_queryset(queryset, field):
+            # Timestamps come back as their stored text (naive UTC), which NumPy
+            # parses much faster than the per-row datetime converter
+            rows = list(queryset.values_list(
+                Cast(field, CharField()), *COUNT_FIELDS
+            ).order_by())
+            if rows:
+                moments, *counts = zip(*rows)
+                add_columns({
+                    'timestamp': np.array(moments, dtype='datetime64[us]'),
+                    **{name: np.array(values) for name, values in zip(COUNT_FIELDS, counts)}
+                })
+        
+        if bucket == 'hour':
+            # Whole hours only; partial hours at the edges would skew the cells
+            add_queryset(HourlyCount.objects.filter(
+                bucket__gte=ceil_time(start_time, 'hour'),
+                bucket__lt=floor_time(end_time + timedelta(microseconds=1), 'hour')
+            ), 'bucket')
         else:
-            return {
-                'peak_hour': 12,
-                'peak_date': 'N/A',
-                'peak_value': 0
+            # Single readings, never the column store's per-minute sums
+            boundary = ArchiveService.boundary()
+            if boundary and start_time < boundary:
+                archived = ArchiveService.columns(
+                    start_time, min(end_time + timedelta(microseconds=1), boundary)
+                )
+                if archived is not None:
+                    add_columns(archived)
+                start_time = boundary
+            if start_time <= end_time:
+                add_queryset(TotalCount.objects.filter(
+                    timestamp__range=(start_time, end_time)
+                ), 'timestamp')
+        
+        if not parts:
+            return np.zeros(0, dtype=np.int64), {
+                field: np.zeros(0, dtype=np.int64) for field in COUNT_FIELDS
             }
+        cells = np.concatenate([cells for cells, _ in parts])
+        values = np.concatenate([values for _, values in parts])
+        return cells, {field: values[:, index] for index, field in enumerate(COUNT_FIELDS)}
+    
+    @staticmethod
+    def _cell_statistics(cells, values, samples):
+        """
+        Mean and HEATMAP_PERCENTILES of values grouped by cell, without a Python loop per cell.
+        
+        Percentiles interpolate linearly between the two closest ranks, like
+        numpy.percentile. Empty cells come out as 0.
+        
+        Returns:
+            dict: 'mean' and one float array per percentile key, indexed by cell
+        """
+        filled = samples > 0
+        statistics = {'mean': np.zeros(len(samples))}
+        statistics['mean'][filled] = (
+            np.bincount(cells, weights=values, minlength=len(samples))[filled] / samples[filled]
+        )
+        
+        # Values sorted within each cell; a cell's values start at its offset
+        ordered = values[np.lexsort((values, cells))]
+        offsets = np.cumsum(samples) - samples
+        for key, percentile in HEATMAP_PERCENTILES.items():
+            position = (samples[filled] - 1) * percentile / 100
+            low = np.floor(position).astype(np.int64)
+            high = np.ceil(position).astype(np.int64)
+            lower = ordered[offsets[filled] + low]
+            upper = ordered[offsets[filled] + high]
+            statistics[key] = np.zeros(len(samples))
+            statistics[key][filled] = lower + (upper - lower) * (position - low)
+        return statistics
 
 
 class DataTransformationService:
@@ -294,7 +874,7 @@ class DataTransformationService:
         Format traffic volume data for charts.
         
         Args:
-            volume_data (QuerySet): Raw volume data
+            volume_data (list): Daily volume data
             start_time (datetime): Start time
             end_time (datetime): End time
             
@@ -310,13 +890,38 @@ class DataTransformationService:
             # Use daily data for shorter periods
             return DataTransformationService._format_daily_data(volume_data)
     
+    @staticmethod
+    def format_volume_series(slots, series, interval):
+        """
+        Format a bucketed volume series for charts.
+        
+        Args:
+            slots (np.ndarray): Bucket starts (datetime64)
+            series (dict): Category arrays as returned by get_volume_series
+            interval (str): Key of VOLUME_INTERVALS, for the labels
+            
+        Returns:
+            list: One dict per bucket with its start, a 'day' label and the
+            category sums
+        """
+        label = VOLUME_INTERVALS[interval][2]
+        columns = {category: values.tolist() for category, values in series.items()}
+        return [
+            {
+                'timestamp': moment,
+                'day': moment.strftime(label),
+                **{category: values[index] for category, values in columns.items()}
+            }
+            for index, moment in enumerate(to_datetimes(slots))
+        ]
+    
     @staticmethod
     def _group_by_weeks(volume_data, start_time):
         """Group daily data by weeks"""
         week_groups = {}
         
         for entry in volume_data:
-            date = entry['traffic_record__timestamp__date']
+            date = entry['date']
             week_num = (date - start_time.date()).days // 7 + 1
             week_key = f"Week {week_num}"
             
@@ -355,7 +960,7 @@ class DataTransformationService:
         """Format daily data"""
         result = []
         for entry in volume_data:
-            date = entry['traffic_record__timestamp__date']
+            date = entry['date']
             result.append({
                 'day': date.strftime('%a'),  # Get day name (Mon, Tue, etc.)
                 'pedestrians': entry['pedestrians'] or 0,
@@ -372,10 +977,12 @@ class DataTransformationService:
         
         Args:
             totals (dict): Category totals
-            peak_data (dict): Peak data for each category (contains peak_hour, peak_date, and peak_value)
+            peak_data (dict): Peaks for each category as returned by
+                DataAggregationService.get_peaks (lists, highest first)
             
         Returns:
-            list: Formatted peak time data with actual peak values
+            list: Formatted peak time data with actual peak values; a 'peaks'
+            list is added when more than one peak was requested
         """
         categories = [
             ('pedestrians', 'Pedestrians'),
@@ -387,18 +994,21 @@ class DataTransformationService:
         result = []
         for category_key, category_name in categories:
             total_value = totals.get(category_key, 0)
-            peak_info = peak_data.get(category_key, {
-                'peak_hour': 12, 
-                'peak_date': 'N/A',
-                'peak_value': 0
-            })
+            peaks = peak_data.get(category_key) or []
+            peak_info = peaks[0] if peaks else DEFAULT_PEAK
             
-            result.append({
+            item = {
                 'name': category_name,
                 'value': peak_info.get('peak_value', 0),  # Use actual peak value instead of percentage
                 'originalValue': total_value,  # Keep total for reference
                 'peak_hour': peak_info.get('peak_hour', 12),
                 'peak_date': peak_info.get('peak_date', 'N/A')
-            })
+            }
+            if len(peaks) > 1:
+                item['peaks'] = [
+                    {key: peak[key] for key in ('peak_hour', 'peak_date', 'peak_value', 'timestamp')}
+                    for peak in peaks
+                ]
+            result.append(item)
         
-        return result 
\ No newline at end of file
+        return result
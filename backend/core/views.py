@@ -1,21 +1,47 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from .models import TrafficRecord
+from .data_stats import DataStatsService
+from .directions import DirectionService, DIRECTION_CATEGORIES, DEFAULT_DIRECTION_CATEGORY
+from .prompt_cache import PromptCacheService
+from .intent_parser import parser_stats
 from .utils import (
     TimeRangeService, 
     DataAggregationService, 
-    DataTransformationService
+    DataTransformationService,
+    MAX_PEAKS,
+    MAX_VOLUME_POINTS,
+    PEAK_BUCKETS,
+    RECORD_COLUMNS,
+    VOLUME_INTERVALS
 )
 from .llm_service import (
-    process_user_prompt
+    process_user_prompt,
+    stream_user_prompt,
+    gateway as llm_gateway
 )
+from .llm_gateway import GatewayBusy, GatewayTimeout
+from .streaming import (
+    COLUMN_ENCODERS,
+    EXPORT_FORMATS,
+    ClosingIterator,
+    negotiate_format,
+    stream_json,
+    stream_ndjson
+)
+from .ingestion import IngestionService, IngestionError
+from .response_cache import cached_dashboard_response, cache_stats, conditional_response
+from .metrics import render_metrics
 
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+# Export formats each bulk endpoint negotiates, default first
+RECORDS_FORMATS = ['json', 'ndjson', 'csv', 'msgpack', 'arrow']
+VOLUME_FORMATS = ['json', 'csv', 'msgpack', 'arrow']
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def get_output_from_llm(request):
@@ -64,6 +90,14 @@ def get_output_from_llm(request):
         logger.info("LLM response: %s...", str(safe_response)[:200])
         return JsonResponse({"response": safe_response})
 
+    except GatewayBusy as busy:
+        response = create_error_response(str(busy), "GatewayBusy", 429)
+        response["Retry-After"] = str(busy.retry_after)
+        return response
+
+    except GatewayTimeout as timeout:
+        return create_error_response(str(timeout), "GatewayTimeout", 504)
+
     except ValueError as ve:
         return create_error_response(f"Invalid request: {str(ve)}", "ValidationError", 400)
 
@@ -73,34 +107,161 @@ def get_output_from_llm(request):
 
 
 
-@require_http_methods(["GET"])
-def get_all_data(request):
-    """Get all data from the database"""
+def format_sse(event, payload):
+    data = json.dumps(payload, default=str, ensure_ascii=False)
+    return f"event: {event}\ndata: {data}\n\n"
+
+def stream_llm_events(prompt_stream):
+    """Relay prompt stream events as Server-Sent Events, reporting failures as an 'error' event"""
     try:
-        # Get all records ordered by timestamp
-        records = TrafficRecord.objects.all().order_by('-timestamp')
-        
-        # Convert to list of dictionaries
-        data_list = []
-        for record in records:
-            total_count = record.total_counts.first()
-            if total_count:
-                data_list.append({
-                    'timestamp': record.timestamp,
-                    'pedestrians': total_count.pedestrian,
-                    'two_wheelers': total_count.two_wheeler,
-                    'four_wheelers': total_count.car,
-                    'heavy_vehicles': total_count.bus + total_count.truck
-                })
-        
-        return JsonResponse({
-            'data': data_list,
-            'total_records': len(data_list)
+        for event, payload in prompt_stream:
+            yield format_sse(event, payload)
+    except Exception as e:
+        logger.error("Error in streamed LLM request: %s", e, exc_info=True)
+        yield format_sse("error", {
+            "error": str(e) or 'An unknown error occurred',
+            "error_type": e.__class__.__name__
         })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def stream_output_from_llm(request):
+    """
+    Stream the assistant's answer as Server-Sent Events.
+
+    Sends 'token' events with response text as the model produces it, then a
+    'done' event with the same payload get-output-from-llm returns under
+    "response" (the validated state included), or an 'error' event.
+    """
+    user_prompt = request.POST.get("user_prompt")
+    logger.info("Streamed prompt: %s", str(user_prompt or '')[:200])
+    try:
+        prompt_stream = stream_user_prompt(user_prompt)
+    except GatewayBusy as busy:
+        response = JsonResponse({"error": str(busy), "error_type": "GatewayBusy"}, status=429)
+        response["Retry-After"] = str(busy.retry_after)
+        return response
+    except ValueError as ve:
+        return JsonResponse({"error": f"Invalid request: {ve}", "error_type": "ValidationError"}, status=400)
+
+    # Closing the response releases the stream's gateway slot, even unstarted
+    events = ClosingIterator(stream_llm_events(prompt_stream), prompt_stream.close)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def parse_peak_params(request):
+    """Read and validate the optional top/bucket peak parameters."""
+    try:
+        top_n = int(request.GET.get('top', '1'))
+        if not 1 <= top_n <= MAX_PEAKS:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"top must be an integer between 1 and {MAX_PEAKS}")
+    bucket = request.GET.get('bucket', 'minute')
+    if bucket not in PEAK_BUCKETS:
+        raise ValueError(f"bucket must be one of {PEAK_BUCKETS}")
+    return top_n, bucket
+
+def parse_direction_category(request):
+    """Read and validate the optional category parameter of the direction views."""
+    category = request.GET.get('category', DEFAULT_DIRECTION_CATEGORY)
+    if category not in DIRECTION_CATEGORIES:
+        raise ValueError(f"category must be one of {list(DIRECTION_CATEGORIES)}")
+    return category
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def ingest_readings(request):
+    """
+    Ingest a batch of detector readings sent as JSON or NDJSON.
+
+    Valid readings are written in one transaction; invalid and duplicate
+    ones are reported back without failing the rest of the batch.
+    """
+    try:
+        readings = IngestionService.parse_payload(request, request.content_type)
+    except IngestionError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        result = IngestionService.ingest(readings)
     except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
+        logger.error("Error ingesting readings: %s", e, exc_info=True)
+        return JsonResponse({"error": "Internal server error"}, status=500)
+
+    logger.info("Ingested %d readings, rejected %d", result['accepted'], result['rejected'])
+    return JsonResponse(result)
+
+@require_http_methods(["GET"])
+@conditional_response(
+    'data', extra_params=('start', 'end', 'after', 'limit', 'order'), formats=RECORDS_FORMATS
+)
+def get_all_data(request):
+    """
+    Stream minute records from the database.
+
+    Query parameters:
+        start, end: ISO datetimes or YYYY-MM-DD dates (dates cover the whole day)
+        after: keyset cursor, the previous page's next_after ('<timestamp>,<id>'
+            of its last row); a bare timestamp skips every row at that time
+        limit: page size (default: no limit)
+        order: 'desc' (default, newest first) or 'asc'
+        format: 'json' (default), 'ndjson', or the columnar 'csv', 'msgpack'
+            and 'arrow' (timestamps as epoch milliseconds); also negotiated
+            from the Accept header
+    """
+    try:
+        start = request.GET.get('start')
+        end = request.GET.get('end')
+        after = request.GET.get('after')
+        start_time = TimeRangeService.parse_timestamp(start) if start else None
+        end_time = TimeRangeService.parse_timestamp(end, end_of_day=True) if end else None
+        cursor = DataAggregationService.parse_record_cursor(after) if after else None
+
+        limit = request.GET.get('limit')
+        if limit is not None and (not limit.isdigit() or int(limit) == 0):
+            raise ValueError("limit must be a positive integer")
+        limit = int(limit) if limit else None
+
+        order = request.GET.get('order', 'desc')
+        if order not in ('asc', 'desc'):
+            raise ValueError("order must be 'asc' or 'desc'")
+        output_format = negotiate_format(request, RECORDS_FORMATS)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if output_format in COLUMN_ENCODERS:
+        batches = DataAggregationService.iter_record_columns(
+            start_time=start_time,
+            end_time=end_time,
+            after=cursor,
+            limit=limit,
+            descending=order == 'desc'
+        )
+        return StreamingHttpResponse(
+            COLUMN_ENCODERS[output_format](RECORD_COLUMNS, batches),
+            content_type=EXPORT_FORMATS[output_format]
+        )
+
+    rows = DataAggregationService.iter_records(
+        start_time=start_time,
+        end_time=end_time,
+        after=cursor,
+        limit=limit,
+        descending=order == 'desc'
+    )
+
+    if output_format == 'ndjson':
+        return StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+    return StreamingHttpResponse(
+        stream_json(rows, limit=limit, cursor=DataAggregationService.record_cursor),
+        content_type='application/json'
+    )
 
 @require_http_methods(["GET"])
+@cached_dashboard_response('card-data')
 def get_card_data(request):
     """Get aggregated data for the dashboard cards."""
     try:
@@ -137,9 +298,51 @@ def get_card_data(request):
     except Exception as e:
         return JsonResponse({"error": "Internal server error"}, status=500)
 
+def parse_volume_params(request, start_time, end_time):
+    """
+    Read and validate the optional interval/max_points volume parameters.
+
+    Returns:
+        tuple: (interval or None for the default daily/weekly data, max_points or None)
+    """
+    interval = request.GET.get('interval')
+    max_points = request.GET.get('max_points')
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+            if not 3 <= max_points <= MAX_VOLUME_POINTS:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"max_points must be an integer between 3 and {MAX_VOLUME_POINTS}")
+        interval = interval or '1m'
+    if interval is None:
+        return None, None
+    if interval not in VOLUME_INTERVALS:
+        raise ValueError(f"interval must be one of {list(VOLUME_INTERVALS)}")
+    if max_points is None:
+        buckets = (end_time - start_time).total_seconds() / VOLUME_INTERVALS[interval][0] + 1
+        if buckets > MAX_VOLUME_POINTS:
+            raise ValueError(
+                f"Range has up to {int(buckets)} {interval} buckets; "
+                f"use a coarser interval or max_points (at most {MAX_VOLUME_POINTS})"
+            )
+    return interval, max_points
+
 @require_http_methods(["GET"])
+@cached_dashboard_response(
+    'traffic-volume-data', extra_params=('interval', 'max_points'), formats=VOLUME_FORMATS
+)
 def get_traffic_volume_data(request):
-    """Get traffic volume data for the chart."""
+    """
+    Get traffic volume data for the chart.
+
+    Without parameters the data is daily for ranges up to 7 days and weekly
+    averages above that. Optional query parameters: interval (1m, 5m, 15m,
+    1h, 1d or 1w sums), max_points (LTTB-downsample to at most that many
+    buckets; implies interval=1m when no interval is given) and format ('csv',
+    'msgpack' or 'arrow' columns of a bucketed series instead of JSON; also
+    negotiated from the Accept header).
+    """
     try:
         # Parse time range parameters
         period = request.GET.get('period', '7')
@@ -153,6 +356,31 @@ def get_traffic_volume_data(request):
         if error:
             return JsonResponse({"error": error}, status=400)
         
+        try:
+            interval, max_points = parse_volume_params(request, start_time, end_time)
+            output_format = negotiate_format(request, VOLUME_FORMATS)
+            if output_format in COLUMN_ENCODERS and not interval:
+                raise ValueError(f"format '{output_format}' needs an interval or max_points")
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        
+        if interval:
+            slots, series = DataAggregationService.get_volume_series(
+                start_time, end_time, interval, max_points
+            )
+            if output_format in COLUMN_ENCODERS:
+                # At most MAX_VOLUME_POINTS rows: encoded whole so the response can be cached
+                return HttpResponse(
+                    COLUMN_ENCODERS[output_format](
+                        ['timestamp', *series], [{'timestamp': slots, **series}]
+                    ),
+                    content_type=EXPORT_FORMATS[output_format]
+                )
+            return JsonResponse({
+                'interval': interval,
+                'data': DataTransformationService.format_volume_series(slots, series, interval)
+            })
+        
         # Get daily volume data
         volume_data = DataAggregationService.get_daily_volume_data(start_time, end_time)
         
@@ -167,8 +395,14 @@ def get_traffic_volume_data(request):
         return JsonResponse({"error": "Internal server error"}, status=500)
 
 @require_http_methods(["GET"])
+@cached_dashboard_response('peak-time-data', extra_params=('top', 'bucket'))
 def get_peak_time_data(request):
-    """Get aggregated peak time data for the chart."""
+    """
+    Get aggregated peak time data for the chart.
+
+    Optional query parameters: top (peaks per category, default 1) and
+    bucket ('minute' readings or 'hour' sums, default 'minute').
+    """
     try:
         # Parse time range parameters
         period = request.GET.get('period', '7')
@@ -182,17 +416,15 @@ def get_peak_time_data(request):
         if error:
             return JsonResponse({"error": error}, status=400)
         
-        # Get category totals
-        totals = DataAggregationService.get_category_totals(start_time, end_time)
+        try:
+            top_n, bucket = parse_peak_params(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
         
-        # Calculate peak hours for each category
-        peak_data = {}
-        categories = ['pedestrians', 'twoWheelers', 'fourWheelers', 'trucks']
-        
-        for category in categories:
-            peak_data[category] = DataAggregationService.get_peak_hour(
-                category, start_time, end_time
-            )
+        # Totals and every category's peaks come from a single scan
+        totals, peak_data = DataAggregationService.get_peaks(
+            start_time, end_time, top_n=top_n, bucket=bucket
+        )
         
         # Format data for frontend
         transformed_data = DataTransformationService.format_peak_time_data(
@@ -205,32 +437,202 @@ def get_peak_time_data(request):
         return JsonResponse({"error": "Internal server error"}, status=500)
 
 @require_http_methods(["GET"])
+@cached_dashboard_response('dashboard', extra_params=('top', 'bucket'))
+def get_dashboard_data(request):
+    """
+    Get cards, traffic volume and peak time data in one response.
+
+    Takes the time range parameters of card-data and the top/bucket
+    parameters of peak-time-data; the volume is traffic-volume-data's
+    default daily/weekly series (interval and max_points do not apply). The
+    time range is parsed and scanned only once.
+    """
+    try:
+        period = request.GET.get('period', '7')
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+
+        start_time, end_time, error = TimeRangeService.parse_time_range(
+            period, start_date, end_date
+        )
+        
+        if error:
+            return JsonResponse({"error": error}, status=400)
+        
+        try:
+            top_n, bucket = parse_peak_params(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        
+        data = DataAggregationService.get_dashboard_data(
+            start_time, end_time, top_n=top_n, bucket=bucket
+        )
+        
+        return JsonResponse({
+            'cards': DataTransformationService.format_card_data(
+                data['current_totals'], data['previous_totals']
+            ),
+            'volume': DataTransformationService.format_volume_data(
+                data['daily_volume'], start_time, end_time
+            ),
+            'peaks': DataTransformationService.format_peak_time_data(
+                data['current_totals'], data['peaks']
+            )
+        })
+        
+    except Exception as e:
+        return JsonResponse({"error": "Internal server error"}, status=500)
+
+@require_http_methods(["GET"])
+@cached_dashboard_response('heatmap', extra_params=('bucket',))
+def get_heatmap(request):
+    """
+    Get the hour-of-day x weekday heatmap (mean, p50, p95) of every category.
+
+    Optional query parameter: bucket ('hour' volumes or 'minute' readings,
+    default 'hour').
+    """
+    try:
+        start_time, end_time, error = TimeRangeService.parse_time_range(
+            request.GET.get('period', '7'),
+            request.GET.get('start_date'),
+            request.GET.get('end_date')
+        )
+        if error:
+            return JsonResponse({"error": error}, status=400)
+
+        bucket = request.GET.get('bucket', 'hour')
+        if bucket not in PEAK_BUCKETS:
+            return JsonResponse({"error": f"bucket must be one of {PEAK_BUCKETS}"}, status=400)
+
+        return JsonResponse(DataAggregationService.get_heatmap(start_time, end_time, bucket))
+
+    except Exception as e:
+        return JsonResponse({"error": "Internal server error"}, status=500)
+
+@require_http_methods(["GET"])
+@cached_dashboard_response('direction-totals')
+def get_direction_totals(request):
+    """Get per-direction (turning movement) category totals for a time range."""
+    try:
+        start_time, end_time, error = TimeRangeService.parse_time_range(
+            request.GET.get('period', '7'),
+            request.GET.get('start_date'),
+            request.GET.get('end_date')
+        )
+        if error:
+            return JsonResponse({"error": error}, status=400)
+
+        return JsonResponse({'data': DirectionService.get_totals(start_time, end_time)})
+
+    except Exception as e:
+        return JsonResponse({"error": "Internal server error"}, status=500)
+
+@require_http_methods(["GET"])
+@cached_dashboard_response('od-matrix', extra_params=('category',))
+def get_od_matrix(request):
+    """
+    Get the origin-destination matrix of one category for a time range.
+
+    Optional query parameter: category (pedestrians, twoWheelers,
+    fourWheelers, trucks or total, default total).
+    """
+    try:
+        start_time, end_time, error = TimeRangeService.parse_time_range(
+            request.GET.get('period', '7'),
+            request.GET.get('start_date'),
+            request.GET.get('end_date')
+        )
+        if error:
+            return JsonResponse({"error": error}, status=400)
+
+        try:
+            category = parse_direction_category(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        return JsonResponse(DirectionService.get_od_matrix(start_time, end_time, category))
+
+    except Exception as e:
+        return JsonResponse({"error": "Internal server error"}, status=500)
+
+@require_http_methods(["GET"])
+@cached_dashboard_response('direction-peaks', extra_params=('top', 'bucket', 'category'))
+def get_direction_peaks(request):
+    """
+    Get the peaks of every direction for one category.
+
+    Optional query parameters: top, bucket (as for peak-time-data) and
+    category (as for od-matrix).
+    """
+    try:
+        start_time, end_time, error = TimeRangeService.parse_time_range(
+            request.GET.get('period', '7'),
+            request.GET.get('start_date'),
+            request.GET.get('end_date')
+        )
+        if error:
+            return JsonResponse({"error": error}, status=400)
+
+        try:
+            top_n, bucket = parse_peak_params(request)
+            category = parse_direction_category(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        return JsonResponse({
+            'category': category,
+            'bucket': bucket,
+            'data': DirectionService.get_peaks(
+                start_time, end_time, top_n=top_n, bucket=bucket, category=category
+            )
+        })
+
+    except Exception as e:
+        return JsonResponse({"error": "Internal server error"}, status=500)
+
+@require_http_methods(["GET"])
+@conditional_response('latest-data-info')
 def get_latest_data_info(request):
     """Get information about the latest data for polling."""
     try:
-        # Get the latest record
-        latest_record = TrafficRecord.objects.order_by('-timestamp').first()
+        # Maintained by every writer, so this is a single row lookup
+        stats = DataStatsService.get()
         
-        if not latest_record:
+        if stats.latest_timestamp is None:
             return JsonResponse({
                 'has_data': False,
                 'latest_timestamp': None,
                 'total_records': 0
             })
         
-        # Get total count of records
-        total_records = TrafficRecord.objects.count()
-        
         return JsonResponse({
             'has_data': True,
-            'latest_timestamp': latest_record.timestamp.isoformat(),
-            'total_records': total_records,
-            'last_updated': latest_record.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+            'latest_timestamp': stats.latest_timestamp.isoformat(),
+            'earliest_timestamp': stats.earliest_timestamp.isoformat(),
+            'total_records': stats.record_count,
+            'last_updated': stats.latest_timestamp.strftime('%Y-%m-%d %H:%M:%S')
         })
         
     except Exception as e:
         return JsonResponse({"error": "Internal server error"}, status=500)
 
+@require_http_methods(["GET"])
+def get_cache_stats(request):
+    """Report dashboard/LLM cache counters, intent parser coverage and LLM gateway load."""
+    return JsonResponse({
+        'cache': cache_stats(),
+        'llm': PromptCacheService.stats(),
+        'llm_intent_parser': parser_stats(),
+        'llm_gateway': llm_gateway.stats()
+    })
+
+@require_http_methods(["GET"])
+def get_metrics(request):
+    """Expose request, cache, LLM and ingestion metrics for Prometheus."""
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
 @require_http_methods(["GET"])
 def debug_card_data(request):
     """Debug endpoint to verify time period calculations and percentage changes."""
@@ -1,6 +1,5 @@
 import { useState, useRef, useEffect } from "react";
 import { Send, MessageSquare } from "lucide-react";
-import axios from "axios";
 import { useDashboard } from "../../contexts/DashboardContext";
 
 // Reusable UI components
@@ -94,34 +93,69 @@ export default function ChatInterface() {
     setInputValue("");
     setIsLoading(true);
 
+    const botId = Date.now() + 1;
+    const setBotText = (text: string) => {
+      setIsLoading(false);
+      setMessages((prev) =>
+        prev.some((m) => m.id === botId)
+          ? prev.map((m) => (m.id === botId ? { ...m, text } : m))
+          : [...prev, { id: botId, text, sender: "bot", timestamp: new Date() }]
+      );
+    };
+
     try {
       const formData = new FormData();
       formData.append("user_prompt", userMessage.text);
 
       console.log("Sending request to LLM with prompt:", inputValue);
 
-      const response = await axios.post(
-        "http://127.0.0.1:8000/get-output-from-llm/",
-        formData
+      // Server-Sent Events: "token" events stream the answer text, "done"
+      // carries the final validated response and dashboard state
+      const response = await fetch(
+        "http://127.0.0.1:8000/get-output-from-llm/stream/",
+        { method: "POST", body: formData }
       );
-
-      console.log("LLM Response:", response.data);
-
-      // ❗ FIXED: Hook used safely
-      if (response.data.response.state) {
-        updateDashboardState(response.data.response.state);
+      if (!response.ok || !response.body) {
+        throw new Error(`LLM request failed with status ${response.status}`);
       }
 
-      const formatted = formatLLMResponse(response.data.response.response);
-
-      const botMessage: Message = {
-        id: Date.now() + 1,
-        text: formatted,
-        sender: "bot",
-        timestamp: new Date(),
-      };
-
-      setMessages((prev) => [...prev, botMessage]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let streamedText = "";
+      let finished = false;
+
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop() || "";
+        for (const rawEvent of events) {
+          const eventType = rawEvent.match(/^event: (.*)$/m)?.[1];
+          const data = rawEvent.match(/^data: (.*)$/m)?.[1];
+          if (!eventType || data === undefined) continue;
+          const payload = JSON.parse(data);
+
+          if (eventType === "token") {
+            streamedText += payload.text;
+            setBotText(streamedText);
+          } else if (eventType === "done") {
+            console.log("LLM Response:", payload);
+            if (payload.state) {
+              updateDashboardState(payload.state);
+            }
+            setBotText(formatLLMResponse(payload.response));
+            finished = true;
+          } else if (eventType === "error") {
+            throw new Error(payload.error);
+          }
+        }
+      }
+      if (!finished) {
+        throw new Error("LLM stream ended unexpectedly");
+      }
     } catch (error) {
       console.error("Error sending message:", error);
 
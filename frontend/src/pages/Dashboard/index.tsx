@@ -140,6 +140,7 @@ const Dashboard = () => {
   );
   const pollingIntervalRef = useRef<NodeJS.Timeout | null>(null);
   const dataCheckIntervalRef = useRef<NodeJS.Timeout | null>(null);
+  const liveFeedRef = useRef<EventSource | null>(null);
 
   const PIE_CHARTS = ["pie", "donut", "gauge"]
 
@@ -164,10 +165,31 @@ const Dashboard = () => {
     }
   };
 
+  // Refresh all charts when the live feed reports new data
+  const handleLiveUpdate = async (event: MessageEvent) => {
+    const { latest_timestamp } = JSON.parse(event.data);
+    setLastDataTimestamp(latest_timestamp);
+    await fetchCardData();
+    await fetchTrafficChartData();
+    await fetchPeakTimeData();
+  };
+
   // Function to start polling
   const startPolling = () => {
-    // Check for new data every 30 seconds
-    dataCheckIntervalRef.current = setInterval(checkForNewData, 30000);
+    // Prefer the server-sent live feed; fall back to checking every 30 seconds
+    if (typeof EventSource !== "undefined") {
+      const liveFeed = new EventSource("http://127.0.0.1:8000/live/");
+      liveFeed.addEventListener("update", handleLiveUpdate);
+      liveFeed.addEventListener("reset", handleLiveUpdate);
+      liveFeed.onerror = () => {
+        if (liveFeed.readyState === EventSource.CLOSED && !dataCheckIntervalRef.current) {
+          dataCheckIntervalRef.current = setInterval(checkForNewData, 30000);
+        }
+      };
+      liveFeedRef.current = liveFeed;
+    } else {
+      dataCheckIntervalRef.current = setInterval(checkForNewData, 30000);
+    }
 
     // Full refresh every 5 minutes
     pollingIntervalRef.current = setInterval(async () => {
@@ -180,6 +202,10 @@ const Dashboard = () => {
 
   // Function to stop polling
   const stopPolling = () => {
+    if (liveFeedRef.current) {
+      liveFeedRef.current.close();
+      liveFeedRef.current = null;
+    }
     if (dataCheckIntervalRef.current) {
       clearInterval(dataCheckIntervalRef.current);
       dataCheckIntervalRef.current = null;